@@ -0,0 +1,173 @@
+import json
+import mmap
+import struct
+
+from Privacy.Distributions import run_length_encode
+
+MAGIC = b"RLESEQ1\n"
+_OFFSET = struct.Struct("<Q")
+_TRAILER = struct.Struct("<QQ")  # offset of the index, offset of the footer
+
+
+def taxonomy_symbols(taxonomy_tree) -> list:
+    """
+    Returns the symbols of a taxonomy, the leaves first and then the internal nodes, as a dictionary for
+    CompactSeqWriter: the symbols of a sanitised dataset are all among them
+    """
+    symbols = dict.fromkeys(taxonomy_tree.get_leaf_symbols())
+    for leaf in list(symbols):
+        symbols.update(dict.fromkeys(taxonomy_tree.path_symbols_from_root(leaf)))
+    return list(symbols)
+
+
+def _encode_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(buffer, position: int):
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+class CompactSeqWriter:
+    """
+    Writes sequences to a compact binary file, one at a time:
+        magic       MAGIC
+        data        per session, its runs of repeated symbols as (symbol id, run length) pairs of LEB128 varints
+        index       the offset of each session in the data, and the end of the data, as little-endian uint64
+        footer      JSON: the symbol dictionary (ids are positions in it), the descriptors, the number of
+                    sessions and events, and an optional comment
+        trailer     the offsets of the index and of the footer, as little-endian uint64
+    Symbols are given ids in the order of 'symbols' (e.g. taxonomy_symbols of the taxonomy), then in order of
+    first appearance. A sanitised session is mostly long runs of a few general symbols, which this stores in a
+    few bytes each. It can be used as a context manager.
+    """
+
+    def __init__(self, path, descriptors: list, symbols: list = None, comment: str = None):
+        self.path = path
+        self.descriptors = list(descriptors)
+        self.comment = comment
+        self.symbols = []
+        self.__symbol_ids = {}
+        for symbol in symbols if symbols is not None else []:
+            self.__symbol_id(symbol)
+        self.__offsets = [0]
+        self.__num_events = 0
+        self.__file = open(path, "wb")
+        self.__file.write(MAGIC)
+
+    def __symbol_id(self, symbol) -> int:
+        symbol_id = self.__symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self.__symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+    def write(self, sequence):
+        encoded = bytearray()
+        for symbol, length in run_length_encode(sequence):
+            _encode_varint(self.__symbol_id(symbol), encoded)
+            _encode_varint(length, encoded)
+        self.__file.write(encoded)
+        self.__offsets.append(self.__offsets[-1] + len(encoded))
+        self.__num_events += len(sequence)
+
+    def write_all(self, sequences):
+        for sequence in sequences:
+            self.write(sequence)
+
+    def close(self):
+        if self.__file.closed:
+            return
+        index_offset = len(MAGIC) + self.__offsets[-1]
+        self.__file.write(b"".join(_OFFSET.pack(offset) for offset in self.__offsets))
+        footer = {"symbols": self.symbols, "descriptors": self.descriptors, "num_sessions": len(self.__offsets) - 1,
+                  "num_events": self.__num_events, "comment": self.comment}
+        footer_offset = index_offset + _OFFSET.size * len(self.__offsets)
+        self.__file.write(json.dumps(footer).encode("utf-8"))
+        self.__file.write(_TRAILER.pack(index_offset, footer_offset))
+        self.__file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_compact_file(path, descriptors: list, sequences, symbols: list = None, comment: str = None):
+    with CompactSeqWriter(path, descriptors, symbols=symbols, comment=comment) as writer:
+        writer.write_all(sequences)
+
+
+class CompactSeqReader:
+    """
+    Reads a file written by CompactSeqWriter through a memory map: reader[i] decodes session i alone, from its
+    offset in the index, so sessions can be read in any order without loading the file. It can be used as a
+    context manager, and is a sequence of the sessions.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as datafile:
+            self.__map = mmap.mmap(datafile.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.__map[:len(MAGIC)] != MAGIC or len(self.__map) < len(MAGIC) + _TRAILER.size:
+            self.__map.close()
+            raise IOError(f"Failed to load file: {path} is not a compact sequence file.")
+        self.__index_offset, footer_offset = _TRAILER.unpack_from(self.__map, len(self.__map) - _TRAILER.size)
+        footer = json.loads(self.__map[footer_offset:len(self.__map) - _TRAILER.size].decode("utf-8"))
+        self.symbols = footer["symbols"]
+        self.descriptors = footer["descriptors"]
+        self.comment = footer["comment"]
+        self.num_events = footer["num_events"]
+        self.__num_sessions = footer["num_sessions"]
+
+    def __len__(self):
+        return self.__num_sessions
+
+    def __repr__(self):
+        return f"<CompactSeqReader: {self.path}, {len(self):,} sessions, {self.num_events:,} events>"
+
+    def __offset(self, i: int) -> int:
+        return len(MAGIC) + _OFFSET.unpack_from(self.__map, self.__index_offset + _OFFSET.size * i)[0]
+
+    def runs(self, i: int) -> list:
+        """
+        Returns session i as its runs of repeated symbols, (symbol, run length) pairs
+        """
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"Session {i} out of range for {len(self)} sessions.")
+        i %= len(self)
+        position, stop = self.__offset(i), self.__offset(i + 1)
+        runs = []
+        while position < stop:
+            symbol_id, position = _decode_varint(self.__map, position)
+            length, position = _decode_varint(self.__map, position)
+            runs.append((self.symbols[symbol_id], length))
+        return runs
+
+    def __getitem__(self, i: int) -> list:
+        return [symbol for symbol, length in self.runs(i) for j in range(length)]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.__map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
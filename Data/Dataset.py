@@ -1,5 +1,60 @@
 import csv
+import multiprocessing
 import os
+from collections import Counter
+
+
+def iter_seq_file(path):
+    """
+    Generator over the lines of a .seq file (space separated symbols, '%' lines are comments) as lists of symbols,
+    read one at a time
+    """
+    with open(path, "r") as datafile:
+        csv_reader = csv.reader(datafile, delimiter=" ")
+        for line in csv_reader:
+            if len(line) == 0:
+                continue
+            if line[0] == "%":
+                continue
+            line = line[:-1] if line[-1] == "" else line
+            if "" in line or " " in line:
+                raise AssertionError("Failed to load file: format error.")
+            yield line
+
+
+def read_seq_file(path) -> list:
+    """
+    Returns the lines of a .seq file (see iter_seq_file)
+    """
+    sequences = list(iter_seq_file(path))
+    if len(sequences) == 0:
+        raise IOError("Failed to load file: format error.")
+    return sequences
+
+
+def format_seq_line(sequence) -> str:
+    return " ".join([str(symbol) for symbol in sequence]) + " \n"
+
+
+def write_seq_file(path, descriptors: list, sequences, comment: str = None):
+    """
+    Writes a .seq file that MSNBCDataset can load: the descriptors line first, then one sequence per line
+    """
+    with open(path, "w") as datafile:
+        if comment is not None:
+            for comment_line in comment.splitlines():
+                datafile.write(f"% {comment_line}\n")
+            datafile.write("\n")
+        datafile.write(format_seq_line(descriptors))
+        for sequence in sequences:
+            datafile.write(format_seq_line(sequence))
+
+
+def length_bucket(length: int) -> str:
+    # sequence lengths are bucketed by powers of two: "1", "2", "3-4", "5-8", ...
+    upper = 1 << max(length - 1, 0).bit_length() if length > 0 else 0
+    lower = upper // 2 + 1
+    return str(upper) if lower >= upper else f"{lower}-{upper}"
 
 
 class MSNBCDataset:
@@ -11,21 +66,8 @@ class MSNBCDataset:
         else:
             absolute_path = f"{relative_path}/{MSNBCDataset.PATH}"
 
-        sequences = []
         try:
-            with open(absolute_path, "r") as datafile:
-                csv_reader = csv.reader(datafile, delimiter=" ")
-                for line in csv_reader:
-                    if len(line) == 0:
-                        continue
-                    if line[0] == "%":
-                        continue
-                    line = line[:-1] if line[-1] == "" else line
-                    if "" in line or " " in line:
-                        raise AssertionError("Failed to load file: format error.")
-                    sequences.append(line)
-            if len(sequences) == 0:
-                raise IOError("Failed to load file: format error.")
+            sequences = read_seq_file(absolute_path)
         except FileNotFoundError:
             msg = f"""
             The file containing the MSNBC dataset could not be located.
@@ -37,21 +79,33 @@ class MSNBCDataset:
 
         # First line in sequences should be descriptors ['frontpage', 'news', ..., ]
         self.descriptors, self.sequences = sequences[0], sequences[1:]
+        self.__stats = None
+
+    def compute_stats(self, processes: int = None, chunk_size: int = 10000):
+        """
+        Computes the DatasetStats of the dataset, caches them for stats() and returns them.
+        With 'processes' > 1 the sequences are split into chunks whose partial stats are computed in a process
+        pool and merged.
+        """
+        self.__stats = DatasetStats.from_sequences(self.sequences, processes=processes, chunk_size=chunk_size)
+        return self.__stats
+
+    def stats(self):
+        """
+        Returns the DatasetStats of the dataset, computed serially on first use unless compute_stats() was called
+        """
+        if self.__stats is None:
+            self.compute_stats()
+        return self.__stats
 
     def print_stats(self, size=True, av_seq_len=True, seq_lengths=False, top_10=True, seq_len_bin_width=10):
+        stats = self.stats()
         if size:
-            print(f"The dataset has {len(self.sequences):,} sequences.")
+            print(f"The dataset has {stats.num_sequences:,} sequences.")
 
         # Calculate frequency distribution of sequence lengths
         # in the dataset
-        distr = {}
-        calc_bin = lambda index: (index // int(seq_len_bin_width)) * int(seq_len_bin_width)
-        for seq in self.sequences:
-            bin_of_seq = calc_bin(len(seq))
-            if bin_of_seq in distr.keys():
-                distr[calc_bin(len(seq))] += 1
-            else:
-                distr[calc_bin(len(seq))] = 1
+        distr = stats.binned_length_histogram(seq_len_bin_width)
 
         if seq_lengths:
             print("Here is the frequency distribution of the dataset")
@@ -62,7 +116,7 @@ class MSNBCDataset:
                 if num_printed >= 10:
                     print("[rest omitted]")
                     break
-                if i in distr.keys():
+                if i in distr:
                     can_print_gap_next = True
                     lower_bound = str(i).zfill(3)
                     upper_bound = str(i + seq_len_bin_width - 1).zfill(3)
@@ -73,8 +127,98 @@ class MSNBCDataset:
                     can_print_gap_next = False
 
         if av_seq_len:
-            total_seq_lens = 0
-            for seq in self.sequences:
-                total_seq_lens += len(seq)
-            mean_seq_len = total_seq_lens / len(self.sequences)
-            print(f"The average sequence length is {mean_seq_len:.2f}")
+            print(f"The average sequence length is {stats.mean_length():.2f}")
+
+
+class DatasetStats:
+    """
+    Statistics of a set of sequences, gathered in one streaming pass:
+        length_histogram    sequence length -> number of sequences
+        symbol_frequencies  symbol -> number of occurrences
+        bigram_counts       (a, b) -> number of times b immediately follows a
+        sequence_counts     sequence (as a tuple) -> number of times it occurs
+    Stats of separate chunks of a dataset can be merged, and the result can be converted to and from a
+    JSON-serialisable dict to be cached.
+    """
+
+    def __init__(self):
+        self.num_sequences = 0
+        self.total_length = 0
+        self.length_histogram = Counter()
+        self.symbol_frequencies = Counter()
+        self.bigram_counts = Counter()
+        self.sequence_counts = Counter()
+
+    def __repr__(self):
+        return (f"<DatasetStats: {self.num_sequences:,} sequences, {self.num_distinct_sequences():,} distinct, "
+                f"mean length {self.mean_length():.2f}>")
+
+    def update(self, sequence):
+        self.num_sequences += 1
+        self.total_length += len(sequence)
+        self.length_histogram[len(sequence)] += 1
+        self.symbol_frequencies.update(sequence)
+        self.bigram_counts.update(zip(sequence, sequence[1:]))
+        self.sequence_counts[tuple(sequence)] += 1
+
+    def merge(self, other):
+        self.num_sequences += other.num_sequences
+        self.total_length += other.total_length
+        self.length_histogram.update(other.length_histogram)
+        self.symbol_frequencies.update(other.symbol_frequencies)
+        self.bigram_counts.update(other.bigram_counts)
+        self.sequence_counts.update(other.sequence_counts)
+        return self
+
+    @staticmethod
+    def of_chunk(sequences):
+        stats = DatasetStats()
+        for sequence in sequences:
+            stats.update(sequence)
+        return stats
+
+    @staticmethod
+    def from_sequences(sequences, processes: int = None, chunk_size: int = 10000):
+        if processes is None or processes <= 1:
+            return DatasetStats.of_chunk(sequences)
+        chunks = [sequences[i:i + chunk_size] for i in range(0, len(sequences), chunk_size)]
+        stats = DatasetStats()
+        with multiprocessing.Pool(processes) as pool:
+            for partial_stats in pool.imap(DatasetStats.of_chunk, chunks):
+                stats.merge(partial_stats)
+        return stats
+
+    def num_distinct_sequences(self):
+        return len(self.sequence_counts)
+
+    def mean_length(self):
+        return self.total_length / self.num_sequences if self.num_sequences > 0 else 0
+
+    # e.g. with a bin width of 10, lengths 0-9 are counted in bin 0, 10-19 in bin 10, ...
+    def binned_length_histogram(self, bin_width=10) -> dict:
+        bins = Counter()
+        for length, count in self.length_histogram.items():
+            bins[(length // int(bin_width)) * int(bin_width)] += count
+        return dict(bins)
+
+    def to_dict(self) -> dict:
+        return {
+            "num_sequences": self.num_sequences,
+            "total_length": self.total_length,
+            "length_histogram": {str(length): count for length, count in self.length_histogram.items()},
+            "symbol_frequencies": dict(self.symbol_frequencies),
+            "bigram_counts": [[a, b, count] for (a, b), count in self.bigram_counts.items()],
+            "sequence_counts": [[list(sequence), count] for sequence, count in self.sequence_counts.items()],
+        }
+
+    @staticmethod
+    def from_dict(stats_dict: dict):
+        stats = DatasetStats()
+        stats.num_sequences = stats_dict["num_sequences"]
+        stats.total_length = stats_dict["total_length"]
+        stats.length_histogram = Counter({int(length): count
+                                          for length, count in stats_dict["length_histogram"].items()})
+        stats.symbol_frequencies = Counter(stats_dict["symbol_frequencies"])
+        stats.bigram_counts = Counter({(a, b): count for a, b, count in stats_dict["bigram_counts"]})
+        stats.sequence_counts = Counter({tuple(sequence): count for sequence, count in stats_dict["sequence_counts"]})
+        return stats
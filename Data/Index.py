@@ -0,0 +1,106 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+
+class SessionIndex:
+    """
+    Inverted index over the sessions of a dataset, built in one pass:
+        masks       per session, a bitmask of the symbols it contains (bit i set for the symbol with id i)
+        postings    per symbol, the (session, position) pairs of its occurrences, sorted by session then position
+    A pattern can only occur in a session whose mask covers the pattern's mask; whether it does is then decided
+    from the postings of the pattern's symbols in that session, without going back to the session itself.
+    next_position answers from the postings too, so a compiled set of patterns (see
+    Sanitise.Patterns.SensitivePatternSet.occurs_in) can walk its trie against one session.
+    """
+
+    def __init__(self, sequences):
+        self.__symbol_ids = {}
+        self.__masks = []
+        self.__lengths = array("i")
+        self.__postings = {}  # symbol -> (array of sessions, array of positions)
+        for session, sequence in enumerate(sequences):
+            mask = 0
+            for position, symbol in enumerate(sequence):
+                symbol_id = self.__symbol_ids.get(symbol)
+                if symbol_id is None:
+                    symbol_id = self.__symbol_ids[symbol] = len(self.__symbol_ids)
+                    self.__postings[symbol] = (array("i"), array("i"))
+                mask |= 1 << symbol_id
+                sessions, positions = self.__postings[symbol]
+                sessions.append(session)
+                positions.append(position)
+            self.__masks.append(mask)
+            self.__lengths.append(len(sequence))
+
+    def __len__(self):
+        return len(self.__masks)
+
+    def get_symbols(self) -> list:
+        return list(self.__symbol_ids.keys())
+
+    def mask_of(self, symbols):
+        """
+        Returns the bitmask of 'symbols', or None if one of them occurs in no session
+        """
+        mask = 0
+        for symbol in symbols:
+            symbol_id = self.__symbol_ids.get(symbol)
+            if symbol_id is None:
+                return None
+            mask |= 1 << symbol_id
+        return mask
+
+    def session_mask(self, session: int) -> int:
+        return self.__masks[session]
+
+    def session_length(self, session: int) -> int:
+        return self.__lengths[session]
+
+    def may_contain(self, session: int, pattern) -> bool:
+        pattern_mask = self.mask_of(pattern)
+        return pattern_mask is not None and self.__masks[session] & pattern_mask == pattern_mask
+
+    def positions(self, symbol, session: int):
+        """
+        Returns the positions of 'symbol' in the session, in increasing order
+        """
+        if symbol not in self.__postings:
+            return array("i")
+        sessions, positions = self.__postings[symbol]
+        start = bisect_left(sessions, session)
+        return positions[start:bisect_right(sessions, session, start)]
+
+    def next_position(self, session: int, symbol, position: int) -> int:
+        """
+        Returns the first position >= 'position' at which 'symbol' occurs in the session, or the length of the
+        session if it does not occur
+        """
+        positions = self.positions(symbol, session)
+        i = bisect_left(positions, position)
+        return positions[i] if i < len(positions) else self.__lengths[session]
+
+    def occurs(self, session: int, pattern) -> bool:
+        """
+        Returns whether 'pattern' is a subsequence of the session
+        """
+        if not self.may_contain(session, pattern):
+            return False
+        position = -1
+        for symbol in pattern:
+            positions = self.positions(symbol, session)
+            i = bisect_right(positions, position)
+            if i == len(positions):
+                return False
+            position = positions[i]
+        return True
+
+    def occurs_any(self, session: int, patterns) -> bool:
+        return any(self.occurs(session, pattern) for pattern in patterns)
+
+    def candidate_sessions(self, patterns) -> list:
+        """
+        Returns the sessions whose symbols cover those of at least one of 'patterns'
+        """
+        pattern_masks = [mask for mask in (self.mask_of(pattern) for pattern in patterns) if mask is not None]
+        return [session for session, mask in enumerate(self.__masks)
+                if any(mask & pattern_mask == pattern_mask for pattern_mask in pattern_masks)]
@@ -0,0 +1,118 @@
+import multiprocessing
+from collections import Counter
+
+from Data.Dataset import MSNBCDataset
+
+# (distinct encoded sequences, number of times each occurs) in each worker process of a parallel run
+_database = None
+
+
+def _init_worker(database):
+    global _database
+    _database = database
+
+
+def encode_sequences(sequences):
+    """
+    Returns (symbols, database): 'symbols' maps each int id back to its symbol, and 'database' is a pair of lists
+    (distinct sequences as tuples of symbol ids, number of times each of them occurs in 'sequences')
+    """
+    symbol_ids = {}
+    sequence_counts = Counter()
+    for sequence in sequences:
+        encoded = []
+        for symbol in sequence:
+            if symbol not in symbol_ids:
+                symbol_ids[symbol] = len(symbol_ids)
+            encoded.append(symbol_ids[symbol])
+        sequence_counts[tuple(encoded)] += 1
+    symbols = [None] * len(symbol_ids)
+    for symbol, symbol_id in symbol_ids.items():
+        symbols[symbol_id] = symbol
+    return symbols, (list(sequence_counts.keys()), list(sequence_counts.values()))
+
+
+# A projected database is a list of (sequence id, start) pairs: the suffixes sequence[start:] of the sequences that
+# contain the current prefix, starting right after the prefix's leftmost occurrence.
+def _frequent_items(projection, database, min_count) -> dict:
+    sequences, weights = database
+    counts = Counter()
+    for sequence_id, start in projection:
+        weight = weights[sequence_id]
+        for item in set(sequences[sequence_id][start:]):  # each item counts once per sequence
+            counts[item] += weight
+    return {item: count for item, count in counts.items() if count >= min_count}
+
+
+def _project(projection, database, item) -> list:
+    sequences = database[0]
+    projected = []
+    for sequence_id, start in projection:
+        try:
+            projected.append((sequence_id, sequences[sequence_id].index(item, start) + 1))
+        except ValueError:
+            continue
+    return projected
+
+
+def _prefix_span(prefix, projection, database, min_count, max_length, patterns):
+    if max_length is not None and len(prefix) >= max_length:
+        return
+    for item, count in sorted(_frequent_items(projection, database, min_count).items()):
+        pattern = prefix + (item,)
+        patterns.append((pattern, count))
+        _prefix_span(pattern, _project(projection, database, item), database, min_count, max_length, patterns)
+
+
+def _mine_item(database, item, count, min_count, max_length):
+    # mines every pattern starting with 'item'
+    patterns = [((item,), count)]
+    projection = _project([(i, 0) for i in range(len(database[0]))], database, item)
+    _prefix_span((item,), projection, database, min_count, max_length, patterns)
+    return patterns
+
+
+def _mine_from_item(args):
+    # in a worker process, from its copy of the database
+    return _mine_item(_database, *args)
+
+
+def mine_sequential_patterns(sequences, min_support, max_length: int = None, processes: int = None) -> list:
+    """
+    PrefixSpan: returns [(pattern, support)] for every sequential pattern (a subsequence, not necessarily
+    contiguous) contained in at least 'min_support' of the sequences, longest patterns having 'max_length' symbols.
+    'min_support' is a fraction of the sequences if it is below 1, otherwise a number of sequences.
+    Sequences are int-encoded and identical sequences are counted once with a weight. With 'processes' > 1 the
+    patterns starting with each frequent symbol are mined in parallel.
+    Patterns are sorted by descending support.
+    """
+    symbols, database = encode_sequences(sequences)
+    num_sequences = sum(database[1])
+    min_count = min_support * num_sequences if min_support < 1 else min_support
+    if max_length is not None and max_length < 1:
+        return []
+
+    all_sequences = [(i, 0) for i in range(len(database[0]))]
+    tasks = [(item, count, min_count, max_length)
+             for item, count in sorted(_frequent_items(all_sequences, database, min_count).items())]
+    patterns = []
+    if processes is None or processes <= 1:
+        for task in tasks:
+            patterns += _mine_item(database, *task)
+    else:
+        with multiprocessing.Pool(processes, initializer=_init_worker, initargs=(database,)) as pool:
+            for item_patterns in pool.imap(_mine_from_item, tasks):
+                patterns += item_patterns
+
+    patterns.sort(key=lambda pattern_count: (-pattern_count[1], len(pattern_count[0]), pattern_count[0]))
+    return [([symbols[item] for item in pattern], count) for pattern, count in patterns]
+
+
+def mine_sensitive_patterns(dataset: MSNBCDataset, min_support, max_length: int = None,
+                            processes: int = None) -> list:
+    """
+    Returns the frequent sequential patterns of the dataset (without their support), to be used as the
+    sensitive patterns given to the sanitisation algorithms
+    """
+    return [pattern for pattern, support in
+            mine_sequential_patterns(dataset.sequences, min_support, max_length=max_length, processes=processes)]
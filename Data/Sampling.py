@@ -0,0 +1,114 @@
+import heapq
+import random
+from collections import Counter
+
+from Data.Dataset import MSNBCDataset, iter_seq_file, length_bucket
+
+
+def contains_pattern(sequence, pattern) -> bool:
+    # whether 'pattern' is a subsequence of 'sequence', in one pass
+    remaining = iter(sequence)
+    return all(symbol in remaining for symbol in pattern)
+
+
+class StratifiedSample:
+    """
+    A sample drawn by a StratifiedSampler: the sampled sequences and their positions in the stream, in stream
+    order, with the number of sequences seen and sampled per stratum (length bucket, any sensitive pattern present)
+    """
+
+    def __init__(self, indices: list, sequences: list, population: Counter, allocation: Counter):
+        self.indices = indices
+        self.sequences = sequences
+        self.population = population
+        self.allocation = allocation
+
+    def __len__(self):
+        return len(self.sequences)
+
+    def __repr__(self):
+        return (f"<StratifiedSample: {len(self):,} of {sum(self.population.values()):,} sequences, "
+                f"{len(self.population)} strata>")
+
+
+class StratifiedSampler:
+    """
+    Draws a sample of 'sample_size' sequences from a stream of them in one pass, stratified by length bucket
+    (see Dataset.length_bucket) and by whether any of 'sens_pats' occurs.
+
+    Every sequence is given a random key, and each stratum keeps the 'sample_size' sequences with the smallest
+    keys seen so far (a bottom-k reservoir), so memory is bounded by 'sample_size' per stratum whatever the length
+    of the stream. At the end the sample size is allocated to the strata in proportion to the number of sequences
+    seen in each (largest remainders first), and each stratum contributes its sequences with the smallest keys: a
+    uniform sample of the stratum. The same 'seed' and stream give the same sample.
+    """
+
+    def __init__(self, sample_size: int, sens_pats: list = (), seed=0):
+        if sample_size < 0:
+            raise ValueError(f"The sample size must be at least 0, not {sample_size}.")
+        self.sample_size = sample_size
+        self.sens_pats = [list(sens_pat) for sens_pat in sens_pats]
+        self.__rand = random.Random(seed)
+        self.__reservoirs = {}  # stratum -> heap of (-key, index, sequence)
+        self.population = Counter()
+        self.__num_seen = 0
+
+    def stratum(self, sequence) -> tuple:
+        return length_bucket(len(sequence)), any(contains_pattern(sequence, sens_pat) for sens_pat in self.sens_pats)
+
+    def add(self, sequence):
+        stratum = self.stratum(sequence)
+        self.population[stratum] += 1
+        key = self.__rand.random()
+        reservoir = self.__reservoirs.setdefault(stratum, [])
+        if len(reservoir) < self.sample_size:
+            heapq.heappush(reservoir, (-key, self.__num_seen, sequence))
+        elif len(reservoir) > 0 and key < -reservoir[0][0]:
+            heapq.heapreplace(reservoir, (-key, self.__num_seen, sequence))
+        self.__num_seen += 1
+
+    def add_all(self, sequences):
+        for sequence in sequences:
+            self.add(sequence)
+        return self
+
+    def allocation(self) -> Counter:
+        """
+        Returns the number of sequences to sample from each stratum
+        """
+        total = sum(self.population.values())
+        if total <= self.sample_size:
+            return Counter(self.population)
+        quotas = {stratum: self.sample_size * count / total for stratum, count in self.population.items()}
+        allocation = Counter({stratum: int(quota) for stratum, quota in quotas.items()})
+        by_remainder = sorted(quotas, key=lambda stratum: (allocation[stratum] - quotas[stratum], stratum))
+        for stratum in by_remainder[:self.sample_size - sum(allocation.values())]:
+            allocation[stratum] += 1
+        return allocation
+
+    def sample(self) -> StratifiedSample:
+        allocation = self.allocation()
+        sampled = []
+        for stratum, reservoir in self.__reservoirs.items():
+            sampled += heapq.nlargest(allocation[stratum], reservoir)  # the smallest keys
+        sampled.sort(key=lambda entry: entry[1])
+        return StratifiedSample([index for key, index, sequence in sampled],
+                                [sequence for key, index, sequence in sampled], Counter(self.population), allocation)
+
+
+def sample_seq_file(path, sample_size: int, sens_pats: list = (), seed=0, descriptors: bool = True):
+    """
+    Returns (the descriptors line, or None if 'descriptors' is False, the StratifiedSample of the other lines) of a
+    .seq file, read in one pass
+    """
+    lines = iter_seq_file(path)
+    descriptors_line = next(lines, None) if descriptors else None
+    return descriptors_line, StratifiedSampler(sample_size, sens_pats, seed=seed).add_all(lines).sample()
+
+
+def sample_msnbc(sample_size: int, sens_pats: list = (), seed=0, relative_path: str = None):
+    """
+    Returns (the descriptors, the StratifiedSample of the sequences) of the MSNBC dataset, without loading it all
+    """
+    path = MSNBCDataset.PATH if relative_path is None else f"{relative_path}/{MSNBCDataset.PATH}"
+    return sample_seq_file(path, sample_size, sens_pats, seed=seed)
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import time
+
+from Data.Dataset import MSNBCDataset, format_seq_line, read_seq_file, write_seq_file
+
+# A run over a dataset of n sessions is split into 'num_shards' shards: shard i sanitises the contiguous sessions
+# [start, stop) given by shard_range(n, i, num_shards). Shard i writes, into the run's output directory,
+#     shard-<i>-of-<num_shards>.seq     the sanitised sessions, in input order
+#     shard-<i>-of-<num_shards>.json    its manifest: parameters, input range and checksum, output checksum, timings
+# Shards share nothing but the output directory, so they can run in separate processes or on separate machines.
+# merge_shards checks that every shard is present and consistent with the dataset, then writes one ordered .seq
+# file. The sanitiser is passed in by the caller (e.g. a Sanitise.Batch.BatchSanitiser): anything with
+# sanitise(sequences) and parameters() will do.
+
+
+class ShardError(Exception):
+    pass
+
+
+def shard_range(num_sequences: int, shard_index: int, num_shards: int) -> tuple:
+    """
+    Returns the (start, stop) session indices of a shard. The first num_sequences % num_shards shards get one
+    session more than the others.
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} is not in [0, {num_shards}).")
+    size, remainder = divmod(num_sequences, num_shards)
+    start = shard_index * size + min(shard_index, remainder)
+    return start, start + size + (1 if shard_index < remainder else 0)
+
+
+def sequences_sha256(sequences) -> str:
+    # the checksum of the lines the sequences are written as in a .seq file
+    sha256 = hashlib.sha256()
+    for sequence in sequences:
+        sha256.update(format_seq_line(sequence).encode())
+    return sha256.hexdigest()
+
+
+def file_sha256(path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2 ** 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def shard_name(shard_index: int, num_shards: int) -> str:
+    return f"shard-{shard_index:04d}-of-{num_shards:04d}"
+
+
+def run_shard(dataset: MSNBCDataset, sanitiser, shard_index: int, num_shards: int, output_dir: str) -> dict:
+    """
+    Sanitises one shard of the dataset, writes its .seq file and manifest to 'output_dir' and returns the manifest.
+    The manifest is written last, so a shard without a manifest is one that has not finished.
+    """
+    started = time.time()
+    start_counter = time.perf_counter()
+    start, stop = shard_range(len(dataset.sequences), shard_index, num_shards)
+    input_sequences = dataset.sequences[start:stop]
+
+    os.makedirs(output_dir, exist_ok=True)
+    name = shard_name(shard_index, num_shards)
+    seq_path = os.path.join(output_dir, f"{name}.seq")
+    write_seq_file(seq_path, dataset.descriptors, sanitiser.sanitise(input_sequences))
+
+    manifest = {
+        "shard_index": shard_index,
+        "num_shards": num_shards,
+        "parameters": sanitiser.parameters(),
+        "descriptors": dataset.descriptors,
+        "input": {
+            "num_sequences": len(dataset.sequences),
+            "start": start,
+            "stop": stop,
+            "sha256": sequences_sha256(input_sequences),
+        },
+        "output": {
+            "file": os.path.basename(seq_path),
+            "num_sequences": stop - start,
+            "sha256": file_sha256(seq_path),
+        },
+        "timings": {
+            "started": started,
+            "finished": time.time(),
+            "seconds": time.perf_counter() - start_counter,
+        },
+    }
+    manifest_path = os.path.join(output_dir, f"{name}.json")
+    with open(manifest_path + ".tmp", "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+def read_manifests(dataset: MSNBCDataset, output_dir: str, num_shards: int) -> list:
+    """
+    Returns the manifests of the shards of a run over 'dataset', in shard order.
+    Raises ShardError if a shard is missing, was run with other settings or on other input than 'dataset', or its
+    output does not match its manifest.
+    """
+    manifests = []
+    for shard_index in range(num_shards):
+        manifest_path = os.path.join(output_dir, f"{shard_name(shard_index, num_shards)}.json")
+        if not os.path.exists(manifest_path):
+            raise ShardError(f"Shard {shard_index} of {num_shards} has not finished: {manifest_path} is missing.")
+        with open(manifest_path, "r") as manifest_file:
+            manifests.append(json.load(manifest_file))
+
+    first = manifests[0]
+    for shard_index, manifest in enumerate(manifests):
+        if manifest["shard_index"] != shard_index or manifest["num_shards"] != num_shards:
+            raise ShardError(f"The manifest of shard {shard_index} describes shard {manifest['shard_index']} of "
+                             f"{manifest['num_shards']}.")
+        if manifest["parameters"] != first["parameters"] or manifest["descriptors"] != first["descriptors"] or \
+                manifest["input"]["num_sequences"] != first["input"]["num_sequences"]:
+            raise ShardError(f"Shard {shard_index} was run with different parameters or input than shard 0.")
+        if manifest["input"]["num_sequences"] != len(dataset.sequences) or \
+                manifest["descriptors"] != dataset.descriptors:
+            raise ShardError(f"Shard {shard_index} was run on a dataset of {manifest['input']['num_sequences']} "
+                             f"sessions other than this one of {len(dataset.sequences)}.")
+        expected_range = shard_range(len(dataset.sequences), shard_index, num_shards)
+        start, stop = manifest["input"]["start"], manifest["input"]["stop"]
+        if (start, stop) != expected_range:
+            raise ShardError(f"Shard {shard_index} covers sessions [{start}, {stop}) instead of "
+                             f"{list(expected_range)}.")
+        if sequences_sha256(dataset.sequences[start:stop]) != manifest["input"]["sha256"]:
+            raise ShardError(f"The input of shard {shard_index} does not match sessions [{start}, {stop}) of the "
+                             f"dataset.")
+        seq_path = os.path.join(output_dir, manifest["output"]["file"])
+        if not os.path.exists(seq_path) or file_sha256(seq_path) != manifest["output"]["sha256"]:
+            raise ShardError(f"The output of shard {shard_index} is missing or does not match its checksum.")
+    return manifests
+
+
+def merge_shards(dataset: MSNBCDataset, output_dir: str, num_shards: int, output_path: str) -> dict:
+    """
+    Checks that every shard of a run over 'dataset' has finished consistently and writes their sanitised sessions,
+    in input order, to one .seq file at 'output_path'. Returns a manifest of the merged run.
+    """
+    manifests = read_manifests(dataset, output_dir, num_shards)
+    num_sequences = 0
+
+    def merged_sequences():
+        nonlocal num_sequences
+        for manifest in manifests:
+            # the first line of a shard's .seq file is the descriptors
+            shard_sequences = read_seq_file(os.path.join(output_dir, manifest["output"]["file"]))[1:]
+            if len(shard_sequences) != manifest["output"]["num_sequences"]:
+                raise ShardError(f"Shard {manifest['shard_index']} has {len(shard_sequences)} sessions instead of "
+                                 f"{manifest['output']['num_sequences']}.")
+            num_sequences += len(shard_sequences)
+            yield from shard_sequences
+
+    write_seq_file(output_path, manifests[0]["descriptors"], merged_sequences())
+    return {
+        "num_shards": num_shards,
+        "parameters": manifests[0]["parameters"],
+        "num_sequences": num_sequences,
+        "sha256": file_sha256(output_path),
+        "seconds": sum(manifest["timings"]["seconds"] for manifest in manifests),
+    }
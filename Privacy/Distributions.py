@@ -1,28 +1,82 @@
-from Sanitise.Helper import sequences_to_hash, sequence_to_hash
+import multiprocessing
+from array import array
+from bisect import bisect_left
+from itertools import combinations
+from math import comb
 
 
 class JointDistribution:
+    """
+    Each distinct event is given an index in 'event_index' and its count is held, at that index, in the
+    integer array 'counts'. An event of a joint distribution is a tuple of patterns, one per sequence.
+    Values are the raw counts; subclasses may normalise them lazily.
+    """
+
     def __init__(self):
-        self.hash_to_val = {}
+        self.event_index = {}
+        self.counts = array("q")
+        self._total = None
+
+    @staticmethod
+    def _event(sequences) -> tuple:
+        return tuple(tuple(sequence) for sequence in sequences)
+
+    def __contains__(self, sequences):
+        return self._event(sequences) in self.event_index
 
-    def __contains__(self, *items):
-        return self.get(items) is not None
+    def __len__(self):
+        return len(self.counts)
+
+    def _value(self, index):
+        return self.counts[index]
 
     def get(self, *sequences):
-        hash = sequences_to_hash(sequences)
-        # print("hash", hash)
-        # print("hash_to_val", self.hash_to_val.keys())
-        if hash in self.hash_to_val.keys():
-            return self.hash_to_val[hash]
-        else:
-            return None
+        index = self.event_index.get(self._event(sequences))
+        return self._value(index) if index is not None else None
+
+    def get_count(self, *sequences):
+        index = self.event_index.get(self._event(sequences))
+        return self.counts[index] if index is not None else 0
 
     def set(self, val, *sequences):
-        hash = sequences_to_hash(sequences)
-        self.hash_to_val[hash] = val
+        event = self._event(sequences)
+        index = self.event_index.get(event)
+        if index is None:
+            self.event_index[event] = len(self.counts)
+            self.counts.append(val)
+        else:
+            self.counts[index] = val
+        self._total = None
+
+    def add(self, *sequences, count=1):
+        self._add_event(self._event(sequences), count=count)
+
+    def _add_event(self, event: tuple, count=1):
+        index = self.event_index.get(event)
+        if index is None:
+            self.event_index[event] = len(self.counts)
+            self.counts.append(count)
+        else:
+            self.counts[index] += count
+        self._total = None
+
+    def _set_counts(self, event_counts: dict):
+        # replaces the events and counts; counts too large for the int64 array are kept in a list
+        self.event_index = {event: index for index, event in enumerate(event_counts.keys())}
+        try:
+            self.counts = array("q", event_counts.values())
+        except OverflowError:
+            self.counts = list(event_counts.values())
+        self._total = None
+
+    def total(self):
+        # sum of the counts, computed once
+        if self._total is None:
+            self._total = sum(self.counts)
+        return self._total
 
     def values(self):
-        return self.hash_to_val.values()
+        return [self._value(index) for index in range(len(self.counts))]
 
     def get_max_val(self):
         return max(self.values())
@@ -32,27 +86,24 @@ class JointDistribution:
 
 
 class Distribution(JointDistribution):
-    def __init__(self):
-        super().__init__()
-        self.hash_to_hashname = {}
+    """
+    Distribution over single patterns; each event is the pattern as a tuple.
+    """
+
+    @staticmethod
+    def _event(sequences) -> tuple:
+        return tuple(sequences[0])
+
+    def __contains__(self, item):
+        return tuple(item) in self.event_index
 
     def __getitem__(self, item):
         return self.get(item)
 
     def __setitem__(self, key, value):
         self.set(value, key)
-        self.hash_to_hashname[sequence_to_hash(key)] = key
-
 
     def __repr__(self):
-        # out = "{"
-        # for hash in self.hash_to_hashname.keys():
-        #     out += str(self.hash_to_hashname[hash])
-        #     out += ":"
-        #     out += str(self.hash_to_val[hash])
-        #     out += ","
-        #
-        # out = out[:-1] + "}"  # remove last comma and close list
         out = "["
         delimiter = ", "
         if len(self.values()) == 0:
@@ -70,87 +121,342 @@ class Distribution(JointDistribution):
             return "[Empty]"
 
     def get_events(self):
-        return list(self.hash_to_hashname.values())
+        return [list(event) for event in self.event_index.keys()]
+
+    def append(self, symbol):
+        """
+        Turns the subsequence counts of a sequence into those of the sequence followed by 'symbol':
+        every subsequence p that existed is also counted as p + [symbol], and [symbol] is counted once more.
+        Costs one pass over the distinct events instead of a recount of all 2^n subsequences.
+        """
+        counted_events = [(event, self.counts[index]) for event, index in self.event_index.items()]
+        for event, count in counted_events:
+            self._add_event(event + (symbol,), count=count)
+        self._add_event((symbol,))
 
 
 class FrequencyDistribution(Distribution):
-    def __init__(self, sequence):
+    # With 'max_length', only the subsequences of at most that many symbols are counted (bounded mode).
+    # With 'processes' > 1, the exact counts are computed in a process pool (see count_subsequences_parallel).
+    # With 'run_length' (by default, whenever the sequence has a run of repeated symbols and no process pool is
+    # asked for), the counts are computed per run (see count_subsequences_of_runs).
+    def __init__(self, sequence, max_length: int = None, processes: int = None, run_length: bool = None):
         super().__init__()
 
-        # enumerate all subsequences of 'sequence'
-        possible_patterns = []
-        for index_array in enum_all_subsequence_indices(len(sequence)):
-            possible_patterns.append(get_subsequence(sequence, index_array))
+        exact = max_length is None or max_length >= len(sequence)
+        parallel = exact and processes is not None and processes > 1
+        runs = run_length_encode(sequence)
+        if run_length is None:
+            run_length = len(runs) < len(sequence) and not parallel
+        if run_length:
+            self._set_counts(count_subsequences_of_runs(runs, max_length=max_length))
+            return
+        if parallel:
+            self._set_counts(count_subsequences_parallel(sequence, processes))
+            return
+
+        # count every subsequence of 'sequence' as it is enumerated; memory is bounded by
+        # the number of distinct patterns rather than by 2^n (exact counts are kept by incrementally updated
+        # int keys, see count_subsequences_exact)
+        if exact:
+            self._set_counts(count_subsequences_exact(sequence))
+            return
+        for (pattern,) in enum_subsequences(sequence, max_length=max_length):
+            self._add_event(pattern)
+
+    @staticmethod
+    def from_runs(runs: list, max_length: int = None):
+        """
+        Returns the FrequencyDistribution of the sequence given by its run-length encoding, [(symbol, run length)]
+        """
+        frequencies = FrequencyDistribution([])
+        frequencies._set_counts(count_subsequences_of_runs(runs, max_length=max_length))
+        return frequencies
 
-        for pattern in possible_patterns:  # list(set(..)) returns all unique patterns
-            if pattern in self:
-                self[pattern] += 1
-            else:
-                self[pattern] = 1
 
 class ProbabilityDistribution(Distribution):
-    # FIXME don't use the frequency distribution
-    # P[p] = input_seq.count(p) / 2 ** len(input_seq)
-    def __init__(self, sequence):
+    # P[p] = input_seq.count(p) / 2 ** len(input_seq), normalised lazily from the counts
+    def __init__(self, sequence=None, frequencies: FrequencyDistribution = None, max_length: int = None):
         super().__init__()
-        freq_distr = FrequencyDistribution(sequence)
-        is_empty = freq_distr.get_max_val() == 0
-        for pattern in freq_distr.get_events():
-            self[pattern] = freq_distr[pattern] / freq_distr.sum() if not is_empty else 0
+        if frequencies is None:
+            frequencies = FrequencyDistribution(sequence, max_length=max_length)
+            self.event_index, self.counts = frequencies.event_index, frequencies.counts
+        else:
+            # a copy, so that the cached total cannot go stale when the source is appended to or set
+            self.event_index, self.counts = dict(frequencies.event_index), frequencies.counts[:]
+
+    def _value(self, index):
+        total = self.total()
+        return self.counts[index] / total if total > 0 else 0
 
 
 class JointFrequencyDistribution(JointDistribution):
-    def __init__(self, sequence1, sequence2):
+    def __init__(self, sequence1, sequence2, max_length: int = None):
         if len(sequence1) != len(sequence2):
             raise ValueError("Sequences must have the same length")
 
         super().__init__()
-        print(f"x = JointFrequencyDistribution({sequence1},{sequence2})")
-
-        for indices in enum_all_subsequence_indices(len(sequence1)):
-            subsequence1 = get_subsequence(sequence1, indices)
-            subsequence2 = get_subsequence(sequence2, indices)
-            if super().__contains__(subsequence1, subsequence2):
-                self.set(self.get(subsequence1, subsequence2) + 1, subsequence1, subsequence2)
-            else:
-                self.set(1, subsequence1, subsequence2)
+        for event in enum_subsequences(sequence1, sequence2, max_length=max_length):
+            self._add_event(event)
 
 
 class JointProbabilityDistribution(JointFrequencyDistribution):
-    def __init__(self, sequence1, sequence2):
-        super().__init__(sequence1, sequence2)
-        total = self.sum()
-        if total > 0:
-            for hash in self.hash_to_val.keys():
-                self.hash_to_val[hash] = self.hash_to_val[hash] / total
-
-
-# returns all subsequence indices of a sequence
-# e.g. for a sequence of length 3: [[0],[1],[2],[0,1],[0,2],[1,2],[0,1,2]]
-# uses binary numbers where each number says whether each index is to be included in the output array
-# i.e. '0b101' means index array [0,2]
-def enum_all_subsequence_indices(array_len):
-    subseq_indices = []
-    counter = bin(1)  # don't start from 0 otherwise empty array [] will be included
-
-    def incr_counter(c):
-        return bin(int(c, 2) + 1)
-
-    # e.g. '0b101' --> [0,2] or '0b111' --> [0,1,2]
-    def bin_to_indices(num_bin: bin):
-        indices = []
-        num_bin = num_bin[2:]  # remove '0b' from beginning of string
-        for i in range(len(num_bin)):
-            digit = num_bin[i]
-            if digit == '1':
-                indices.append(i)
-        return indices
-
-    for i in range(2 ** array_len):
-        subseq_indices.append(bin_to_indices(counter))
-        counter = incr_counter(counter)
-
-    return subseq_indices
+    def _value(self, index):
+        total = self.total()
+        return self.counts[index] / total if total > 0 else 0
+
+
+def enum_subsequences(*sequences, max_length: int = None):
+    """
+    Generator over the non-empty subsequences of equally long sequences (see enum_subsequences_gray).
+    With 'max_length' below the length of the sequences, only the subsequences of at most 'max_length' symbols
+    are enumerated, which is sum(C(n, k) for k = 1..max_length) subsets instead of 2^n - 1.
+    """
+    length = len(sequences[0]) if len(sequences) > 0 else 0
+    if max_length is None or max_length >= length:
+        yield from enum_subsequences_gray(*sequences)
+        return
+    for pattern_length in range(1, max_length + 1):
+        for positions in combinations(range(length), pattern_length):
+            yield tuple(tuple(get_subsequence(sequence, positions)) for sequence in sequences)
+
+
+def count_subsequences(length: int, max_length: int = None) -> int:
+    """
+    Returns the number of non-empty subsequences enumerated for a sequence of 'length' symbols
+    """
+    if max_length is None or max_length >= length:
+        return 2 ** length - 1
+    return sum(comb(length, k) for k in range(1, max_length + 1))
+
+
+def run_length_encode(sequence) -> list:
+    """
+    Returns the runs of 'sequence' as [(symbol, run length)], e.g. [1, 1, 1, 14, 14] gives [(1, 3), (14, 2)]
+    """
+    runs = []
+    for symbol in sequence:
+        if len(runs) > 0 and runs[-1][0] == symbol:
+            runs[-1] = (symbol, runs[-1][1] + 1)
+        else:
+            runs.append((symbol, 1))
+    return runs
+
+
+def count_subsequences_of_runs(runs: list, max_length: int = None) -> dict:
+    """
+    Returns {pattern: count} over the non-empty subsequences (of at most 'max_length' symbols) of the sequence
+    given by its run-length encoding [(symbol, run length)].
+
+    A subsequence takes some k of the r positions of each run, and there are C(r, k) ways to take them, so the
+    runs are folded in one at a time: each distinct subsequence p of the runs so far is extended to p + symbol^k,
+    for k = 0..r, with its count multiplied by C(r, k). The work is proportional to the number of distinct patterns
+    times the run lengths, rather than to the 2^n subsets of the positions.
+    """
+    counts = {(): 1}
+    for symbol, run_length in runs:
+        weights = [comb(run_length, k) for k in range(run_length + 1)]
+        extended = {}
+        for prefix, count in counts.items():
+            max_k = run_length if max_length is None else min(run_length, max_length - len(prefix))
+            pattern = prefix
+            for k in range(max_k + 1):
+                extended[pattern] = extended.get(pattern, 0) + count * weights[k]
+                pattern = pattern + (symbol,)
+        counts = extended
+    del counts[()]
+    return counts
+
+
+def count_run_choices(runs: list) -> int:
+    """
+    Returns the number of ways of taking a non-empty subsequence run by run (some number of positions of each
+    run), which is what count_subsequences_of_runs enumerates at most: the product of (run length + 1), less one
+    """
+    choices = 1
+    for symbol, run_length in runs:
+        choices *= run_length + 1
+    return choices - 1
+
+
+def count_distinct_subsequences(sequence) -> int:
+    """
+    Returns the number of distinct non-empty subsequences of 'sequence', i.e. the number of events of its
+    FrequencyDistribution, in O(n) without enumerating them
+    """
+    # distinct[i] counts the distinct subsequences (the empty one included) of sequence[:i]; appending a symbol
+    # doubles them, less those that already ended with the same symbol at its previous occurrence
+    distinct = [1]
+    previous_occurrence = {}
+    for i, symbol in enumerate(sequence):
+        count = 2 * distinct[-1]
+        if symbol in previous_occurrence:
+            count -= distinct[previous_occurrence[symbol]]
+        previous_occurrence[symbol] = i
+        distinct.append(count)
+    return distinct[-1] - 1
+
+
+def enum_subsequences_gray(*sequences, start: int = 1, stop: int = None):
+    """
+    Generator over the non-empty subsequences of equally long sequences, yielding one tuple of patterns
+    (one pattern per sequence, taken at the same positions) per subset of positions.
+
+    Subsets are visited in Gray-code order: the subset of rank k is the set bits of k ^ (k >> 1), so consecutive
+    subsets differ by exactly one position and the positions and patterns are updated by inserting or removing a
+    single symbol. Only the current patterns are held in memory, but the tuples yielded are still built afresh at
+    every step, in O(n); enum_subsequence_keys keeps an incrementally updated key instead.
+    'start' and 'stop' restrict the walk to ranks start, ..., stop - 1 (by default all 2^n - 1 non-empty subsets).
+    """
+    length = len(sequences[0]) if len(sequences) > 0 else 0
+    if stop is None:
+        stop = 2 ** length
+    if start >= stop:
+        return
+
+    gray_code = start ^ (start >> 1)
+    positions = [i for i in range(length) if gray_code >> i & 1]
+    patterns = [get_subsequence(sequence, positions) for sequence in sequences]
+    yield tuple(tuple(pattern) for pattern in patterns)
+    for rank in range(start + 1, stop):
+        # going from rank - 1 to rank flips the bit at the number of trailing zeros of rank
+        position = (rank & -rank).bit_length() - 1
+        i = bisect_left(positions, position)
+        if i < len(positions) and positions[i] == position:
+            del positions[i]
+            for pattern in patterns:
+                del pattern[i]
+        else:
+            positions.insert(i, position)
+            for pattern, sequence in zip(patterns, sequences):
+                pattern.insert(i, sequence[position])
+        yield tuple(tuple(pattern) for pattern in patterns)
+
+
+def enum_subsequence_keys(encoded_sequence, start: int = 1, stop: int = None, typecode: str = "B"):
+    """
+    Generator over the non-empty subsequences of a sequence of symbol ids, in the Gray-code order of
+    enum_subsequences_gray, yielding each pattern as an int key: the ids + 1 of its symbols, first symbol lowest,
+    in fields of the width of 'typecode' (an array typecode whose items hold the largest id + 1). Equal patterns
+    have equal keys and different patterns different ones; decode_subsequence_key gives the pattern back.
+
+    The key is updated from one subset to the next by splicing one field in or out with shifts and masks computed
+    once, rather than rebuilt from the pattern.
+    """
+    length = len(encoded_sequence)
+    if stop is None:
+        stop = 2 ** length
+    if start >= stop:
+        return
+    width = 8 * array(typecode).itemsize
+    shifts = [width * i for i in range(length + 1)]
+    masks = [(1 << shift) - 1 for shift in shifts]
+    digits = [symbol_id + 1 for symbol_id in encoded_sequence]
+
+    gray_code = start ^ (start >> 1)
+    positions = [i for i in range(length) if gray_code >> i & 1]
+    key = 0
+    for i, position in enumerate(positions):
+        key |= digits[position] << shifts[i]
+    yield key
+    for rank in range(start + 1, stop):
+        position = (rank & -rank).bit_length() - 1
+        i = bisect_left(positions, position)
+        low = key & masks[i]
+        if i < len(positions) and positions[i] == position:
+            del positions[i]
+            key = low | key >> shifts[i + 1] << shifts[i]
+        else:
+            positions.insert(i, position)
+            key = low | digits[position] << shifts[i] | (key ^ low) << width
+        yield key
+
+
+def decode_subsequence_key(key: int, typecode: str = "B") -> array:
+    """
+    Returns the symbol ids + 1 of the pattern of an enum_subsequence_keys key
+    """
+    itemsize = array(typecode).itemsize
+    return array(typecode, key.to_bytes((key.bit_length() + 8 * itemsize - 1) // (8 * itemsize) * itemsize,
+                                        "little"))
+
+
+def count_subsequence_keys(encoded_sequence, start: int = 1, stop: int = None, typecode: str = "B") -> dict:
+    """
+    Returns {key: count} over the subsequences of ranks start, ..., stop - 1 (see enum_subsequence_keys)
+    """
+    pattern_counts = {}
+    for key in enum_subsequence_keys(encoded_sequence, start=start, stop=stop, typecode=typecode):
+        pattern_counts[key] = pattern_counts.get(key, 0) + 1
+    return pattern_counts
+
+
+def _encode_for_keys(sequence) -> tuple:
+    # (None followed by the distinct symbols in order of first occurrence, so that a key's field indexes its
+    # symbol, the array typecode of the fields, the sequence as ids)
+    symbols = list(dict.fromkeys(sequence))
+    symbol_ids = {symbol: symbol_id for symbol_id, symbol in enumerate(symbols)}
+    typecode = "B" if len(symbols) < 2 ** 8 else "H" if len(symbols) < 2 ** 16 else "L"
+    return [None] + symbols, typecode, [symbol_ids[symbol] for symbol in sequence]
+
+
+def _decode_key_counts(key_counts: dict, symbols: list, typecode: str) -> dict:
+    if typecode == "B":
+        # the bytes of the key are its fields
+        return {tuple([symbols[digit] for digit in key.to_bytes((key.bit_length() + 7) // 8, "little")]): count
+                for key, count in key_counts.items()}
+    return {tuple([symbols[digit] for digit in decode_subsequence_key(key, typecode)]): count
+            for key, count in key_counts.items()}
+
+
+def count_subsequences_exact(sequence) -> dict:
+    """
+    Returns {pattern: count} over all the non-empty subsequences of 'sequence', in the order the Gray-code walk
+    first meets them. Patterns are counted by their enum_subsequence_keys keys, and only the distinct ones are
+    decoded back into tuples of symbols.
+    """
+    symbols, typecode, encoded_sequence = _encode_for_keys(sequence)
+    return _decode_key_counts(count_subsequence_keys(encoded_sequence, typecode=typecode), symbols, typecode)
+
+
+def _count_rank_range(task) -> dict:
+    # patterns are counted by their int keys, which are cheaper to hash and to send between processes
+    encoded_sequence, typecode, start, stop = task
+    return count_subsequence_keys(encoded_sequence, start=start, stop=stop, typecode=typecode)
+
+
+def _merge_pattern_counts(pair) -> dict:
+    pattern_counts, other_pattern_counts = pair
+    for pattern, count in other_pattern_counts.items():
+        pattern_counts[pattern] = pattern_counts.get(pattern, 0) + count
+    return pattern_counts
+
+
+def count_subsequences_parallel(sequence, processes: int, num_ranges: int = None) -> dict:
+    """
+    Returns {pattern: count} over all the non-empty subsequences of 'sequence', counted in a pool of 'processes'.
+
+    The Gray-code ranks 1, ..., 2^n - 1 are split into 'num_ranges' contiguous ranges (by default one per process),
+    each worker counts the subsets of a range into its own table, and the tables are merged pairwise, neighbours
+    first, in a tree reduction run on the same pool. Merging neighbours keeps the patterns in the order in which
+    the serial walk first meets them, so the result is the same as FrequencyDistribution's.
+    """
+    symbols, typecode, encoded_sequence = _encode_for_keys(sequence)
+    num_ranks = 2 ** len(sequence)
+    if num_ranges is None:
+        num_ranges = processes
+    num_ranges = max(1, min(num_ranges, num_ranks - 1))
+    bounds = [1 + (num_ranks - 1) * i // num_ranges for i in range(num_ranges + 1)]
+    tasks = [(encoded_sequence, typecode, bounds[i], bounds[i + 1]) for i in range(num_ranges)]
+
+    with multiprocessing.Pool(processes) as pool:
+        tables = pool.map(_count_rank_range, tasks)
+        while len(tables) > 1:
+            merged = pool.map(_merge_pattern_counts, zip(tables[0::2], tables[1::2]))
+            tables = merged + tables[-1:] if len(tables) % 2 == 1 else merged
+    if len(tables) == 0:
+        return {}
+    return _decode_key_counts(tables[0], symbols, typecode)
 
 
 # e.g. indices = [1,4,7] returns [sequence[1], sequence[4], sequence[7]]
@@ -1,45 +1,167 @@
 import math
 
 from Privacy import Entropy
-from Privacy.Distributions import ProbabilityDistribution, JointProbabilityDistribution
+from Privacy.Distributions import Distribution, FrequencyDistribution, ProbabilityDistribution, \
+    JointProbabilityDistribution, count_distinct_subsequences
 from Sanitise import Helper
 from Sanitise.Helper import GeneralisationFunction
 
 
+def entropy_of_counts(counts, total=None):
+    # H = log N - (1/N) * sum(c * log c), straight from the event counts c (N = sum of the counts)
+    if total is None:
+        total = sum(counts)
+    if total == 0:
+        return 0
+    return math.log2(total) - math.fsum([count * math.log2(count) for count in counts if count > 0]) / total
+
+
 def shannon_entropy(prob_distr: ProbabilityDistribution):
-    entropy_inner_sum = 0
-    for event in prob_distr.get_events():
-        prob_event = prob_distr[event]
-        if prob_event != 0:
-            entropy_inner_sum += prob_event * math.log(1 / prob_event, 2)
-        else:
-            continue
-    return entropy_inner_sum
+    return entropy_of_counts(prob_distr.counts, prob_distr.total())
+
+
+def max_inference_gain(input_sequence) -> float:
+    """
+    Returns an upper bound of the inference gain of any generalisation of 'input_sequence', exact or bounded:
+    I(S;G) <= H(S) <= log2 of the number of distinct patterns S can hold
+    """
+    num_patterns = count_distinct_subsequences(input_sequence)
+    return math.log2(num_patterns) if num_patterns > 0 else 0
+
+
+def generalised_shannon_entropy(frequencies: Distribution, generalisation_strategies: GeneralisationFunction):
+    """
+    Returns H(G) given the subsequence counts of the input sequence, G being the distribution of the same
+    subsequences generalised by 'generalisation_strategies'.
+
+    Each generalised pattern is a function of its input pattern, so H(S|G) = H(S) - H(G) and the inference gain
+    I(S;G) of 'generalisation_strategies' is exactly H(G).
+    """
+    bucket_counts = {}
+    for event, index in frequencies.event_index.items():
+        generalised_event = tuple([generalisation_strategies[symbol] for symbol in event])
+        bucket_counts[generalised_event] = bucket_counts.get(generalised_event, 0) + frequencies.counts[index]
+    return entropy_of_counts(bucket_counts.values(), frequencies.total())
+
+
+class InferenceGainEvaluator:
+    """
+    Incremental inference gain of generalisation functions close to a current one.
+
+    The evaluator keeps the subsequence counts of the input sequence, the bucket of each of its patterns under
+    the current generalisation function g (the generalised pattern, i.e. the G event it is counted in), the count
+    of each bucket and sum(C * log C) over the buckets. Since I(S;G) = H(G) = log N - (1/N) * sum(C * log C),
+    the gain of a g' that only moves some leaves is found by moving the patterns that contain one of those leaves
+    to their new buckets: the cost is the number of such patterns, not a rebuild of S, G and their joint
+    distribution.
+    """
+
+    def __init__(self, input_sequence=None, generalisation_strategies: GeneralisationFunction = None,
+                 frequencies: Distribution = None, max_pattern_length: int = None):
+        if frequencies is None:
+            frequencies = FrequencyDistribution(input_sequence, max_length=max_pattern_length)
+        self.__events = list(frequencies.event_index.keys())
+        self.__counts = [frequencies.counts[index] for index in frequencies.event_index.values()]
+        self.__total = sum(self.__counts)
+        self.__events_with_symbol = {}  # symbol -> indices of the events containing it
+        for i, event in enumerate(self.__events):
+            for symbol in set(event):
+                self.__events_with_symbol.setdefault(symbol, []).append(i)
+
+        self.__g = {}
+        self.__buckets = []
+        self.__bucket_counts = {}
+        self.__sum_c_log_c = 0
+        if generalisation_strategies is not None:
+            self.rebase(generalisation_strategies)
+        self.num_patterns_moved = 0
+
+    def __generalise(self, event, g):
+        return tuple([g[symbol] for symbol in event])
+
+    def rebase(self, generalisation_strategies: GeneralisationFunction):
+        """
+        Makes 'generalisation_strategies' the current generalisation function
+        """
+        self.__g = {symbol: generalisation_strategies[symbol] for symbol in self.__events_with_symbol.keys()}
+        self.__buckets = [self.__generalise(event, self.__g) for event in self.__events]
+        self.__bucket_counts = {}
+        for bucket, count in zip(self.__buckets, self.__counts):
+            self.__bucket_counts[bucket] = self.__bucket_counts.get(bucket, 0) + count
+        self.__sum_c_log_c = math.fsum([count * math.log2(count) for count in self.__bucket_counts.values()])
+
+    def __gain(self, sum_c_log_c):
+        if self.__total == 0:
+            return 0
+        return math.log2(self.__total) - sum_c_log_c / self.__total
+
+    def gain(self) -> float:
+        """
+        Returns the inference gain of the current generalisation function
+        """
+        return self.__gain(self.__sum_c_log_c)
+
+    def __changes(self, generalisation_strategies: GeneralisationFunction) -> dict:
+        return {symbol: generalisation_strategies[symbol] for symbol in self.__g.keys()
+                if generalisation_strategies[symbol] != self.__g[symbol]}
+
+    def gain_of_refinement(self, changes: dict) -> float:
+        """
+        Returns the inference gain of the current generalisation function with the mappings in 'changes'
+        ({leaf symbol: new generalisation symbol}) replaced
+        """
+        g = dict(self.__g)
+        g.update(changes)
+        moved_events = set()
+        for symbol in changes.keys():
+            moved_events.update(self.__events_with_symbol.get(symbol, []))
+
+        # changes in the counts of the buckets that the moved patterns leave or join
+        deltas = {}
+        for i in moved_events:
+            new_bucket = self.__generalise(self.__events[i], g)
+            if new_bucket != self.__buckets[i]:
+                deltas[self.__buckets[i]] = deltas.get(self.__buckets[i], 0) - self.__counts[i]
+                deltas[new_bucket] = deltas.get(new_bucket, 0) + self.__counts[i]
+        self.num_patterns_moved += len(moved_events)
+
+        removed, added = [], []
+        for bucket, delta in deltas.items():
+            count = self.__bucket_counts.get(bucket, 0)
+            if count > 0:
+                removed.append(count * math.log2(count))
+            if count + delta > 0:
+                added.append((count + delta) * math.log2(count + delta))
+        return self.__gain(self.__sum_c_log_c - math.fsum(removed) + math.fsum(added))
+
+    def gain_of(self, generalisation_strategies: GeneralisationFunction) -> float:
+        """
+        Returns the inference gain of 'generalisation_strategies', visiting only the patterns that contain a
+        symbol it maps differently from the current generalisation function
+        """
+        return self.gain_of_refinement(self.__changes(generalisation_strategies))
 
 
 def conditional_shannon_entropy(prob_distr_Y: ProbabilityDistribution, prob_distr_X: ProbabilityDistribution,
                                 joint: JointProbabilityDistribution):
     """
-    Returns the shannon entropy of A conditioned on B (i.e. H(A|B))
+    Returns the shannon entropy of Y conditioned on X (i.e. H(Y|X))
 
-    In the case of these algorithms, each joint probability P[A_i,B_i] is simplified to P[A_i] as they are equivalent.
-    This is not true for the general case of conditional shannon entropy.
+    The events of 'joint' are (Y event, X event) pairs, as built by JointProbabilityDistribution(Y sequence,
+    X sequence). Pairs that never occur together contribute nothing, so only the stored joint events are visited.
     """
-    events_X, events_Y = prob_distr_X.get_events(), prob_distr_Y.get_events()
+    joint_total, X_total = joint.total(), prob_distr_X.total()
+    if joint_total == 0:
+        return 0
     entropy_inner_sum = 0
-    for event_X in events_X:
-        for event_Y in events_Y:
-            prob_event_X, prob_event_Y = prob_distr_X[event_X], prob_distr_Y[event_Y]
-            # simplification made in the paper as they are equivalent in our unique case
-            # of sensitive/generalised patterns in input/output sequences
-            # joint_prob = prob_event_Y  # P[p,ph] = P[p] because P[ph|p] = 1; unique solution for each p
-
-            joint_prob = joint.get(event_X, event_Y)
-            # FIXME sometimes joint_prob is None - why?
-            if joint_prob == 0:
-                continue
-            cond_prob = joint_prob / prob_event_X  # P(Y_i | X_i) = P(Y_i, X_i) / P(X_i)
-            entropy_inner_sum += joint_prob * math.log(1 / cond_prob, 2)
+    for (event_Y, event_X), index in joint.event_index.items():
+        joint_count = joint.counts[index]
+        if joint_count == 0:
+            continue
+        # P(Y_i | X_i) = P(Y_i, X_i) / P(X_i)
+        joint_prob = joint_count / joint_total
+        prob_event_X = prob_distr_X.get_count(event_X) / X_total
+        entropy_inner_sum += joint_prob * math.log2(prob_event_X / joint_prob)
     return entropy_inner_sum
 
 
@@ -53,15 +175,17 @@ def mutual_information(a: ProbabilityDistribution, b: ProbabilityDistribution, j
         print(f"H({a}) = {H_S:.2f}")
         print(f"H({a}|{b}) = {H_S_giv_G:.2f}")
         print()
-    return shannon_entropy(a) - conditional_shannon_entropy(a, b, joint)
+    return I_S_G
 
 
-def inference_gain(input_sequence, sensitive_patterns, generalisation_strategies: GeneralisationFunction):
+# With 'max_pattern_length', the distributions only cover patterns of at most that many symbols (approximate mode)
+def inference_gain(input_sequence, sensitive_patterns, generalisation_strategies: GeneralisationFunction,
+                   max_pattern_length: int = None):
     generalised_patterns = Helper.sanitise_pats(sensitive_patterns, generalisation_strategies)
     sanitised_sequence = Helper.sanitise_seq(input_sequence, generalisation_strategies)
     # Sensitive pattern probability distribution
-    S = ProbabilityDistribution(input_sequence)
+    S = ProbabilityDistribution(input_sequence, max_length=max_pattern_length)
     # Generalised pattern probability distribution
-    G = ProbabilityDistribution(sanitised_sequence)
-    joint_S_G = JointProbabilityDistribution(input_sequence, sanitised_sequence)
+    G = ProbabilityDistribution(sanitised_sequence, max_length=max_pattern_length)
+    joint_S_G = JointProbabilityDistribution(input_sequence, sanitised_sequence, max_length=max_pattern_length)
     return Entropy.mutual_information(S, G, joint_S_G)
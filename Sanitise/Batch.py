@@ -0,0 +1,155 @@
+import hashlib
+import multiprocessing
+from collections import Counter
+from typing import Union
+
+from Data.Index import SessionIndex
+from Privacy import Entropy
+from Sanitise import Helper, TopDown, Trees
+from Sanitise.Metrics import BatchMetrics, Metrics
+from Sanitise.Patterns import SensitivePatternSet
+from Sanitise.WarmStart import WarmStartCache
+
+# the BatchSanitiser each worker process of a parallel run sanitises with
+_worker_sanitiser = None
+
+
+def _init_worker(sanitiser):
+    global _worker_sanitiser
+    _worker_sanitiser = sanitiser
+
+
+def _sanitise_in_worker(sequence):
+    return _worker_sanitiser.sanitise_counted(sequence)
+
+
+class BatchSanitiser:
+    """
+    Sanitises many sessions with TopDown, under the same sensitive patterns, privacy level and taxonomy.
+    'top_down_options' are passed on to TopDown.sanitise_seq_top_down (e.g. max_pattern_length).
+    A TaxonomyTree is compiled first, so that it is cheap to send to worker processes.
+
+    Before TopDown, each session is triaged from a SessionIndex of the batch, and passed through unchanged if:
+        no-match    no sensitive pattern occurs in it, so TopDown would return it as it is
+        epsilon     epsilon is at least Entropy.max_inference_gain of it, an upper bound of H(S): every
+                    refinement satisfies epsilon, so TopDown would refine every symbol back to itself
+    The number of sessions per triage outcome is counted in 'triage_counts'. The sensitive patterns are compiled
+    once into a SensitivePatternSet, whose trie is walked against the index in triage and against each session in
+    the occurrence check of TopDown.
+
+    With 'warm_start', TopDown starts from the generalisation function of the nearest session already sanitised
+    (see WarmStartCache, which keeps the last 'warm_start_entries' sessions per set of matched sensitive patterns)
+    rather than from the all-root g. What it saved is counted in 'warm_start_counts': the sessions sanitised, those
+    warm started, the coarsening steps needed for epsilon, and the TopDown iterations run and saved. Each worker
+    process of a parallel run keeps its own cache.
+
+    If a Metrics registry is given as 'metrics', every session processed is recorded in it as it is yielded (see
+    BatchMetrics), e.g. to be served by a MetricsServer while the run goes on.
+    """
+    NO_MATCH = "no-match"
+    EPSILON = "epsilon"
+    SANITISE = "sanitise"
+
+    def __init__(self, sens_pats: list, epsilon: float,
+                 taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy], processes: int = None,
+                 chunk_size: int = 100, warm_start: bool = False, warm_start_entries: int = 64,
+                 metrics: Metrics = None, **top_down_options):
+        self.sens_pats = [list(sens_pat) for sens_pat in sens_pats]
+        self.pattern_set = SensitivePatternSet(self.sens_pats)
+        self.epsilon = epsilon
+        self.taxonomy = taxonomy_tree.compile() if isinstance(taxonomy_tree, Trees.TaxonomyTree) else taxonomy_tree
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.top_down_options = top_down_options
+        self.triage_counts = Counter()
+        self.warm_start = None
+        if warm_start:
+            self.warm_start = WarmStartCache(self.sens_pats, epsilon, self.taxonomy, max_entries=warm_start_entries)
+        self.warm_start_counts = Counter()
+        self.metrics = BatchMetrics(metrics) if metrics is not None else None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["processes"] = None  # a worker sanitises its own sequences serially
+        state["metrics"] = None  # and its results are recorded by the parent process
+        return state
+
+    def parameters(self) -> dict:
+        """
+        Returns the parameters that determine the output, e.g. to be recorded with it
+        """
+        return {
+            "epsilon": self.epsilon,
+            "sensitive_patterns": self.sens_pats,
+            "taxonomy_sha256": hashlib.sha256(self.taxonomy.to_bytes()).hexdigest(),
+            "top_down_options": {option: repr(value) for option, value in sorted(self.top_down_options.items())},
+        }
+
+    def sanitise_one(self, sequence: list) -> list:
+        sanitised, counts, stats = self.sanitise_counted(sequence)
+        self.warm_start_counts.update(counts)
+        return sanitised
+
+    def sanitise_counted(self, sequence: list):
+        """
+        Returns (the sanitised sequence, a Counter of what warm starting did for it, the TopDownStats of its run)
+        """
+        options = dict(self.top_down_options)
+        options.pop("stats", None)  # each session's run is reported on its own
+        stats = TopDown.TopDownStats()
+        if self.warm_start is None or not TopDown.do_any_sens_pats_occur(sequence, self.pattern_set):
+            return TopDown.sanitise_seq_top_down(self.pattern_set, sequence, self.epsilon, self.taxonomy,
+                                                 stats=stats, **options), Counter(), stats
+        g_final, counts = self.warm_start.generalise(sequence, stats=stats, **options)
+        return Helper.generalise_seq(sequence, g_final), counts, stats
+
+    def triage(self, sequences: list, index: SessionIndex = None) -> list:
+        """
+        Returns the triage outcome of each of 'sequences'. 'index' is a SessionIndex of 'sequences'.
+        """
+        if index is None:
+            index = SessionIndex(sequences)
+        outcomes = [BatchSanitiser.NO_MATCH] * len(sequences)
+        for session in index.candidate_sessions(self.pattern_set):
+            if not self.pattern_set.occurs_in(lambda symbol, position: index.next_position(session, symbol, position),
+                                              index.session_length(session)):
+                continue
+            if self.epsilon >= Entropy.max_inference_gain(sequences[session]):
+                outcomes[session] = BatchSanitiser.EPSILON
+            else:
+                outcomes[session] = BatchSanitiser.SANITISE
+        return outcomes
+
+    def sanitise(self, sequences, index: SessionIndex = None):
+        """
+        Generator over the sanitised sequences, in the order of 'sequences'.
+        'index' is a SessionIndex of 'sequences', built here if not given.
+        """
+        sequences = list(sequences)
+        outcomes = self.triage(sequences, index=index)
+        self.triage_counts.update(outcomes)
+        to_sanitise = (sequence for sequence, outcome in zip(sequences, outcomes)
+                       if outcome == BatchSanitiser.SANITISE)
+
+        if self.metrics is not None:
+            self.metrics.start(workers=1 if self.processes is None else max(self.processes, 1))
+        if self.processes is None or self.processes <= 1:
+            yield from self.__collect(sequences, outcomes, map(self.sanitise_counted, to_sanitise))
+            return
+        with multiprocessing.Pool(self.processes, initializer=_init_worker, initargs=(self,)) as pool:
+            yield from self.__collect(sequences, outcomes,
+                                      pool.imap(_sanitise_in_worker, to_sanitise, chunksize=self.chunk_size))
+
+    def __collect(self, sequences, outcomes, sanitised):
+        # the sanitised sequences in order, with the pass-throughs, counting what was done for each
+        for sequence, outcome in zip(sequences, outcomes):
+            if outcome != BatchSanitiser.SANITISE:
+                if self.metrics is not None:
+                    self.metrics.session(len(sequence), outcome)
+                yield sequence
+                continue
+            sanitised_sequence, counts, stats = next(sanitised)
+            self.warm_start_counts.update(counts)
+            if self.metrics is not None:
+                self.metrics.session(len(sequence), outcome, stats=stats, warm_start_counts=counts)
+            yield sanitised_sequence
@@ -1,6 +1,7 @@
 import math
 
 from Sanitise import Helper, Trees
+from Sanitise.Context import SequenceContext
 from Sanitise.Helper import GeneralisationFunction
 from Sanitise.Trees import TaxonomyTree
 
@@ -137,7 +138,10 @@ def init_centroids(sensitive_patterns):
 
 
 def sanitise_seq_bottom_up(sens_pats: list, input_sequence: list, epsilon: float,
-                           taxonomy_tree: Trees.TaxonomyTree) -> list:
+                           taxonomy_tree: Trees.TaxonomyTree, context: SequenceContext = None) -> list:
+    # 'context' is a SequenceContext of input_sequence, e.g. shared with a TopDown run on the same sequence
+    if context is None:
+        context = SequenceContext(input_sequence)
     #  lines 2-3
     clusters = ClusterList(taxonomy_tree, input_sequence)
     for centroid in init_centroids(sens_pats):
@@ -166,7 +170,7 @@ def sanitise_seq_bottom_up(sens_pats: list, input_sequence: list, epsilon: float
         #  line 14
         # TODO update g_final according to LCGP(p1,p2) >> updates the centroids accordingly
 
-        inf_gain = Helper.inference_gain(input_sequence, sens_pats, g_final)
+        inf_gain = context.inference_gain(g_final)
 
     #  lines 16-17
     return Helper.generalise_seq(input_sequence, g_final)
@@ -0,0 +1,71 @@
+from array import array
+from collections import Counter
+
+from Privacy import Entropy
+from Privacy.Distributions import FrequencyDistribution
+from Sanitise import Helper
+from Sanitise.Helper import GeneralisationFunction
+from Sanitise.Occurrences import OccurrenceIndex
+
+
+class SequenceContext:
+    """
+    What the sanitisation algorithms need to know about one input sequence, built once and shared by every run
+    on it (TopDown, BottomUp, several epsilons):
+        histogram           symbol -> number of occurrences, for sorting the alphabet and for utility loss
+        frequencies         the subsequence counts of the sequence (the distribution S), built on first use
+        occurrence_index    an OccurrenceIndex, for the sensitive pattern occurrence checks, built on first use
+        symbols, encoded    the interned encoding: the distinct symbols in order of first occurrence, and the
+                            sequence as an array of their ids
+    With 'max_pattern_length', S only covers the patterns of at most that many symbols (approximate mode).
+    With 'processes' > 1, exact counts for S are computed in a process pool.
+    """
+
+    def __init__(self, input_sequence: list, max_pattern_length: int = None, processes: int = None):
+        self.sequence = list(input_sequence)
+        self.max_pattern_length = max_pattern_length
+        self.processes = processes
+        self.histogram = Counter(self.sequence)
+
+        self.symbol_ids = {}
+        self.symbols = []
+        self.encoded = array("i")
+        for symbol in self.sequence:
+            if symbol not in self.symbol_ids:
+                self.symbol_ids[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+            self.encoded.append(self.symbol_ids[symbol])
+        self.__frequencies = None
+        self.__occurrence_index = None
+
+    def __len__(self):
+        return len(self.sequence)
+
+    def __repr__(self):
+        return f"<SequenceContext: {len(self.sequence)} events, {len(self.symbols)} distinct symbols>"
+
+    @property
+    def frequencies(self) -> FrequencyDistribution:
+        if self.__frequencies is None:
+            self.__frequencies = FrequencyDistribution(self.sequence, max_length=self.max_pattern_length,
+                                                       processes=self.processes)
+        return self.__frequencies
+
+    @property
+    def occurrence_index(self) -> OccurrenceIndex:
+        if self.__occurrence_index is None:
+            self.__occurrence_index = OccurrenceIndex(self.sequence)
+        return self.__occurrence_index
+
+    def occurs_any(self, sens_pats) -> bool:
+        return self.occurrence_index.occurs_any(sens_pats)
+
+    def utility_loss(self, g: GeneralisationFunction, cost_func) -> float:
+        return Helper.utility_loss_of_histogram(self.histogram, g, cost_func)
+
+    def inference_gain(self, g: GeneralisationFunction) -> float:
+        # I(S;G) = H(G), from the counts of S (see Entropy.generalised_shannon_entropy)
+        return Entropy.generalised_shannon_entropy(self.frequencies, g)
+
+    def inference_gain_evaluator(self, g: GeneralisationFunction = None) -> Entropy.InferenceGainEvaluator:
+        return Entropy.InferenceGainEvaluator(generalisation_strategies=g, frequencies=self.frequencies)
@@ -0,0 +1,160 @@
+from array import array
+from typing import Union
+
+from Data.Index import SessionIndex
+from Privacy import Entropy
+from Sanitise import Helper, TopDown, Trees
+from Sanitise.Context import SequenceContext
+from Sanitise.Helper import GeneralisationFunction
+from Sanitise.Patterns import SensitivePatternSet
+
+
+class GlobalGeneralisation:
+    """
+    A dataset held in memory for publishing under one generalisation function g shared by every session.
+
+    Every symbol of the taxonomy is given an int id (the leaves first) and the sessions are concatenated into a
+    single buffer of ids, with the offset of each session. A g is turned into a lookup table from leaf id to
+    generalisation symbol id, and is applied to the whole buffer at once by bytes.translate. A sessions x leaves
+    histogram matrix gives the utility loss of a g per session (a row times the costs of g) and for the dataset
+    (the column sums times the costs of g) without visiting the sessions.
+
+    search() refines a global g like TopDown does, but a refinement is only accepted if every session in which a
+    sensitive pattern occurs still satisfies epsilon.
+    """
+
+    def __init__(self, sequences, taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy]):
+        self.taxonomy_tree = taxonomy_tree
+        self.leaves = list(taxonomy_tree.get_leaf_symbols())
+        self.symbols = list(self.leaves)
+        self.symbol_ids = {symbol: symbol_id for symbol_id, symbol in enumerate(self.symbols)}
+        for leaf in self.leaves:
+            for symbol in taxonomy_tree.path_symbols_from_root(leaf):
+                if symbol not in self.symbol_ids:
+                    self.symbol_ids[symbol] = len(self.symbols)
+                    self.symbols.append(symbol)
+        self.__typecode = "B" if len(self.symbols) <= 256 else "i"
+
+        num_leaves = len(self.leaves)
+        self.offsets = array("q", [0])
+        ids = array(self.__typecode)
+        self.histogram = array("q")
+        for sequence in sequences:
+            row = [0] * num_leaves
+            for symbol in sequence:
+                symbol_id = self.symbol_ids[symbol]
+                ids.append(symbol_id)
+                row[symbol_id] += 1
+            self.histogram.extend(row)
+            self.offsets.append(len(ids))
+        self.data = ids.tobytes() if self.__typecode == "B" else ids
+        self.column_sums = [sum(self.histogram[leaf_id::num_leaves]) for leaf_id in range(num_leaves)]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return f"<GlobalGeneralisation: {len(self):,} sessions, {self.offsets[-1]:,} events>"
+
+    def session(self, i: int, data=None) -> list:
+        """
+        Returns session i, decoded from 'data' (by default the input buffer, otherwise a generalised one)
+        """
+        data = self.data if data is None else data
+        return [self.symbols[symbol_id] for symbol_id in data[self.offsets[i]:self.offsets[i + 1]]]
+
+    def sessions(self, data=None):
+        for i in range(len(self)):
+            yield self.session(i, data)
+
+    def lookup_table(self, g: GeneralisationFunction):
+        # leaf id -> id of its generalisation symbol; the ids of the other symbols are kept
+        table = list(range(len(self.symbols)))
+        for leaf_id, leaf in enumerate(self.leaves):
+            table[leaf_id] = self.symbol_ids[g[leaf]]
+        if self.__typecode == "B":
+            return bytes(table + list(range(len(table), 256)))
+        return table
+
+    def apply(self, g: GeneralisationFunction):
+        """
+        Returns the buffer of every session generalised by g, in one pass over the dataset
+        """
+        table = self.lookup_table(g)
+        if self.__typecode == "B":
+            return self.data.translate(table)
+        return array("i", [table[symbol_id] for symbol_id in self.data])
+
+    def generalise(self, g: GeneralisationFunction) -> list:
+        return list(self.sessions(self.apply(g)))
+
+    def __costs(self, g: GeneralisationFunction) -> list:
+        cost_func = self.taxonomy_tree.get_cost_func()
+        return [cost_func[(leaf, g[leaf])] for leaf in self.leaves]
+
+    def utility_loss(self, g: GeneralisationFunction) -> float:
+        return Helper.utility_loss_of_histogram(dict(zip(self.leaves, self.column_sums)), g,
+                                                self.taxonomy_tree.get_cost_func())
+
+    def utility_losses(self, g: GeneralisationFunction) -> list:
+        """
+        Returns the utility loss of each session under g
+        """
+        costs = self.__costs(g)
+        num_leaves = len(self.leaves)
+        return [sum([count * cost for count, cost in zip(self.histogram[row:row + num_leaves], costs)])
+                for row in range(0, len(self.histogram), num_leaves)]
+
+    def search(self, sens_pats: list, epsilon: float, max_pattern_length: int = None) -> GeneralisationFunction:
+        """
+        Returns a global g, refined greedily from the all-root g: at each step the candidate refinements (one
+        level down the subtree of a leaf) are tried by increasing dataset utility loss, and the first one under
+        which every session that contains a sensitive pattern satisfies epsilon is accepted. A candidate that
+        fails is pruned: its refinements, having at least its inference gain, would fail too.
+
+        The privacy of a session is checked with the cheapest test that decides it: sessions for which epsilon is
+        at least the Entropy.max_inference_gain bound never need checking, a generalised session whose own bound
+        is within epsilon passes, and only then is H(G) computed from the session's SequenceContext. Identical
+        sessions are checked once, and the session that failed last is checked first.
+        """
+        index = SessionIndex(self.sessions())
+        pattern_set = SensitivePatternSet(sens_pats)
+        to_check = {}
+        for i in index.candidate_sessions(pattern_set):
+            if pattern_set.occurs_in(lambda symbol, position: index.next_position(i, symbol, position),
+                                     index.session_length(i)):
+                sequence = tuple(self.session(i))
+                if sequence not in to_check and epsilon < Entropy.max_inference_gain(sequence):
+                    to_check[sequence] = None
+        contexts = [SequenceContext(sequence, max_pattern_length=max_pattern_length) for sequence in to_check]
+
+        def admissible(g_temp):
+            for position, context in enumerate(contexts):
+                generalised = Helper.generalise_seq(context.sequence, g_temp)
+                if Entropy.max_inference_gain(generalised) <= epsilon:
+                    continue
+                if context.inference_gain(g_temp) > epsilon:
+                    contexts.insert(0, contexts.pop(position))
+                    return False
+            return True
+
+        working_alphabet = Helper.Alphabet(self.leaves)
+        working_alphabet.sort_by_freq(dict(zip(self.leaves, self.column_sums)))
+        g_final = GeneralisationFunction(working_alphabet,
+                                         default_generalisation=self.taxonomy_tree.get_root_symbol())
+        while len(working_alphabet) > 0:
+            candidates = {}
+            for a_i in working_alphabet:
+                if g_final[a_i] != a_i:
+                    symbol, leaves, g_temp = TopDown.refinement_candidate(a_i, g_final, self.taxonomy_tree)
+                    candidates.setdefault(symbol, (leaves, g_temp))
+            pruned = [a_i for a_i in working_alphabet if g_final[a_i] == a_i]
+            for leaves, g_temp in sorted(candidates.values(), key=lambda candidate: self.utility_loss(candidate[1])):
+                if admissible(g_temp):
+                    g_final = g_temp
+                    break
+                pruned += leaves
+            for a_i in dict.fromkeys(pruned):
+                if a_i in working_alphabet:
+                    working_alphabet.remove(a_i)
+        return g_final
@@ -0,0 +1,155 @@
+import logging
+import math
+import random
+import time
+from typing import Union
+
+from Privacy.Distributions import FrequencyDistribution, count_run_choices, count_subsequences, run_length_encode
+from Sanitise import TopDown, Trees
+
+logger = logging.getLogger(__name__)
+
+# the default cost model constants, shared with the ExecutionPlanner (see ResourceGovernor.calibrate)
+SECONDS_PER_SUBSEQUENCE = 2e-6
+BYTES_PER_PATTERN = 250
+
+
+class Decision:
+    EXACT = "exact"
+    APPROXIMATE = "approximate"
+    MOST_GENERAL = "most-general"
+
+    def __init__(self, mode, sequence_length, predicted_seconds, predicted_bytes, max_pattern_length=None):
+        self.mode = mode
+        self.sequence_length = sequence_length
+        self.predicted_seconds = predicted_seconds
+        self.predicted_bytes = predicted_bytes
+        self.max_pattern_length = max_pattern_length
+
+    def __repr__(self):
+        bound = f", max pattern length {self.max_pattern_length}" if self.max_pattern_length is not None else ""
+        return (f"<Decision: {self.mode} for length {self.sequence_length}{bound}, "
+                f"predicted {self.predicted_seconds:.3g}s and {self.predicted_bytes / 2 ** 20:.3g}MiB>")
+
+
+class ResourceGovernor:
+    """
+    Admission control for the sanitisation of a sequence, decided before any distribution is built.
+
+    A TopDown run builds S once, enumerating every subsequence (2^n - 1 for a sequence of n symbols, fewer when
+    counted run by run), and each of its inference gain evaluations (up to leaves x depth of the taxonomy) then
+    makes one pass over the distinct patterns of S. Its time is predicted at one step per subsequence, per
+    pattern visited and per symbol checked for each sensitive pattern, and its memory from S and the copy of its
+    counts kept by an incremental evaluator (see predict_cost, which the ExecutionPlanner uses too).
+    Depending on the budgets, a sequence is then sanitised:
+        exact           with the exact distributions
+        approximate     with distributions bounded to the longest patterns that fit the budgets
+        most-general    without running TopDown: every symbol is generalised to the root
+    Each decision is logged, so an outlier session is handled without taking down the batch.
+    """
+
+    def __init__(self, max_seconds: float = 60, max_bytes: int = 2 ** 30, min_pattern_length: int = 2,
+                 seconds_per_subsequence: float = SECONDS_PER_SUBSEQUENCE,
+                 bytes_per_pattern: int = BYTES_PER_PATTERN):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.min_pattern_length = min_pattern_length
+        self.seconds_per_subsequence = seconds_per_subsequence
+        self.bytes_per_pattern = bytes_per_pattern
+
+    @staticmethod
+    def calibrate(sequence_length=14, num_symbols=6, seed=0) -> float:
+        """
+        Returns the measured time, in seconds, to enumerate and count one subsequence on this machine
+        """
+        rand = random.Random(seed)
+        sequence = [rand.randrange(num_symbols) for i in range(sequence_length)]
+        start = time.perf_counter()
+        FrequencyDistribution(sequence)
+        return (time.perf_counter() - start) / count_subsequences(sequence_length)
+
+    @staticmethod
+    def max_distinct_patterns(sequence_length, num_symbols, max_pattern_length=None) -> int:
+        # there are at most C(n, k) and at most |alphabet|^k distinct patterns of length k
+        if max_pattern_length is None:
+            max_pattern_length = sequence_length
+        distinct_patterns, num_subsets = 0, 1
+        for k in range(1, min(max_pattern_length, sequence_length) + 1):
+            num_subsets = num_subsets * (sequence_length - k + 1) // k  # C(n, k)
+            distinct_patterns += min(num_subsets, num_symbols ** k)
+        return distinct_patterns
+
+    @staticmethod
+    def taxonomy_shape(taxonomy_tree) -> tuple:
+        # (number of leaves, depth)
+        leaves = taxonomy_tree.get_leaf_symbols()
+        return len(leaves), max(len(taxonomy_tree.path_symbols_from_root(leaf)) for leaf in leaves) - 1
+
+    @staticmethod
+    def predict_cost(length, alphabet_size, taxonomy_leaves, taxonomy_depth, max_pattern_length=None,
+                     run_choices=None, num_sens_pats=0, seconds_per_subsequence=SECONDS_PER_SUBSEQUENCE,
+                     bytes_per_pattern=BYTES_PER_PATTERN) -> tuple:
+        """
+        Returns the predicted (seconds, bytes) of one TopDown run on a sequence of 'length' symbols, of
+        'alphabet_size' distinct ones, with S bounded to 'max_pattern_length'; with 'run_choices', the sequence
+        has runs of repeated symbols and S is counted run by run (see count_run_choices)
+        """
+        num_evaluations = taxonomy_leaves * max(taxonomy_depth, 1)
+        subsequences = count_subsequences(length, max_pattern_length)
+        if run_choices is not None:
+            subsequences = min(subsequences, run_choices)
+        # 2^n overflows a float long before n reaches the length of the longest sessions
+        subsequences = float(subsequences) if subsequences.bit_length() < 1000 else math.inf
+        distinct_patterns = ResourceGovernor.max_distinct_patterns(length, alphabet_size, max_pattern_length)
+        distinct_patterns = min(subsequences, float(distinct_patterns) if distinct_patterns.bit_length() < 1000
+                                else math.inf)
+        steps = subsequences + num_evaluations * distinct_patterns + num_sens_pats * length
+        # S, and the copy of its counts kept by an incremental evaluator
+        return steps * seconds_per_subsequence, 2 * distinct_patterns * bytes_per_pattern
+
+    def estimate(self, sequence, taxonomy_tree, max_pattern_length=None, num_sens_pats=0):
+        """
+        Returns the predicted (seconds, bytes) of sanitising 'sequence' with TopDown
+        """
+        return ResourceGovernor.predict_cost(len(sequence), len(set(sequence)),
+                                             *ResourceGovernor.taxonomy_shape(taxonomy_tree),
+                                             max_pattern_length=max_pattern_length,
+                                             run_choices=count_run_choices(run_length_encode(sequence)),
+                                             num_sens_pats=num_sens_pats,
+                                             seconds_per_subsequence=self.seconds_per_subsequence,
+                                             bytes_per_pattern=self.bytes_per_pattern)
+
+    def __within_budget(self, seconds, num_bytes):
+        return seconds <= self.max_seconds and num_bytes <= self.max_bytes
+
+    def decide(self, sequence, taxonomy_tree, num_sens_pats=0) -> Decision:
+        seconds, num_bytes = self.estimate(sequence, taxonomy_tree, num_sens_pats=num_sens_pats)
+        if self.__within_budget(seconds, num_bytes):
+            decision = Decision(Decision.EXACT, len(sequence), seconds, num_bytes)
+        else:
+            # the cost grows with the bound, so look for the longest bound that still fits
+            decision = Decision(Decision.MOST_GENERAL, len(sequence), 0, 0)
+            for max_pattern_length in range(self.min_pattern_length, len(sequence)):
+                seconds, num_bytes = self.estimate(sequence, taxonomy_tree, max_pattern_length, num_sens_pats)
+                if not self.__within_budget(seconds, num_bytes):
+                    break
+                decision = Decision(Decision.APPROXIMATE, len(sequence), seconds, num_bytes,
+                                    max_pattern_length=max_pattern_length)
+        logger.info(f"{decision} (budget {self.max_seconds}s, {self.max_bytes / 2 ** 20:.3g}MiB)")
+        return decision
+
+    def sanitise(self, sens_pats: list, input_sequence: list, epsilon: float,
+                 taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy], executor=None,
+                 workers: int = None) -> list:
+        """
+        sanitise_seq_top_down, run in the mode decided for 'input_sequence'
+        """
+        decision = self.decide(input_sequence, taxonomy_tree, len(sens_pats))
+        if decision.mode == Decision.MOST_GENERAL:
+            if not TopDown.do_any_sens_pats_occur(input_sequence, sens_pats):
+                return input_sequence
+            return [taxonomy_tree.get_root_symbol()] * len(input_sequence)
+        # should the prediction be off, the time budget still holds: TopDown keeps its best refinement so far
+        return TopDown.sanitise_seq_top_down(sens_pats, input_sequence, epsilon, taxonomy_tree, executor=executor,
+                                             workers=workers, max_pattern_length=decision.max_pattern_length,
+                                             max_seconds=self.max_seconds)
@@ -1,4 +1,5 @@
 import math
+from collections import Counter
 
 
 def printer(*args, SILENT=True):
@@ -12,8 +13,11 @@ class Alphabet:
 
     # Returns an alphabet, sorted by the symbols' frequency of occurrence in sequence 'seq'
     def sort_by_freq_in_sequence(self, sequence):
-        symbol_frequencies = {a: sequence.count(a) for a in self.elements}
-        self.elements = sorted(self.elements, key=lambda a: symbol_frequencies[a], reverse=True)  # descending order
+        self.sort_by_freq(Counter(sequence))
+
+    # Sorts the alphabet by the symbols' number of occurrences given in 'histogram' ({symbol: count})
+    def sort_by_freq(self, histogram):
+        self.elements = sorted(self.elements, key=lambda a: histogram.get(a, 0), reverse=True)  # descending order
 
     def __unique(self, some_list):
         return list(set(some_list))
@@ -84,18 +88,20 @@ class GeneralisationFunction:
     def incr_generalisation_level(self, symbol):
         self.generalisation_level[symbol] += 1
 
+    def set_generalisation_level(self, symbol, level):
+        self.generalisation_level[symbol] = level
+
 
 def sanitise_seq(seq: list, generalisation_strategies: GeneralisationFunction) -> list:
     return [generalisation_strategies[symbol] for symbol in seq]
 
 
 def sanitise_pats(sensitive_patterns, generalisation_strategies: GeneralisationFunction):
-    sanitised_patterns = []
+    # distinct sanitised patterns, in order of first appearance
+    sanitised_patterns = {}
     for pattern in sensitive_patterns:
-        sanitised_pattern = sanitise_seq(pattern, generalisation_strategies)
-        if sanitised_pattern not in sanitised_patterns:
-            sanitised_patterns.append(sanitised_pattern)
-    return sanitised_patterns
+        sanitised_patterns.setdefault(tuple(sanitise_seq(pattern, generalisation_strategies)), None)
+    return [list(sanitised_pattern) for sanitised_pattern in sanitised_patterns.keys()]
 
 
 # returns a list of the occurrences of each pattern, in the pattern set, in the sequence
@@ -113,11 +119,12 @@ def sanitise_pats(sensitive_patterns, generalisation_strategies: GeneralisationF
 
 # Represented by UL(S,g,[c]) in pseudocode
 def utility_loss_by_generalising(input_sequence, g, c):
-    sanitised_sequence = generalise_seq(input_sequence, g)
-    utility_loss_sum = 0
-    for i in range(len(input_sequence)):
-        utility_loss_sum += c[(input_sequence[i], sanitised_sequence[i])]
-    return utility_loss_sum
+    return utility_loss_of_histogram(Counter(input_sequence), g, c)
+
+
+# UL(S,g,[c]) given the number of occurrences of each symbol of S ({symbol: count})
+def utility_loss_of_histogram(histogram, g, c):
+    return math.fsum([count * c[(symbol, g[symbol])] for symbol, count in histogram.items()])
 
 
 # pseudocode would be S_hat(S,g)
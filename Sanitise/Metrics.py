@@ -0,0 +1,241 @@
+import math
+import resource
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Data.Dataset import length_bucket
+
+# seconds per session, and inference gain calls per session
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60, 300)
+CALLS_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if len(labels) == 0:
+        return ""
+    return "{" + ",".join(f"{name}=\"{_escape(value)}\"" for name, value in labels) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics:
+    """
+    A registry of counters, gauges and histograms, each with optional labels, rendered in the Prometheus text
+    exposition format. It is thread safe, so it can be updated by a run while a MetricsServer serves it.
+    """
+    COUNTER = "counter"
+    GAUGE = "gauge"
+    HISTOGRAM = "histogram"
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__metrics = {}  # name -> (type, help, buckets, {labels: value or [bucket counts, sum, count]})
+
+    def __metric(self, name, metric_type, help_text, buckets=None):
+        if name not in self.__metrics:
+            self.__metrics[name] = (metric_type, help_text, buckets, {})
+        elif self.__metrics[name][0] != metric_type:
+            raise ValueError(f"Metric {name} is a {self.__metrics[name][0]}, not a {metric_type}.")
+        return self.__metrics[name][3]
+
+    def inc(self, name: str, value=1, help_text: str = "", **labels):
+        with self.__lock:
+            values = self.__metric(name, Metrics.COUNTER, help_text)
+            key = tuple(sorted(labels.items()))
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name: str, value, help_text: str = "", **labels):
+        with self.__lock:
+            self.__metric(name, Metrics.GAUGE, help_text)[tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value, help_text: str = "", buckets=SECONDS_BUCKETS, **labels):
+        with self.__lock:
+            values = self.__metric(name, Metrics.HISTOGRAM, help_text, buckets)
+            buckets = self.__metrics[name][2]
+            key = tuple(sorted(labels.items()))
+            if key not in values:
+                values[key] = [[0] * len(buckets), 0, 0]
+            histogram = values[key]
+            for i, upper in enumerate(buckets):
+                if value <= upper:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def get(self, name: str, **labels):
+        """
+        Returns the value of a counter or gauge, or the (sum, count) of a histogram, or None if never set
+        """
+        with self.__lock:
+            if name not in self.__metrics:
+                return None
+            metric_type, help_text, buckets, values = self.__metrics[name]
+            value = values.get(tuple(sorted(labels.items())))
+            if metric_type == Metrics.HISTOGRAM and value is not None:
+                return value[1], value[2]
+            return value
+
+    def total(self, name: str):
+        """
+        Returns the sum of a counter or gauge over all its labels, 0 if never set
+        """
+        with self.__lock:
+            if name not in self.__metrics:
+                return 0
+            return sum(self.__metrics[name][3].values())
+
+    def render(self) -> str:
+        lines = []
+        with self.__lock:
+            for name, (metric_type, help_text, buckets, values) in sorted(self.__metrics.items()):
+                if help_text:
+                    lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in sorted(values.items()):
+                    if metric_type != Metrics.HISTOGRAM:
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    bucket_counts, total, count = value
+                    for upper, bucket_count in zip(list(buckets) + [math.inf], bucket_counts + [count]):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(upper)),))} "
+                                     f"{bucket_count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class BatchMetrics:
+    """
+    The metrics of a BatchSanitiser run, kept in a Metrics registry:
+        sanitiser_sessions_total                        sessions processed, per triage outcome
+        sanitiser_events_total                          events of the sessions processed
+        sanitiser_throughput_sessions_per_second        sessions processed per second since the run started
+        sanitiser_session_seconds                       TopDown time per session, per sequence length bucket
+        sanitiser_inference_gain_calls                  inference gain evaluations per session
+        sanitiser_triage_pass_through_ratio             share of the sessions passed through without TopDown
+        sanitiser_warm_start_lookups_total / _hits_total, sanitiser_warm_start_hit_ratio
+                                                        warm start cache lookups, and those that found a session
+        sanitiser_workers, sanitiser_worker_utilisation the worker processes, and the share of their time spent
+                                                        in TopDown since the run started
+        sanitiser_max_resident_memory_bytes             peak resident memory of this process and of its finished
+                                                        worker processes
+    """
+
+    def __init__(self, metrics: Metrics = None):
+        self.metrics = metrics if metrics is not None else Metrics()
+        self.__start = None
+        self.__workers = 1
+        self.__busy_seconds = 0.0
+
+    def start(self, workers: int = 1):
+        self.__start = time.perf_counter()
+        self.__workers = workers
+        self.__busy_seconds = 0.0
+        self.metrics.set("sanitiser_workers", workers, "Worker processes of the run")
+
+    def session(self, length: int, outcome: str, stats=None, warm_start_counts=None):
+        """
+        Records a processed session: its triage outcome, and for a sanitised session the TopDownStats and warm
+        start counts of its run
+        """
+        metrics = self.metrics
+        metrics.inc("sanitiser_sessions_total", 1, "Sessions processed, per triage outcome", outcome=outcome)
+        metrics.inc("sanitiser_events_total", length, "Events of the sessions processed")
+        if stats is not None:
+            metrics.observe("sanitiser_session_seconds", stats.elapsed, "TopDown seconds per session",
+                            length=length_bucket(length))
+            metrics.observe("sanitiser_inference_gain_calls", stats.inference_gain_calls,
+                            "Inference gain evaluations per session", buckets=CALLS_BUCKETS)
+            self.__busy_seconds += stats.elapsed
+        if warm_start_counts:
+            metrics.inc("sanitiser_warm_start_lookups_total", warm_start_counts["sessions"],
+                        "Warm start cache lookups")
+            metrics.inc("sanitiser_warm_start_hits_total", warm_start_counts["warm_started"],
+                        "Warm start cache lookups that found a similar session")
+        self.update()
+
+    def update(self):
+        # the gauges derived from the counters
+        metrics = self.metrics
+        sessions = metrics.total("sanitiser_sessions_total")
+        if sessions > 0:
+            metrics.set("sanitiser_triage_pass_through_ratio",
+                        1 - (metrics.get("sanitiser_sessions_total", outcome="sanitise") or 0) / sessions,
+                        "Share of the sessions passed through without TopDown")
+        lookups = metrics.get("sanitiser_warm_start_lookups_total")
+        if lookups:
+            metrics.set("sanitiser_warm_start_hit_ratio", metrics.get("sanitiser_warm_start_hits_total") / lookups,
+                        "Share of the warm start cache lookups that found a similar session")
+        if self.__start is not None:
+            elapsed = time.perf_counter() - self.__start
+            if elapsed > 0:
+                metrics.set("sanitiser_throughput_sessions_per_second", sessions / elapsed,
+                            "Sessions processed per second since the run started")
+                metrics.set("sanitiser_worker_utilisation", min(self.__busy_seconds / (elapsed * self.__workers), 1),
+                            "Share of the workers' time spent in TopDown since the run started")
+        # ru_maxrss is in KiB on Linux
+        max_rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                      resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        metrics.set("sanitiser_max_resident_memory_bytes", max_rss * 1024, "Peak resident memory")
+
+
+class MetricsServer:
+    """
+    Serves a Metrics registry at http://host:port/metrics from a background thread, for Prometheus to scrape
+    during a run. Port 0 picks a free port (see 'port' once started). It can be used as a context manager.
+    """
+
+    def __init__(self, metrics: Metrics, host: str = "127.0.0.1", port: int = 0):
+        registry = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        self.__server.daemon_threads = True
+        self.host, self.port = self.__server.server_address[:2]
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="metrics-server", daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        # shutdown() waits for serve_forever() to return, so it would hang on a server that was never started
+        if self.__thread is not None:
+            self.__server.shutdown()
+            self.__thread.join()
+            self.__thread = None
+        self.__server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
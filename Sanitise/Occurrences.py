@@ -0,0 +1,98 @@
+from array import array
+from typing import Optional
+
+from Sanitise.Patterns import SensitivePatternSet
+
+
+class OccurrenceIndex:
+    """
+    Subsequence automaton of a sequence, built once per sequence.
+
+    Row i of the next-occurrence table holds, for every symbol of the sequence, the smallest position j >= i such
+    that sequence[j] is that symbol (or len(sequence) if there is none). Whether a pattern p is a subsequence of
+    the sequence is then answered in O(|p|) by following the table from position 0.
+    """
+
+    def __init__(self, sequence: list):
+        self.__length = len(sequence)
+        self.__symbol_ids = {}
+        for symbol in sequence:
+            if symbol not in self.__symbol_ids:
+                self.__symbol_ids[symbol] = len(self.__symbol_ids)
+
+        # flat (len(sequence) + 1) x (number of symbols) table, filled in from the end of the sequence
+        num_symbols = len(self.__symbol_ids)
+        row = array("i", [self.__length]) * num_symbols
+        rows = [row]
+        for i in range(self.__length - 1, -1, -1):
+            row = array("i", row)
+            row[self.__symbol_ids[sequence[i]]] = i
+            rows.append(row)
+        self.__next = array("i")
+        for row in reversed(rows):
+            self.__next.extend(row)
+
+    def __len__(self):
+        return self.__length
+
+    def __contains__(self, symbol):
+        return symbol in self.__symbol_ids
+
+    def next_position(self, symbol, position: int) -> int:
+        """
+        Returns the first position >= 'position' at which 'symbol' occurs, or len(sequence) if it does not occur
+        """
+        symbol_id = self.__symbol_ids.get(symbol)
+        if symbol_id is None or position >= self.__length:
+            return self.__length
+        return self.__next[position * len(self.__symbol_ids) + symbol_id]
+
+    def __extend_embedding(self, pattern, positions: list) -> bool:
+        # extends 'positions', the leftmost embedding of a prefix of 'pattern', as far as possible
+        position = positions[-1] + 1 if len(positions) > 0 else 0
+        for symbol in pattern[len(positions):]:
+            position = self.next_position(symbol, position)
+            if position >= self.__length:
+                return False
+            positions.append(position)
+            position += 1
+        return True
+
+    def find(self, pattern) -> Optional[list]:
+        """
+        Returns the positions of the leftmost occurrence of 'pattern' as a subsequence, or None if it does not occur
+        """
+        positions = []
+        return positions if self.__extend_embedding(pattern, positions) else None
+
+    def occurs(self, pattern) -> bool:
+        return self.find(pattern) is not None
+
+    def find_all(self, patterns: list) -> dict:
+        """
+        Returns {index in 'patterns': positions of its leftmost occurrence} for every pattern that occurs.
+
+        Patterns are visited in sorted order so that the leftmost embedding of a prefix shared with the previous
+        pattern is reused rather than recomputed.
+        """
+        matches = {}
+        previous_pattern, positions = (), []
+        for i in sorted(range(len(patterns)), key=lambda k: tuple(patterns[k])):
+            pattern = tuple(patterns[i])
+            common = 0
+            max_common = min(len(pattern), len(previous_pattern), len(positions))
+            while common < max_common and pattern[common] == previous_pattern[common]:
+                common += 1
+            del positions[common:]
+            if self.__extend_embedding(pattern, positions):
+                matches[i] = list(positions)
+            previous_pattern = pattern
+        return matches
+
+    def occurs_any(self, patterns) -> bool:
+        """
+        Returns whether any of 'patterns', a SensitivePatternSet or a list compiled into one, occurs
+        """
+        if not isinstance(patterns, SensitivePatternSet):
+            patterns = SensitivePatternSet(patterns)
+        return patterns.occurs_in(self.next_position, self.__length)
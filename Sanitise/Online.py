@@ -0,0 +1,123 @@
+from collections import Counter
+from typing import Union
+
+from Privacy import Entropy
+from Privacy.Distributions import Distribution
+from Sanitise import Helper, TopDown, Trees
+from Sanitise.Helper import GeneralisationFunction
+
+
+class OnlineTopDownSanitiser:
+    """
+    TopDown sanitisation of one session that grows one event at a time.
+
+    The sanitiser keeps, for the session so far:
+        - the symbol histogram
+        - the subsequence counts of the session (the distribution summary S), updated in place per event
+        - how much of each sensitive pattern has been matched, so occurrence is known without rescanning
+        - the chain of generalisation functions accepted by TopDown, from the all-root g to the current g
+    Every refinement in the chain refines the one before it, so its inference gain can only be larger. When
+    events are appended, the deepest refinement of the chain that still satisfies epsilon is found by binary
+    search, the refinements below it are kept without being re-checked, and TopDown resumes from it. Only
+    the refinements beyond that point, whose privacy or utility may have changed, are evaluated again.
+
+    The result always satisfies epsilon, but may differ from running TopDown from scratch on the whole session.
+    """
+
+    def __init__(self, sens_pats: list, epsilon: float,
+                 taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy]):
+        self.__sens_pats = [list(sens_pat) for sens_pat in sens_pats]
+        self.__epsilon = epsilon
+        self.__taxonomy_tree = taxonomy_tree
+        self.__sequence = []
+        self.__histogram = Counter()
+        self.__frequencies = Distribution()
+
+        # patterns are matched greedily: __waiting[a] lists the patterns whose next unmatched symbol is a
+        self.__matched_len = [0] * len(self.__sens_pats)
+        self.__waiting = {}
+        for i, sens_pat in enumerate(self.__sens_pats):
+            self.__wait_for_next_symbol(i)
+        self.__any_sens_pat_occurs = any(len(sens_pat) == 0 for sens_pat in self.__sens_pats)
+
+        self.__refinements = [GeneralisationFunction(taxonomy_tree.get_leaf_symbols(),
+                                                     default_generalisation=taxonomy_tree.get_root_symbol())]
+        self.inference_gain_calls = 0
+
+    def __repr__(self):
+        return f"<OnlineTopDownSanitiser: {len(self.__sequence)} events, g = {self.get_generalisation_function()}>"
+
+    def __wait_for_next_symbol(self, i):
+        sens_pat = self.__sens_pats[i]
+        if self.__matched_len[i] < len(sens_pat):
+            self.__waiting.setdefault(sens_pat[self.__matched_len[i]], []).append(i)
+
+    def __update_occurrences(self, event):
+        for i in self.__waiting.pop(event, []):
+            self.__matched_len[i] += 1
+            if self.__matched_len[i] == len(self.__sens_pats[i]):
+                self.__any_sens_pat_occurs = True
+            else:
+                self.__wait_for_next_symbol(i)
+
+    def __inference_gain(self, g: GeneralisationFunction) -> float:
+        self.inference_gain_calls += 1
+        return Entropy.generalised_shannon_entropy(self.__frequencies, g)
+
+    def __deepest_admissible_refinement(self) -> int:
+        # inference gain is non-decreasing along the chain, so binary search for the last g within epsilon
+        # (the all-root g at index 0 is kept regardless, as TopDown does)
+        low, high = 0, len(self.__refinements) - 1
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.__inference_gain(self.__refinements[middle]) <= self.__epsilon:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def append(self, *events) -> list:
+        """
+        Appends events to the session and returns the whole session sanitised
+        """
+        for event in events:
+            self.__sequence.append(event)
+            self.__histogram[event] += 1
+            self.__frequencies.append(event)
+            self.__update_occurrences(event)
+
+        if self.__any_sens_pat_occurs and len(events) > 0:
+            del self.__refinements[self.__deepest_admissible_refinement() + 1:]
+            TopDown.generalise_top_down(self.__sens_pats, self.__sequence, self.__epsilon, self.__taxonomy_tree,
+                                        initial_generalisation=self.__refinements[-1],
+                                        inference_gain=self.__inference_gain, refinements=self.__refinements)
+        return self.get_sanitised_sequence()
+
+    def get_sequence(self) -> list:
+        return list(self.__sequence)
+
+    def get_histogram(self) -> Counter:
+        return Counter(self.__histogram)
+
+    def get_generalisation_function(self):
+        """
+        Returns the current generalisation function, or None while no sensitive pattern occurs in the session
+        """
+        return self.__refinements[-1] if self.__any_sens_pat_occurs else None
+
+    def get_refinements(self) -> list:
+        """
+        Returns the chain of generalisation functions accepted so far, from the all-root g to the current g
+        """
+        return list(self.__refinements)
+
+    def get_sanitised_sequence(self) -> list:
+        g = self.get_generalisation_function()
+        return list(self.__sequence) if g is None else Helper.generalise_seq(self.__sequence, g)
+
+    def utility_loss(self) -> float:
+        # UL(S,g,c) = sum over symbols a of count(a) * c(a, g(a)), from the histogram
+        g = self.get_generalisation_function()
+        if g is None:
+            return 0
+        return Helper.utility_loss_of_histogram(self.__histogram, g, self.__taxonomy_tree.get_cost_func())
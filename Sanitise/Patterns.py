@@ -0,0 +1,200 @@
+from Sanitise.Helper import GeneralisationFunction
+
+
+class SensitivePatternSet:
+    """
+    Sensitive patterns compiled once into a trie over symbol ids, so that duplicates are stored once, with an
+    inverted index from each symbol to the patterns containing it.
+
+    Iterating over the set gives the distinct patterns (as lists) in the order they were first added, so it can
+    be passed wherever a list of sensitive patterns is expected.
+
+    Which patterns occur in a sequence is found by walking the trie against an index of the sequence (see
+    occurring), so a prefix shared by several patterns is matched once, and the patterns below a prefix that
+    does not occur are never visited.
+    """
+
+    def __init__(self, sens_pats: list = None):
+        self.__symbol_ids = {}
+        self.__symbols = []
+        self.__children = [{}]  # trie node -> {symbol id: child trie node}, node 0 is the root
+        self.__node_pattern = {}  # trie node -> id of the pattern ending at that node
+        self.__patterns = []  # pattern id -> pattern as a tuple of symbols
+        self.__patterns_with_symbol = {}  # symbol -> ids of the patterns containing it
+        for sens_pat in sens_pats if sens_pats is not None else []:
+            self.add(sens_pat)
+
+    def __len__(self):
+        return len(self.__patterns)
+
+    def __iter__(self):
+        return (list(pattern) for pattern in self.__patterns)
+
+    def __getitem__(self, pattern_id):
+        return list(self.__patterns[pattern_id])
+
+    def __repr__(self):
+        return [list(pattern) for pattern in self.__patterns].__repr__()
+
+    def __find_node(self, pattern):
+        node = 0
+        for symbol in pattern:
+            symbol_id = self.__symbol_ids.get(symbol)
+            node = self.__children[node].get(symbol_id) if symbol_id is not None else None
+            if node is None:
+                return None
+        return node
+
+    def __contains__(self, pattern):
+        return self.__find_node(pattern) in self.__node_pattern
+
+    def add(self, pattern) -> int:
+        """
+        Adds a pattern if it is not already in the set and returns its pattern id
+        """
+        node = 0
+        for symbol in pattern:
+            if symbol not in self.__symbol_ids:
+                self.__symbol_ids[symbol] = len(self.__symbols)
+                self.__symbols.append(symbol)
+            symbol_id = self.__symbol_ids[symbol]
+            child = self.__children[node].get(symbol_id)
+            if child is None:
+                child = len(self.__children)
+                self.__children.append({})
+                self.__children[node][symbol_id] = child
+            node = child
+        if node in self.__node_pattern:
+            return self.__node_pattern[node]
+
+        pattern_id = len(self.__patterns)
+        self.__node_pattern[node] = pattern_id
+        self.__patterns.append(tuple(pattern))
+        for symbol in set(pattern):
+            self.__patterns_with_symbol.setdefault(symbol, []).append(pattern_id)
+        return pattern_id
+
+    def get_patterns(self) -> list:
+        return list(self)
+
+    def patterns_with(self, symbols) -> set:
+        """
+        Returns the ids of the patterns that contain any of 'symbols'
+        """
+        pattern_ids = set()
+        for symbol in symbols:
+            pattern_ids.update(self.__patterns_with_symbol.get(symbol, []))
+        return pattern_ids
+
+    def __walk(self, next_position, end: int, stop_at_first: bool) -> set:
+        # depth first, each trie node paired with the position after the leftmost occurrence of its prefix
+        occurring = set()
+        working_nodes = [(0, 0)]
+        while len(working_nodes) > 0:
+            node, position = working_nodes.pop()
+            if node in self.__node_pattern:
+                occurring.add(self.__node_pattern[node])
+                if stop_at_first:
+                    break
+            for symbol_id, child in self.__children[node].items():
+                symbol_position = next_position(self.__symbols[symbol_id], position)
+                if symbol_position < end:
+                    working_nodes.append((child, symbol_position + 1))
+        return occurring
+
+    def occurring(self, next_position, end: int) -> set:
+        """
+        Returns the ids of the patterns that occur in a sequence of length 'end', given by 'next_position(symbol,
+        position)': the first position >= 'position' at which 'symbol' occurs, or 'end' if it does not
+        (e.g. OccurrenceIndex.next_position)
+        """
+        return self.__walk(next_position, end, False)
+
+    def occurs_in(self, next_position, end: int) -> bool:
+        """
+        Returns whether any pattern occurs in the sequence given by 'next_position' (see occurring)
+        """
+        return len(self.__walk(next_position, end, True)) > 0
+
+    def generalise(self, g: GeneralisationFunction) -> list:
+        """
+        Returns the distinct patterns of the set generalised by g (the same as Helper.sanitise_pats).
+        The trie is walked once, so the generalisation of a prefix shared by several patterns is computed once.
+        """
+        generalised_patterns = {}
+        working_nodes = [(0, ())]
+        while len(working_nodes) > 0:
+            node, generalised_prefix = working_nodes.pop()
+            if node in self.__node_pattern:
+                pattern_id = self.__node_pattern[node]
+                first_pattern_id = generalised_patterns.get(generalised_prefix, pattern_id)
+                generalised_patterns[generalised_prefix] = min(pattern_id, first_pattern_id)
+            for symbol_id, child in self.__children[node].items():
+                working_nodes.append((child, generalised_prefix + (g[self.__symbols[symbol_id]],)))
+        # in the order of the first pattern giving each generalised pattern
+        return [list(generalised_pattern) for generalised_pattern in
+                sorted(generalised_patterns.keys(), key=generalised_patterns.get)]
+
+    def generalised_by(self, g: GeneralisationFunction):
+        return GeneralisedPatternSet(self, g)
+
+
+class GeneralisedPatternSet:
+    """
+    The patterns of a SensitivePatternSet generalised by a generalisation function g, kept up to date as g is
+    refined. A refinement only regeneralises the patterns containing one of the symbols it moves.
+    """
+
+    def __init__(self, pattern_set: SensitivePatternSet, g: GeneralisationFunction):
+        self.__pattern_set = pattern_set
+        self.__g = {}
+        self.__generalised = []  # pattern id -> generalised pattern
+        self.__multiplicity = {}  # generalised pattern -> number of patterns generalised to it
+        for pattern in pattern_set:
+            generalised_pattern = tuple([g[symbol] for symbol in pattern])
+            self.__generalised.append(generalised_pattern)
+            self.__multiplicity[generalised_pattern] = self.__multiplicity.get(generalised_pattern, 0) + 1
+            for symbol in pattern:
+                self.__g[symbol] = g[symbol]
+
+    def __len__(self):
+        return len(self.__multiplicity)
+
+    def __iter__(self):
+        return (list(generalised_pattern) for generalised_pattern in self.__multiplicity.keys())
+
+    def __contains__(self, generalised_pattern):
+        return tuple(generalised_pattern) in self.__multiplicity
+
+    def __move(self, pattern_id, generalised_pattern):
+        previous = self.__generalised[pattern_id]
+        self.__multiplicity[previous] -= 1
+        if self.__multiplicity[previous] == 0:
+            del self.__multiplicity[previous]
+        self.__generalised[pattern_id] = generalised_pattern
+        self.__multiplicity[generalised_pattern] = self.__multiplicity.get(generalised_pattern, 0) + 1
+
+    def refine(self, changes: dict) -> list:
+        """
+        Applies 'changes' ({symbol: new generalisation symbol}) and returns the undo log to pass to revert().
+        Costs time proportional to the patterns containing a changed symbol.
+        """
+        undo = []
+        for symbol, generalisation_symbol in changes.items():
+            if symbol in self.__g:
+                undo.append(("symbol", symbol, self.__g[symbol]))
+                self.__g[symbol] = generalisation_symbol
+        for pattern_id in self.__pattern_set.patterns_with(changes.keys()):
+            undo.append(("pattern", pattern_id, self.__generalised[pattern_id]))
+            self.__move(pattern_id, tuple([self.__g[symbol] for symbol in self.__pattern_set[pattern_id]]))
+        return undo
+
+    def revert(self, undo: list):
+        for kind, key, previous in reversed(undo):
+            if kind == "symbol":
+                self.__g[key] = previous
+            else:
+                self.__move(key, previous)
+
+    def get_generalised(self, pattern_id) -> list:
+        return list(self.__generalised[pattern_id])
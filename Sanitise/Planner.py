@@ -0,0 +1,163 @@
+import logging
+import math
+import time
+from typing import Callable, Union
+
+from Privacy.Distributions import count_run_choices, run_length_encode
+from Sanitise import TopDown, Trees
+from Sanitise.Context import SequenceContext
+from Sanitise.Governor import BYTES_PER_PATTERN, SECONDS_PER_SUBSEQUENCE, ResourceGovernor
+from Sanitise.Segmented import SegmentedSanitiser
+
+logger = logging.getLogger(__name__)
+
+
+class Plan:
+    EXACT = "exact"
+    BOUNDED = "bounded"
+    SEGMENTED = "segmented"
+
+    def __init__(self, strategy, features: dict, predicted_seconds, predicted_bytes, max_pattern_length=None,
+                 window_length=None):
+        self.strategy = strategy
+        self.features = features
+        self.predicted_seconds = predicted_seconds
+        self.predicted_bytes = predicted_bytes
+        self.max_pattern_length = max_pattern_length
+        self.window_length = window_length
+        self.over_budget = False
+        self.actual_seconds = None
+
+    def __repr__(self):
+        parameter = {Plan.BOUNDED: f" (max pattern length {self.max_pattern_length})",
+                     Plan.SEGMENTED: f" (windows of {self.window_length})"}.get(self.strategy, "")
+        over_budget = ", over budget" if self.over_budget else ""
+        return (f"<Plan: {self.strategy}{parameter} for length {self.features['length']}, "
+                f"predicted {self.predicted_seconds:.3g}s and {self.predicted_bytes / 2 ** 20:.3g}MiB{over_budget}>")
+
+    def to_dict(self) -> dict:
+        return {"strategy": self.strategy, "features": dict(self.features),
+                "max_pattern_length": self.max_pattern_length, "window_length": self.window_length,
+                "predicted_seconds": self.predicted_seconds, "predicted_bytes": self.predicted_bytes,
+                "over_budget": self.over_budget, "actual_seconds": self.actual_seconds}
+
+
+class ExecutionPlanner:
+    """
+    Chooses how the distributions of a sanitisation run are evaluated, from the length and alphabet size of the
+    sequence, the depth and number of leaves of the taxonomy, and the number of sensitive patterns:
+        exact       the distributions over all 2^n - 1 subsequences
+        bounded     only the subsequences of at most 'max_pattern_length' symbols
+        segmented   the sequence is sanitised in windows of 'window_length' symbols (see SegmentedSanitiser)
+    The accuracy requirement is set by which approximations are allowed: bounded with at least
+    'min_pattern_length' symbols, segmented in windows of at least 'min_window_length' symbols; None disallows
+    one. Exact is always allowed. There is no sampled strategy: a plug-in entropy of sampled counts is biased
+    low, so TopDown would accept refinements whose inference gain is above epsilon.
+
+    The planner picks the cheapest allowed plan: the least predicted seconds, then the fewest predicted bytes,
+    and the more accurate plan on a tie. A shorter bound always costs less, so the bounded plan uses
+    'min_pattern_length'; the number of windows is rounded up, so the shortest windows are not always the
+    cheapest and every allowed window length is costed. The cheapest plan is chosen even if it is predicted not
+    to fit 'max_seconds' and 'max_bytes', and is then marked over budget.
+
+    Costs are predicted with ResourceGovernor.predict_cost, the cost model of the ResourceGovernor: building S
+    costs one step per subsequence enumerated (or per run-by-run choice, for a sequence with runs of repeated
+    symbols), each inference gain evaluation of TopDown (up to leaves x depth of them) one step per distinct
+    pattern of S, and the occurrence checks one step per symbol for each sensitive pattern.
+
+    Every plan, with its predicted and (after sanitise) actual seconds, is logged and kept in 'history', so the
+    cost model and thresholds can be tuned from real runs.
+    """
+
+    def __init__(self, max_seconds: float = 60, max_bytes: int = 2 ** 30, min_pattern_length: int = None,
+                 min_window_length: int = None, seconds_per_subsequence: float = SECONDS_PER_SUBSEQUENCE,
+                 bytes_per_pattern: int = BYTES_PER_PATTERN):
+        self.max_seconds = max_seconds
+        self.max_bytes = max_bytes
+        self.min_pattern_length = min_pattern_length
+        self.min_window_length = min_window_length
+        self.seconds_per_subsequence = seconds_per_subsequence
+        self.bytes_per_pattern = bytes_per_pattern
+        self.history = []
+
+    @staticmethod
+    def features(sequence, taxonomy_tree, sens_pats) -> dict:
+        taxonomy_leaves, taxonomy_depth = ResourceGovernor.taxonomy_shape(taxonomy_tree)
+        return {
+            "length": len(sequence),
+            "alphabet_size": len(set(sequence)),
+            "taxonomy_depth": taxonomy_depth,
+            "taxonomy_leaves": taxonomy_leaves,
+            "num_sens_pats": len(sens_pats),
+            "run_choices": count_run_choices(run_length_encode(sequence)),
+        }
+
+    def __cost(self, features, length, alphabet_size, max_pattern_length=None, run_choices=None):
+        return ResourceGovernor.predict_cost(length, alphabet_size, features["taxonomy_leaves"],
+                                             features["taxonomy_depth"], max_pattern_length=max_pattern_length,
+                                             run_choices=run_choices, num_sens_pats=features["num_sens_pats"],
+                                             seconds_per_subsequence=self.seconds_per_subsequence,
+                                             bytes_per_pattern=self.bytes_per_pattern)
+
+    @staticmethod
+    def __key(plan):
+        return plan.predicted_seconds, plan.predicted_bytes
+
+    def __within_budget(self, plan):
+        return plan.predicted_seconds <= self.max_seconds and plan.predicted_bytes <= self.max_bytes
+
+    def __candidates(self, features):
+        # the cheapest plan of each allowed strategy, most accurate strategy first
+        length, alphabet_size, run_choices = features["length"], features["alphabet_size"], features["run_choices"]
+        yield Plan(Plan.EXACT, features, *self.__cost(features, length, alphabet_size, run_choices=run_choices))
+        if self.min_pattern_length is not None and self.min_pattern_length < length:
+            max_pattern_length = max(self.min_pattern_length, 1)
+            yield Plan(Plan.BOUNDED, features, *self.__cost(features, length, alphabet_size, max_pattern_length,
+                                                            run_choices=run_choices),
+                       max_pattern_length=max_pattern_length)
+        if self.min_window_length is not None:
+            cheapest = None
+            for window_length in range(max(self.min_window_length, 1), length):
+                seconds, num_bytes = self.__cost(features, window_length, min(alphabet_size, window_length))
+                # the cost of one window grows with its length, so no longer window can be cheaper
+                if cheapest is not None and (seconds, num_bytes) > ExecutionPlanner.__key(cheapest):
+                    break
+                plan = Plan(Plan.SEGMENTED, features, seconds * math.ceil(length / window_length), num_bytes,
+                            window_length=window_length)
+                if cheapest is None or ExecutionPlanner.__key(plan) <= ExecutionPlanner.__key(cheapest):
+                    cheapest = plan
+            if cheapest is not None:
+                yield cheapest
+
+    def plan(self, sequence, taxonomy_tree, sens_pats) -> Plan:
+        """
+        Returns the cheapest allowed plan, marked over budget if it is predicted not to fit the budget
+        """
+        features = ExecutionPlanner.features(sequence, taxonomy_tree, sens_pats)
+        chosen = None
+        for candidate in self.__candidates(features):
+            if chosen is None or ExecutionPlanner.__key(candidate) < ExecutionPlanner.__key(chosen):
+                chosen = candidate
+        chosen.over_budget = not self.__within_budget(chosen)
+        self.history.append(chosen)
+        logger.info(f"{chosen} (budget {self.max_seconds}s, {self.max_bytes / 2 ** 20:.3g}MiB)")
+        return chosen
+
+    def sanitise(self, sens_pats: list, input_sequence: list, epsilon: float,
+                 taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy], algorithm: Callable = None) -> list:
+        """
+        Sanitises 'input_sequence' with 'algorithm' (TopDown.sanitise_seq_top_down by default, or
+        BottomUp.sanitise_seq_bottom_up) as planned, and records the actual duration in the plan
+        """
+        algorithm = algorithm if algorithm is not None else TopDown.sanitise_seq_top_down
+        plan = self.plan(input_sequence, taxonomy_tree, sens_pats)
+        start = time.perf_counter()
+        if plan.strategy == Plan.SEGMENTED:
+            sanitised = SegmentedSanitiser(sens_pats, epsilon, taxonomy_tree, window_length=plan.window_length,
+                                           algorithm=algorithm).sanitise(input_sequence)
+        else:
+            context = SequenceContext(input_sequence, max_pattern_length=plan.max_pattern_length)
+            sanitised = algorithm(sens_pats, input_sequence, epsilon, taxonomy_tree, context=context)
+        plan.actual_seconds = time.perf_counter() - start
+        logger.info(f"{plan}: took {plan.actual_seconds:.3g}s")
+        return sanitised
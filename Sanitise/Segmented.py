@@ -0,0 +1,130 @@
+import logging
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Union
+
+from Sanitise import TopDown, Trees
+
+logger = logging.getLogger(__name__)
+
+
+class Window:
+    """
+    A window [start, stop) of the input sequence that is sanitised on its own. Where windows overlap, the output
+    of each position is taken from one window only: positions [emit_start, emit_stop) come from this window.
+    """
+
+    def __init__(self, index, start, stop, emit_start, emit_stop):
+        self.index = index
+        self.start = start
+        self.stop = stop
+        self.emit_start = emit_start
+        self.emit_stop = emit_stop
+
+    def __repr__(self):
+        return f"<Window {self.index}: [{self.start}, {self.stop}), emits [{self.emit_start}, {self.emit_stop})>"
+
+    def to_dict(self) -> dict:
+        return {"index": self.index, "start": self.start, "stop": self.stop,
+                "emit_start": self.emit_start, "emit_stop": self.emit_stop}
+
+
+def window_bounds(length: int, window_length: int, overlap: int = 0) -> list:
+    """
+    Returns the Windows of a sequence of 'length' symbols: windows of 'window_length' symbols, each starting
+    'window_length' - 'overlap' symbols after the one before it. The last window is moved back so that it is as long
+    as the others. The positions that two windows share are split at their middle between them.
+    """
+    if not 0 <= overlap < window_length:
+        raise ValueError(f"The overlap must be in [0, {window_length}), not {overlap}.")
+    starts = [0]
+    while starts[-1] + window_length < length:
+        starts.append(starts[-1] + window_length - overlap)
+    starts[-1] = max(0, min(starts[-1], length - window_length))
+    stops = [min(start + window_length, length) for start in starts]
+
+    emit_starts = [0] + [(starts[i] + stops[i - 1]) // 2 for i in range(1, len(starts))]
+    emit_stops = emit_starts[1:] + [length]
+    return [Window(i, starts[i], stops[i], emit_starts[i], emit_stops[i]) for i in range(len(starts))]
+
+
+class SegmentedSanitiser:
+    """
+    Sanitisation of sequences too long for the distributions of a single TopDown run: the sequence is split into
+    (optionally overlapping) windows of 'window_length' symbols, each window is sanitised with
+    TopDown.sanitise_seq_top_down on its own, and the sanitised windows are stitched back in order.
+
+    The time and memory of each TopDown run are those of a sequence of 'window_length' symbols. Epsilon holds for
+    each window rather than for the sequence as a whole, and a sensitive pattern spread over more than one window
+    is only seen by a window that contains it all (overlap widens that reach).
+
+    With an executor (e.g. a concurrent.futures.ProcessPoolExecutor), windows are sanitised concurrently with at
+    most 'max_in_flight' of them submitted at a time, so the memory held by pending windows stays bounded while
+    the output is streamed back in order. 'top_down_options' are passed on to sanitise_seq_top_down, or to
+    'algorithm' if another function with its signature (e.g. BottomUp.sanitise_seq_bottom_up) is given.
+    The window boundaries used for each sequence are logged.
+    """
+
+    def __init__(self, sens_pats: list, epsilon: float,
+                 taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy], window_length: int = 12,
+                 overlap: int = 0, executor: Executor = None, max_in_flight: int = 4, algorithm: Callable = None,
+                 **top_down_options):
+        if max_in_flight < 1:
+            raise ValueError(f"At least one window must be in flight, not {max_in_flight}.")
+        window_bounds(window_length, window_length, overlap)  # checks the overlap
+        self.sens_pats = [list(sens_pat) for sens_pat in sens_pats]
+        self.epsilon = epsilon
+        self.taxonomy_tree = taxonomy_tree
+        self.window_length = window_length
+        self.overlap = overlap
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self.algorithm = algorithm if algorithm is not None else TopDown.sanitise_seq_top_down
+        self.top_down_options = top_down_options
+
+    def windows(self, sequence: list) -> list:
+        return window_bounds(len(sequence), self.window_length, self.overlap)
+
+    def __sanitise_window(self, window_sequence):
+        return self.algorithm(self.sens_pats, window_sequence, self.epsilon, self.taxonomy_tree,
+                              **self.top_down_options)
+
+    def __submit(self, window_sequence):
+        return self.executor.submit(self.algorithm, self.sens_pats, window_sequence, self.epsilon,
+                                    self.taxonomy_tree, **self.top_down_options)
+
+    def iter_segments(self, sequence: list):
+        """
+        Generator over (window, sanitised positions [window.emit_start, window.emit_stop)), in window order
+        """
+        windows = self.windows(sequence)
+        logger.info(f"Sanitising {len(sequence)} symbols in {len(windows)} windows of {self.window_length} "
+                    f"(overlap {self.overlap}): {[(window.start, window.stop) for window in windows]}")
+
+        def segment(window, sanitised_window):
+            return sanitised_window[window.emit_start - window.start:window.emit_stop - window.start]
+
+        if self.executor is None:
+            for window in windows:
+                yield window, segment(window, self.__sanitise_window(sequence[window.start:window.stop]))
+            return
+
+        in_flight = deque()
+        for window in windows:
+            if len(in_flight) == self.max_in_flight:
+                done_window, future = in_flight.popleft()
+                yield done_window, segment(done_window, future.result())
+            in_flight.append((window, self.__submit(sequence[window.start:window.stop])))
+        while len(in_flight) > 0:
+            done_window, future = in_flight.popleft()
+            yield done_window, segment(done_window, future.result())
+
+    def sanitise_iter(self, sequence: list):
+        """
+        Generator over the sanitised symbols of 'sequence', in order
+        """
+        for window, sanitised_segment in self.iter_segments(sequence):
+            yield from sanitised_segment
+
+    def sanitise(self, sequence: list) -> list:
+        return list(self.sanitise_iter(sequence))
@@ -1,77 +1,259 @@
 import copy
 import math
+import os
+import time
+from concurrent.futures import Executor
+from typing import Callable, Union
 
 from Privacy import Entropy
 from Privacy.Distributions import ProbabilityDistribution
 from Sanitise import Helper, Trees
+from Sanitise.Context import SequenceContext
 from Sanitise.Helper import GeneralisationFunction, sequence_to_hash
+from Sanitise.Occurrences import OccurrenceIndex
 
 
-def do_any_sens_pats_occur(input_sequence, sens_pats):
+def do_any_sens_pats_occur(input_sequence, sens_pats, occurrence_index: OccurrenceIndex = None):
     """
         Returns whether any sensitive pattern occurs in the input sequence
     """
-    for sens_pat in sens_pats:
-        if does_sens_pat_occur(input_sequence,sens_pat):
-            return True
-    print("Failed do_any - no sensitive pattern given occurs in the input sequence:")
-    print("\t", input_sequence)
-    print("\t", sens_pats)
+    if occurrence_index is None:
+        occurrence_index = OccurrenceIndex(input_sequence)
+    if occurrence_index.occurs_any(sens_pats):
+        return True
+    Helper.printer("Failed do_any - no sensitive pattern given occurs in the input sequence:")
+    Helper.printer("\t", input_sequence)
+    Helper.printer("\t", sens_pats)
     return False
 
 
 def does_sens_pat_occur(input_sequence, sens_pat):
-    for sym in sens_pat:
-        if sym not in input_sequence:
-            print("\tSymbol not in input sequence -", sym)
-            return False
-
-    def get_indices_in_list(symbol, a_list):
-        indices = []
-        for i in range(len(a_list)):
-            # print("\t"*3,a_list[i],symbol)
-            if a_list[i] == symbol:
-                indices.append(i)
-        print("\t" * 3, indices)
-        return indices
-
-    curr_sens_pat_sym_i = 0
-    for j in range(len(input_sequence)):
-        if curr_sens_pat_sym_i >= len(sens_pat):
-            break
-        if input_sequence[j] == sens_pat[curr_sens_pat_sym_i]:
-            curr_sens_pat_sym_i += 1
+    return OccurrenceIndex(input_sequence).occurs(sens_pat)
 
-    if curr_sens_pat_sym_i <= len(sens_pat) - 1:
-        return False
-    else:
-        return True
 
-    # return do_any_sens_pats_occur(input_sequence, [sens_pat])
+def refinement_candidate(a_i, g_final: GeneralisationFunction, taxonomy_tree):
+    """
+        Returns (more refined symbol, leaves under it, g_temp) for refining a_i one level below g_final[a_i]
+    """
+    # symbol on layer l_i + 1 on path towards a_i (more refined than on l_i)
+    level_of_gen_a_i = g_final.get_generalisation_level(a_i)
+    more_refined_generalisation_symbol = taxonomy_tree.path_symbols_from_root(a_i)[level_of_gen_a_i + 1]
+
+    # get the (bottom level) leaves that have the
+    # more refined generalisation symbol as an ancestor
+    more_ref_gen_sym_leaves = taxonomy_tree.leaf_symbols_under(more_refined_generalisation_symbol)
+
+    g_temp = copy.deepcopy(g_final)
+    # update leaves of subtree's g-mapping as well as current symbol
+    for a_j in more_ref_gen_sym_leaves:
+        g_temp[a_j] = more_refined_generalisation_symbol
+        g_temp.incr_generalisation_level(a_j)
+    return more_refined_generalisation_symbol, more_ref_gen_sym_leaves, g_temp
+
+
+def refinement_chain(a_i, g_final: GeneralisationFunction, taxonomy_tree, depth: int) -> list:
+    """
+        Returns the refinements of g_final one level at a time along the path to a_i, down to the symbol at
+        'depth' on the path, as refinement_candidate tuples: each refines the one before it
+    """
+    chain = []
+    g_temp = g_final
+    for level in range(g_final.get_generalisation_level(a_i) + 1, depth + 1):
+        chain.append(refinement_candidate(a_i, g_temp, taxonomy_tree))
+        g_temp = chain[-1][2]
+    return chain
+
+
+def score_candidates(frequencies, candidates: list) -> list:
+    """
+        Returns the inference gain of each candidate generalisation function, from the counts of S
+    """
+    return [Entropy.generalised_shannon_entropy(frequencies, g_temp) for g_temp in candidates]
+
+
+def score_candidates_concurrently(executor: Executor, context: SequenceContext, g_final: GeneralisationFunction,
+                                  working_alphabet, symbols_to_prune, taxonomy_tree, workers: int = None) -> dict:
+    """
+        Scores the candidates of one TopDown iteration on 'executor', with the same inference gain as the serial
+        path: that of the run's SequenceContext, from its S. The candidates are split into one task per worker
+        ('workers', by default the number of CPUs), so S is sent to each worker once per iteration rather than
+        once per candidate.
+        Returns {more refined symbol: (utility loss, inference gain)}
+    """
+    candidates = {}
+    for a_i in working_alphabet:
+        if a_i in symbols_to_prune or g_final[a_i] == a_i:
+            continue
+        more_refined_generalisation_symbol, _, g_temp = refinement_candidate(a_i, g_final, taxonomy_tree)
+        # symbols under the same subtree share one candidate
+        if more_refined_generalisation_symbol not in candidates:
+            candidates[more_refined_generalisation_symbol] = g_temp
+
+    g_temps = list(candidates.values())
+    num_tasks = max(min(len(g_temps), workers or os.cpu_count() or 1), 1)
+    tasks = [g_temps[i::num_tasks] for i in range(num_tasks)]
+    futures = [executor.submit(score_candidates, context.frequencies, task) for task in tasks]
+    gains = [None] * len(g_temps)
+    for i, future in enumerate(futures):
+        gains[i::num_tasks] = future.result()
+    cost_func = taxonomy_tree.get_cost_func()
+    return {symbol: (context.utility_loss(g_temp, cost_func), gain)
+            for (symbol, g_temp), gain in zip(candidates.items(), gains)}
+
+
+SEARCH_LEVEL = "level"
+SEARCH_BINARY = "binary"
+
+
+class TopDownStats:
+    """
+    What a TopDown run did: the number of iterations of its main loop, of inference gain evaluations and of
+    accepted refinements, its duration in seconds, and whether it stopped early on its time or iteration budget
+    """
+
+    def __init__(self):
+        self.iterations = 0
+        self.inference_gain_calls = 0
+        self.refinements_accepted = 0
+        self.elapsed = 0.0
+        self.stopped_early = False
+
+    def __repr__(self):
+        stopped = ", stopped early" if self.stopped_early else ""
+        return (f"<TopDownStats: {self.iterations} iterations, {self.inference_gain_calls} inference gain calls, "
+                f"{self.refinements_accepted} refinements, {self.elapsed:.3g}s{stopped}>")
 
 
 def sanitise_seq_top_down(sens_pats: list, input_sequence: list, epsilon: float,
-                          taxonomy_tree: Trees.TaxonomyTree) -> list:
+                          taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy],
+                          executor: Executor = None, max_pattern_length: int = None,
+                          incremental_gain: bool = False, context: SequenceContext = None,
+                          max_seconds: float = None, max_iterations: int = None,
+                          stats: TopDownStats = None, search: str = SEARCH_LEVEL, workers: int = None) -> list:
+    """
+        If an executor (e.g. a concurrent.futures.ProcessPoolExecutor) is given, the candidate refinements
+        of each iteration are scored concurrently on it, in one task per worker ('workers', by default the number
+        of CPUs). The result is the same as the serial path (see generalise_top_down).
+        With 'max_pattern_length', inference gain is approximated from the patterns of at most that many symbols.
+        With 'incremental_gain', candidates are scored by an Entropy.InferenceGainEvaluator kept at g_final.
+        A SequenceContext of 'input_sequence' can be given as 'context' to share its setup with other runs on the
+        same sequence; its max_pattern_length then replaces 'max_pattern_length'.
+        'max_seconds', 'max_iterations' and 'stats' bound the run and report on it (see generalise_top_down).
+        With search="binary", each candidate refines a subtree down to its deepest admissible level at once
+        (see generalise_top_down).
+        'max_seconds' counts from here, so the occurrence check is within the budget too; if no time is left for
+        building S, every symbol is generalised to the root and 'stats' is marked as stopped early.
+    """
+    start = time.perf_counter()
     Helper.printer(f"--- BEGINNING EXECUTION OF TOP-DOWN ---\n"
                    f"Sensitive patterns: {sens_pats}\n"
                    f"User generated sequence: {input_sequence[:min(len(input_sequence), 10)]}...\n"
                    f"Privacy level/Average information leakage upper bound (epsilon): {epsilon}\n"
                    f"\tIf the value is low, lots of generalisation. If it's high, little generalisation.\n"
                    f"Taxonomy tree: \n{str(taxonomy_tree)}\n")
+    if context is None:
+        context = SequenceContext(input_sequence, max_pattern_length=max_pattern_length)
     # Return the original sequence if no sensitive patterns occur in it
-    if not do_any_sens_pats_occur(input_sequence, sens_pats):
+    if not do_any_sens_pats_occur(input_sequence, sens_pats, occurrence_index=context.occurrence_index):
         return input_sequence
 
+    if max_seconds is not None:
+        max_seconds = max(max_seconds - (time.perf_counter() - start), 0)
+    g_final = generalise_top_down(sens_pats, input_sequence, epsilon, taxonomy_tree, executor=executor,
+                                  incremental_gain=incremental_gain, context=context, max_seconds=max_seconds,
+                                  max_iterations=max_iterations, stats=stats, search=search, workers=workers)
+    return Helper.generalise_seq(input_sequence, g_final)
+
+
+def generalise_top_down(sens_pats: list, input_sequence: list, epsilon: float,
+                        taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy], executor: Executor = None,
+                        initial_generalisation: GeneralisationFunction = None,
+                        inference_gain: Callable[[GeneralisationFunction], float] = None,
+                        refinements: list = None, max_pattern_length: int = None,
+                        incremental_gain: bool = False, context: SequenceContext = None, max_seconds: float = None,
+                        max_iterations: int = None, stats: TopDownStats = None,
+                        search: str = SEARCH_LEVEL, workers: int = None) -> GeneralisationFunction:
+    """
+        Returns the generalisation function g_final chosen by TopDown.
+
+        The search starts from 'initial_generalisation' (by default every symbol is generalised to the root) and
+        only refines it. 'inference_gain' replaces the inference gain of the SequenceContext, e.g. with one
+        computed from distribution summaries that are kept up to date elsewhere.
+        If a list is given as 'refinements', a copy of g_final is appended to it after every accepted refinement.
+        With 'incremental_gain' (and no 'inference_gain'), each candidate's gain is computed from that of g_final
+        by an Entropy.InferenceGainEvaluator, which only revisits the patterns containing the refined leaves.
+        The histogram, S and the inference gain are taken from 'context', a SequenceContext of 'input_sequence'
+        (built here if not given), whose max_pattern_length then replaces 'max_pattern_length'.
+        With an 'executor', the candidates of each iteration are scored on it from the S of the context (bounded
+        or exact alike), split into 'workers' tasks (by default the number of CPUs), so the result is the same as
+        the serial path. An 'inference_gain' or 'incremental_gain' cannot be used with an executor, as the workers
+        could not compute the same gain.
+
+        TopDown is anytime: every refinement it accepts satisfies epsilon. Once 'max_seconds' have passed or
+        'max_iterations' iterations have run, the search stops before the next inference gain evaluation and
+        returns the best refinement accepted so far, which is less refined than a full run but still private.
+        The budget is also checked before S is built, so a run with no time left returns the starting g.
+        If a TopDownStats is given as 'stats', what the run did is added to it.
+
+        With search="binary", the candidate of a leaf a_i is not one level below g_final[a_i] but the deepest
+        admissible one of the chain refining g_final one level at a time along the path to a_i. Each refinement
+        of the chain refines the one before it, so its inference gain can only be larger, and the deepest level
+        that satisfies epsilon is found by binary search, with O(log depth) inference gain evaluations instead of
+        O(depth). A symbol whose refinement breaks epsilon is remembered for the rest of the run: g_final is only
+        ever refined, so any later refinement down to it breaks epsilon too, and the search stops above it.
+        Of the admissible refinements of the chain, the one with the least utility loss is the candidate (the
+        deepest one when the cost function decreases down the taxonomy, which it need not).
+        The executor is not used in this mode. The result satisfies epsilon like a level by level search, but may
+        differ from it, as a subtree is refined to its deepest admissible level in one iteration.
+    """
+    if search not in (SEARCH_LEVEL, SEARCH_BINARY):
+        raise ValueError(f"Unknown search {search!r}, expected {SEARCH_LEVEL!r} or {SEARCH_BINARY!r}.")
+    if executor is not None and (inference_gain is not None or incremental_gain):
+        raise ValueError("Candidates cannot be scored on an executor with 'inference_gain' or 'incremental_gain'.")
+    start = time.perf_counter()
+    if stats is None:
+        stats = TopDownStats()
+    stats.stopped_early = False
+    first_iteration = stats.iterations
+
+    def out_of_budget():
+        return (max_seconds is not None and time.perf_counter() - start >= max_seconds) or \
+            (max_iterations is not None and stats.iterations - first_iteration >= max_iterations)
+
+    if context is None:
+        context = SequenceContext(input_sequence, max_pattern_length=max_pattern_length)
+    max_pattern_length = context.max_pattern_length
     # e.g. [Cookies, Beer, Milk, …]
     working_alphabet = Helper.Alphabet(taxonomy_tree.get_leaf_symbols())
-    working_alphabet.sort_by_freq_in_sequence(input_sequence)
+    working_alphabet.sort_by_freq(context.histogram)
 
     # g_final = {Cookies:ALL, Beer:ALL, Milk: ALL, …}
-    g_final = GeneralisationFunction(working_alphabet, default_generalisation=taxonomy_tree.get_root().get_symbol())
+    if initial_generalisation is None:
+        g_final = GeneralisationFunction(working_alphabet, default_generalisation=taxonomy_tree.get_root_symbol())
+    else:
+        g_final = copy.deepcopy(initial_generalisation)
+    if out_of_budget():
+        # S is built on the first inference gain evaluation (or by the incremental evaluator below), the most
+        # expensive step of a run: with no time left, the starting g is returned without building it
+        stats.stopped_early = True
+        stats.elapsed += time.perf_counter() - start
+        Helper.printer(f"Stopped early: {stats}")
+        return g_final
+    evaluator = None
+    if incremental_gain and inference_gain is None:
+        evaluator = context.inference_gain_evaluator(g_final)
+        inference_gain = evaluator.gain_of
+    elif inference_gain is None:
+        inference_gain = context.inference_gain
     symbols_to_prune = []
+    infeasible = set()  # with search="binary", symbols whose refinement is known to break epsilon
     # At each iteration, look at all leaves. Choose the best one (+collateral) to refine based on
     # utility gained after refining.
     while len(working_alphabet) > 0:
+        if out_of_budget():
+            stats.stopped_early = True
+            break
+        stats.iterations += 1
         previous_working_alphabet = copy.deepcopy(working_alphabet)
         previous_g_final = copy.deepcopy(g_final)
         symbols_refined_w_min_util_loss = []
@@ -83,6 +265,14 @@ def sanitise_seq_top_down(sens_pats: list, input_sequence: list, epsilon: float,
         Helper.printer(f"Working alphabet {working_alphabet}")
         Helper.printer(f"Current generalisation function", g_final)
         Helper.printer(f"... Iterating over working alphabet")
+        # in parallel mode every candidate of this iteration is scored up front; the loop below then makes
+        # the same decisions, in the same order, as the serial path
+        candidate_scores = {}
+        chain_gains = {}  # with search="binary", the inference gain of each chain refinement of this iteration
+        if executor is not None and search == SEARCH_LEVEL:
+            candidate_scores = score_candidates_concurrently(executor, context, g_final, working_alphabet,
+                                                             symbols_to_prune, taxonomy_tree, workers=workers)
+            stats.inference_gain_calls += len(candidate_scores)
         for a_i in working_alphabet:
             Helper.printer(f"\ta_i {a_i}")
             if a_i in symbols_to_prune:
@@ -94,31 +284,69 @@ def sanitise_seq_top_down(sens_pats: list, input_sequence: list, epsilon: float,
                 symbols_to_prune.append(a_i)
                 continue
 
-            # symbol on layer l_i + 1 on path towards a_i (more refined than on l_i)
-            level_of_gen_a_i = g_final.get_generalisation_level(a_i)
-            Helper.printer(f"\t\tcurrent level of generalisation {level_of_gen_a_i} for {a_i}")
-            more_refined_generalisation_symbol = taxonomy_tree.find_leaf_node(a_i).get_path_from_root()[
-                level_of_gen_a_i + 1].get_symbol()
-            Helper.printer(f"\t\tmore refined symbol: {more_refined_generalisation_symbol}")
+            Helper.printer(f"\t\tcurrent level of generalisation {g_final.get_generalisation_level(a_i)} for {a_i}")
+            if search == SEARCH_BINARY:
+                path = taxonomy_tree.path_symbols_from_root(a_i)
+                depth = next((level - 1 for level in range(g_final.get_generalisation_level(a_i) + 1, len(path))
+                              if path[level] in infeasible), len(path) - 1)
+                chain = refinement_chain(a_i, g_final, taxonomy_tree, depth)
+                if len(chain) == 0:
+                    # already known to break epsilon one level down
+                    symbols_to_prune += taxonomy_tree.leaf_symbols_under(
+                        path[g_final.get_generalisation_level(a_i) + 1])
+                    continue
+                # the cost function need not decrease down the taxonomy, so every refinement of the chain is
+                # compared, not only the deepest
+                chain_losses = [context.utility_loss(g_temp, taxonomy_tree.get_cost_func())
+                                for _, _, g_temp in chain]
+                if min(chain_losses) > util_loss:
+                    continue  # no refinement of the chain can do better
+                # binary search for the deepest refinement of the chain that satisfies epsilon
+                low, high, deepest = 0, len(chain) - 1, None
+                while low <= high:
+                    middle = (low + high) // 2
+                    if chain[middle][0] not in chain_gains:
+                        if max_seconds is not None and time.perf_counter() - start >= max_seconds:
+                            stats.stopped_early = True
+                            break
+                        chain_gains[chain[middle][0]] = inference_gain(chain[middle][2])
+                        stats.inference_gain_calls += 1
+                    if chain_gains[chain[middle][0]] <= epsilon:
+                        deepest, low = middle, middle + 1
+                    else:
+                        infeasible.add(chain[middle][0])
+                        high = middle - 1
+                if stats.stopped_early:
+                    break
+                if deepest is None:
+                    Helper.printer(f"\t\t\t==> pruning {chain[0][1]}")
+                    symbols_to_prune += chain[0][1]
+                    continue
+                # every refinement of the chain down to the deepest admissible one satisfies epsilon: take the one
+                # with the least utility loss, the deepest on a tie
+                best = min(range(deepest + 1), key=lambda i: (chain_losses[i], -i))
+                more_refined_generalisation_symbol, more_ref_gen_sym_leaves, g_temp = chain[best]
+                utility_loss_of_g = chain_losses[best]
+                if utility_loss_of_g <= util_loss:
+                    Helper.printer(f"\t\t\t==> Current proposed refinement is down to "
+                                   f"{more_refined_generalisation_symbol}")
+                    util_loss = utility_loss_of_g
+                    g_final_updated = copy.deepcopy(g_temp)
+                    symbols_refined_w_min_util_loss = list(chain[0][1])
+                continue
 
-            # get the (bottom level) leaves that have the
-            # more refined generalisation symbol as an ancestor
-            more_ref_gen_sym_leaves = Trees.TreeNode.leaves(
-                taxonomy_tree.find_nodes(more_refined_generalisation_symbol)[0])
-
-            g_temp = copy.deepcopy(g_final)
-            # update leaves of subtree's g-mapping as well as current symbol
-            for a_j in more_ref_gen_sym_leaves:
-                g_temp[a_j.get_symbol()] = more_refined_generalisation_symbol
-                g_temp.incr_generalisation_level(a_j.get_symbol())
-                # if Trees.TreeNode.is_leaf(a_j):
-                #     symbols_to_prune.append(a_j.get_symbol())
+            more_refined_generalisation_symbol, more_ref_gen_sym_leaves, g_temp = refinement_candidate(
+                a_i, g_final, taxonomy_tree)
+            Helper.printer(f"\t\tmore refined symbol: {more_refined_generalisation_symbol}")
             Helper.printer(f"\t\tProposed new generalisation function {g_temp}")
             # If this g is worse than the previous, don't continue to the next 'if'
             # to update, just discard this g and move onto the next symbol
             Helper.printer(f"\t\tEvaluating utility loss of proposed generalisation function")
-            utility_loss_of_g = Helper.utility_loss_by_generalising(input_sequence, g_temp,
-                                                                    taxonomy_tree.get_cost_func())
+            if more_refined_generalisation_symbol in candidate_scores:
+                utility_loss_of_g, inference_gain_of_g = candidate_scores[more_refined_generalisation_symbol]
+            else:
+                utility_loss_of_g = context.utility_loss(g_temp, taxonomy_tree.get_cost_func())
+                inference_gain_of_g = None
             if utility_loss_of_g > util_loss:
                 Helper.printer(f"\t\t\t{utility_loss_of_g} > {util_loss}'")
                 Helper.printer(f"\t\tUtility loss worse, moving onto next a_i")
@@ -129,28 +357,42 @@ def sanitise_seq_top_down(sens_pats: list, input_sequence: list, epsilon: float,
                 Helper.printer(f"\t\t\tUtility loss same or better")
             Helper.printer(f"\t\tAssessing privacy")
             # if privacy is still satisfied -> update with new generalisation strategies g
-            if Entropy.inference_gain(input_sequence, sens_pats, g_temp) <= epsilon:
+            if inference_gain_of_g is None:
+                if max_seconds is not None and time.perf_counter() - start >= max_seconds:
+                    # keep the best refinement of this iteration found so far
+                    stats.stopped_early = True
+                    break
+                inference_gain_of_g = inference_gain(g_temp)
+                stats.inference_gain_calls += 1
+            if inference_gain_of_g <= epsilon:
                 Helper.printer(
-                    f"\t\t\tInference gain {Helper.inference_gain(input_sequence, sens_pats, g_temp):.2f} <= {epsilon}\n"
+                    f"\t\t\tInference gain {inference_gain_of_g:.2f} <= {epsilon}\n"
                     f"\t\t\t(privacy satisfied)")
                 Helper.printer(f"\t\t\t==> Current proposed refinements are {more_ref_gen_sym_leaves}")
                 util_loss = utility_loss_of_g
                 g_final_updated = copy.deepcopy(g_temp)
-                symbols_refined_w_min_util_loss = [node.get_symbol() for node in
-                                                   more_ref_gen_sym_leaves]
+                symbols_refined_w_min_util_loss = list(more_ref_gen_sym_leaves)
             else:  # privacy no longer satisfied -> prune tree using pruning criteria
                 # don’t update generalisation strategies g with this new strategy
                 # AND remove these leaves – they can’t be generalised further
                 Helper.printer(
-                    f"\t\t\tInference gain {Helper.inference_gain(input_sequence, sens_pats, g_temp):.2f} > {epsilon}\n"
+                    f"\t\t\tInference gain {inference_gain_of_g:.2f} > {epsilon}\n"
                     f"\t\t\t(privacy not satisfied)\n"
-                    f"\t\t\t==> pruning {[str(a_j) for a_j in more_ref_gen_sym_leaves]}")
+                    f"\t\t\t==> pruning {more_ref_gen_sym_leaves}")
                 for a_j in more_ref_gen_sym_leaves:
-                    symbols_to_prune.append(a_j.get_symbol())
-        for a_i in symbols_to_prune:
-            working_alphabet.remove(a_i)
+                    symbols_to_prune.append(a_j)
+        # a leaf can be pruned with more than one subtree in the same iteration
+        for a_i in dict.fromkeys(symbols_to_prune):
+            if a_i in working_alphabet:
+                working_alphabet.remove(a_i)
         symbols_to_prune = []
         g_final = copy.deepcopy(g_final_updated)  # g' is g_final updated with best leaf(s) to refine
+        if len(symbols_refined_w_min_util_loss) > 0:
+            stats.refinements_accepted += 1
+        if refinements is not None and len(symbols_refined_w_min_util_loss) > 0:
+            refinements.append(copy.deepcopy(g_final))
+        if evaluator is not None and len(symbols_refined_w_min_util_loss) > 0:
+            evaluator.rebase(g_final)
         if working_alphabet == previous_working_alphabet:
             Helper.printer("\tNo change made to working alphabet in this iteration")
         else:
@@ -167,5 +409,10 @@ def sanitise_seq_top_down(sens_pats: list, input_sequence: list, epsilon: float,
                            f"\t\t\t{previous_g_final}\n"
                            f"\t\tg_final Updated:\n"
                            f"\t\t\t{g_final}")
+        if stats.stopped_early:
+            break
+    stats.elapsed += time.perf_counter() - start
+    if stats.stopped_early:
+        Helper.printer(f"Stopped early: {stats}")
     Helper.printer(f"Final generalisation function given epsilon={epsilon}:\n\t{g_final}")
-    return Helper.generalise_seq(input_sequence, g_final)
+    return g_final
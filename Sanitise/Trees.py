@@ -1,4 +1,8 @@
 import copy
+import math
+import mmap
+import struct
+from array import array
 from typing import Optional
 
 from Sanitise.Helper import CostFunction
@@ -146,6 +150,29 @@ class TaxonomyTree:
     def get_root(self):
         return self.__root
 
+    def get_root_symbol(self):
+        return self.__root.get_symbol()
+
+    # returns the symbols on the root-to-leaf path of a leaf symbol
+    # [ root, level 1, ..., symbol ]
+    def path_symbols_from_root(self, symbol) -> list:
+        return [node.get_symbol() for node in self.find_leaf_node(symbol).get_path_from_root()]
+
+    # returns the leaf symbols that have 'symbol' as an ancestor (or are 'symbol')
+    def leaf_symbols_under(self, symbol) -> list:
+        working_nodes = list(self.find_nodes(symbol)[:1])
+        leaf_symbols = []
+        while len(working_nodes) > 0:
+            node = working_nodes.pop(0)
+            if TreeNode.is_leaf(node):
+                leaf_symbols.append(node.get_symbol())
+            else:
+                working_nodes += node.get_children()
+        return leaf_symbols
+
+    def compile(self):
+        return CompiledTaxonomy.from_tree(self)
+
     def find_leaf_node(self, symbol) -> Optional[TreeNode]:
         for n in self.__leaves:
             if n.get_symbol() == symbol:
@@ -196,3 +223,242 @@ class TaxonomyTree:
 
     def print_tree(self):
         print(self)
+
+
+class CompiledCostFunction:
+    """
+    Read-only view of the cost table of a CompiledTaxonomy, indexed like CostFunction: c[(leaf, general)]
+    """
+
+    def __init__(self, taxonomy):
+        self.__taxonomy = taxonomy
+
+    def __getitem__(self, item):
+        return self.__taxonomy.cost(item[0], item[1])
+
+
+class CompiledTaxonomy:
+    """
+    Frozen, array-backed taxonomy with its cost table.
+
+    Nodes are numbered in breadth-first order (the root is node 0). The structure is held in a few flat arrays
+    (parent and depth per node, the node id of each leaf and a leaves x nodes cost table) plus the list of node
+    symbols, so it serialises to one compact buffer and can be memory-mapped in each worker without being rebuilt.
+    Instances cannot be modified after construction and are safe to share between threads.
+    """
+    MAGIC = b"TAXC"
+    VERSION = 1
+    __HEADER = struct.Struct("<4sIIII")  # magic, version, number of nodes, number of leaves, length of symbol block
+    __slots__ = ("_symbols", "_symbol_to_id", "_parents", "_depths", "_leaf_nodes", "_leaf_to_row", "_costs",
+                 "_buffer")
+
+    def __init__(self, symbols: list, parents, depths, leaf_nodes, costs, buffer=None):
+        if len(parents) != len(symbols) or len(depths) != len(symbols):
+            raise ValueError("There must be exactly one parent and one depth per node")
+        if len(costs) != len(leaf_nodes) * len(symbols):
+            raise ValueError("The cost table must have one entry per (leaf, node) pair")
+        symbol_to_id = {symbol: i for i, symbol in enumerate(symbols)}
+        if len(symbol_to_id) != len(symbols):
+            raise ValueError("Node symbols must be unique")
+        object.__setattr__(self, "_symbols", tuple(symbols))
+        object.__setattr__(self, "_symbol_to_id", symbol_to_id)
+        object.__setattr__(self, "_parents", parents)
+        object.__setattr__(self, "_depths", depths)
+        object.__setattr__(self, "_leaf_nodes", leaf_nodes)
+        object.__setattr__(self, "_leaf_to_row", {leaf: row for row, leaf in enumerate(leaf_nodes)})
+        object.__setattr__(self, "_costs", costs)
+        object.__setattr__(self, "_buffer", buffer)  # keeps a memory-mapped file open while its views are in use
+
+    def __setattr__(self, key, value):
+        raise AttributeError("CompiledTaxonomy is immutable")
+
+    def __delattr__(self, item):
+        raise AttributeError("CompiledTaxonomy is immutable")
+
+    def __reduce__(self):
+        return CompiledTaxonomy.from_bytes, (self.to_bytes(),)
+
+    def __repr__(self):
+        children = {}
+        for node in range(1, len(self._symbols)):
+            children.setdefault(self._parents[node], []).append(node)
+        s = ""
+        working_nodes = [0]
+        while len(working_nodes) > 0:
+            node = working_nodes.pop()
+            s += "{}|_{}\n".format(self._depths[node] * "\t", self._symbols[node])
+            working_nodes += children.get(node, [])[::-1]
+        return s
+
+    @staticmethod
+    def __build(parent_of: dict, costs: dict):
+        # parent_of maps every symbol to its parent symbol (None for the root)
+        # costs maps (leaf, general) pairs to a cost
+        roots = [symbol for symbol in parent_of.keys() if parent_of[symbol] is None]
+        if len(roots) != 1:
+            raise ValueError(f"A taxonomy must have exactly one root, found {roots}")
+        children = {}
+        for symbol, parent in parent_of.items():
+            if parent is not None:
+                if parent not in parent_of:
+                    raise ValueError(f"Parent '{parent}' of '{symbol}' is not a node of the taxonomy")
+                children.setdefault(parent, []).append(symbol)
+
+        # breadth-first numbering
+        symbols = [roots[0]]
+        for symbol in symbols:
+            symbols += children.get(symbol, [])
+        if len(symbols) != len(parent_of):
+            raise ValueError("Every node must be reachable from the root")
+        symbol_to_id = {symbol: i for i, symbol in enumerate(symbols)}
+
+        parents, depths = array("i", [-1]), array("i", [0])
+        for symbol in symbols[1:]:
+            parent = symbol_to_id[parent_of[symbol]]
+            parents.append(parent)
+            depths.append(depths[parent] + 1)
+        leaf_nodes = array("i", [i for i, symbol in enumerate(symbols) if symbol not in children])
+
+        cost_table = array("d", [math.inf]) * (len(leaf_nodes) * len(symbols))
+        for row, leaf in enumerate(leaf_nodes):
+            for node, symbol in enumerate(symbols):
+                cost = 0 if node == leaf else costs.get((symbols[leaf], symbol))
+                if cost is not None:
+                    cost_table[row * len(symbols) + node] = cost
+        return CompiledTaxonomy(symbols, parents, depths, leaf_nodes, cost_table)
+
+    @staticmethod
+    def from_tree(taxonomy_tree: TaxonomyTree):
+        parent_of = {}
+        for node in taxonomy_tree.get_internal_nodes():
+            if node.get_symbol() not in parent_of:
+                parent = node.get_parent()
+                parent_of[node.get_symbol()] = parent.get_symbol() if parent is not None else None
+        return CompiledTaxonomy.__build(parent_of, taxonomy_tree.get_cost_func().map)
+
+    # Loads a taxonomy from a text file with a parent list and a cost table, e.g.
+    #   % comment
+    #   [parents]
+    #   ALL
+    #   Alcohol ALL
+    #   Wine Alcohol
+    #   [costs]
+    #   Wine Alcohol 0.2
+    #   Wine ALL 1
+    # The root is the only node listed without a parent.
+    @staticmethod
+    def from_file(path: str):
+        parent_of, costs = {}, {}
+        section = None
+        with open(path, "r") as taxonomy_file:
+            for line_number, line in enumerate(taxonomy_file, start=1):
+                tokens = line.split()
+                if len(tokens) == 0 or tokens[0].startswith("%"):
+                    continue
+                if tokens[0] in ("[parents]", "[costs]"):
+                    section = tokens[0]
+                elif section == "[parents]" and len(tokens) in (1, 2):
+                    parent_of[tokens[0]] = tokens[1] if len(tokens) == 2 else None
+                elif section == "[costs]" and len(tokens) == 3:
+                    costs[(tokens[0], tokens[1])] = float(tokens[2])
+                else:
+                    raise IOError(f"Failed to load file: format error on line {line_number}.")
+        return CompiledTaxonomy.__build(parent_of, costs)
+
+    def to_bytes(self) -> bytes:
+        symbol_block = "\n".join(self._symbols).encode("utf-8")
+        header = CompiledTaxonomy.__HEADER.pack(CompiledTaxonomy.MAGIC, CompiledTaxonomy.VERSION,
+                                                len(self._symbols), len(self._leaf_nodes), len(symbol_block))
+        ints = array("i", self._parents) + array("i", self._depths) + array("i", self._leaf_nodes)
+        padding = -(len(header) + len(ints) * ints.itemsize) % 8  # keep the cost table 8-byte aligned
+        return header + ints.tobytes() + bytes(padding) + array("d", self._costs).tobytes() + symbol_block
+
+    @staticmethod
+    def from_bytes(buffer):
+        # the arrays are views over 'buffer', nothing is copied apart from the symbol names
+        view = memoryview(buffer)
+        header = CompiledTaxonomy.__HEADER
+        magic, version, num_nodes, num_leaves, symbols_len = header.unpack_from(view, 0)
+        if magic != CompiledTaxonomy.MAGIC or version != CompiledTaxonomy.VERSION:
+            raise IOError("Failed to load compiled taxonomy: format error.")
+        offset = header.size
+        int_views = []
+        for length in (num_nodes, num_nodes, num_leaves):
+            int_views.append(view[offset:offset + 4 * length].cast("i"))
+            offset += 4 * length
+        offset += -offset % 8
+        costs = view[offset:offset + 8 * num_leaves * num_nodes].cast("d")
+        offset += 8 * num_leaves * num_nodes
+        symbols = bytes(view[offset:offset + symbols_len]).decode("utf-8").split("\n")
+        return CompiledTaxonomy(symbols, *int_views, costs, buffer=buffer)
+
+    def save(self, path: str):
+        with open(path, "wb") as compiled_file:
+            compiled_file.write(self.to_bytes())
+
+    @staticmethod
+    def load(path: str, memory_map=True):
+        with open(path, "rb") as compiled_file:
+            if not memory_map:
+                return CompiledTaxonomy.from_bytes(compiled_file.read())
+            return CompiledTaxonomy.from_bytes(mmap.mmap(compiled_file.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __node(self, symbol) -> int:
+        if symbol not in self._symbol_to_id:
+            raise KeyError(f"'{symbol}' is not a node of the taxonomy")
+        return self._symbol_to_id[symbol]
+
+    def get_cost_func(self):
+        return CompiledCostFunction(self)
+
+    def get_root_symbol(self):
+        return self._symbols[0]
+
+    def get_symbols(self) -> list:
+        return list(self._symbols)
+
+    def get_leaf_symbols(self) -> list:
+        return [self._symbols[leaf] for leaf in self._leaf_nodes]
+
+    def is_leaf(self, symbol) -> bool:
+        return self.__node(symbol) in self._leaf_to_row
+
+    def get_parent_symbol(self, symbol):
+        parent = self._parents[self.__node(symbol)]
+        return self._symbols[parent] if parent >= 0 else None
+
+    def get_depth(self, symbol) -> int:
+        return self._depths[self.__node(symbol)]
+
+    def get_height(self) -> int:
+        return max(self._depths)
+
+    # returns the symbols on the root-to-node path
+    # [ root, level 1, ..., symbol ]
+    def path_symbols_from_root(self, symbol) -> list:
+        node = self.__node(symbol)
+        path = []
+        while node >= 0:
+            path.append(self._symbols[node])
+            node = self._parents[node]
+        return path[::-1]
+
+    # returns the leaf symbols that have 'symbol' as an ancestor (or are 'symbol')
+    def leaf_symbols_under(self, symbol) -> list:
+        node = self.__node(symbol)
+        depth = self._depths[node]
+        leaf_symbols = []
+        for leaf in self._leaf_nodes:
+            ancestor = leaf
+            while self._depths[ancestor] > depth:
+                ancestor = self._parents[ancestor]
+            if ancestor == node:
+                leaf_symbols.append(self._symbols[leaf])
+        return leaf_symbols
+
+    # cost of generalising leaf symbol 'leaf' to symbol 'general'
+    def cost(self, leaf, general) -> float:
+        row = self._leaf_to_row.get(self.__node(leaf))
+        if row is None:
+            return 0 if leaf == general else math.inf
+        return self._costs[row * len(self._symbols) + self.__node(general)]
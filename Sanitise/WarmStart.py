@@ -0,0 +1,137 @@
+import copy
+from collections import Counter, deque
+from typing import Union
+
+from Sanitise import TopDown, Trees
+from Sanitise.Context import SequenceContext
+from Sanitise.Helper import GeneralisationFunction
+from Sanitise.Patterns import SensitivePatternSet
+
+
+def refinements_of(g: GeneralisationFunction, taxonomy_tree) -> int:
+    """
+    Returns the number of refinements TopDown accepts to reach g from the all-root g: each accepted refinement
+    brings one symbol below the root into g, so it is the number of distinct symbols on the paths from the root
+    down to the generalisation symbols of the leaves
+    """
+    symbols = set()
+    for leaf in taxonomy_tree.get_leaf_symbols():
+        level = g.get_generalisation_level(leaf)
+        symbols.update(taxonomy_tree.path_symbols_from_root(leaf)[1:level + 1])
+    return len(symbols)
+
+
+def histogram_distance(histogram, other_histogram) -> float:
+    # L1 distance between the relative frequencies of the symbols of two sessions, in [0, 2]
+    total = sum(histogram.values()) or 1
+    other_total = sum(other_histogram.values()) or 1
+    return sum(abs(histogram.get(symbol, 0) / total - other_histogram.get(symbol, 0) / other_total)
+               for symbol in set(histogram) | set(other_histogram))
+
+
+class WarmStartCache:
+    """
+    The final generalisation functions of sessions already sanitised with TopDown, used as starting points for
+    similar sessions instead of the all-root g.
+
+    The g of a session is looked up among those of the last 'max_entries' sessions in which the same sensitive
+    patterns occur, as the one whose session has the nearest histogram (see histogram_distance). Inference gain
+    only depends on the session it is computed for, so the g found is checked against epsilon on the new
+    session first. If it does not satisfy epsilon, it is coarsened one level at a time, starting from the most
+    refined symbols of the session, until it does or every symbol of the session is generalised to the root:
+    every coarsening can only lower the inference gain. TopDown then continues refining from there.
+
+    The result satisfies epsilon like a run from the all-root g, but may differ from it, as TopDown is greedy.
+    The refinements of the starting g are iterations that TopDown does not run again; they are counted as
+    'iterations_saved' in the counts returned by generalise.
+    """
+
+    def __init__(self, sens_pats: list, epsilon: float,
+                 taxonomy_tree: Union[Trees.TaxonomyTree, Trees.CompiledTaxonomy], max_entries: int = 64):
+        self.sens_pats = [list(sens_pat) for sens_pat in sens_pats]
+        self.pattern_set = SensitivePatternSet(self.sens_pats)
+        self.epsilon = epsilon
+        self.taxonomy_tree = taxonomy_tree
+        self.max_entries = max_entries
+        self.__entries = {}  # matched patterns -> deque of (histogram, g)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.__entries.values())
+
+    def __repr__(self):
+        return f"<WarmStartCache: {len(self)} sessions, {len(self.__entries)} sets of matched patterns>"
+
+    def matched_patterns(self, context: SequenceContext) -> frozenset:
+        """
+        Returns the ids in 'pattern_set' of the sensitive patterns that occur in the session of 'context'
+        """
+        return frozenset(self.pattern_set.occurring(context.occurrence_index.next_position, len(context)))
+
+    def add(self, context: SequenceContext, g: GeneralisationFunction):
+        key = self.matched_patterns(context)
+        if key not in self.__entries:
+            self.__entries[key] = deque(maxlen=self.max_entries)
+        self.__entries[key].append((context.histogram, g))
+
+    def nearest(self, context: SequenceContext):
+        """
+        Returns the g of the cached session nearest to that of 'context', or None if there is none
+        """
+        entries = self.__entries.get(self.matched_patterns(context))
+        if not entries:
+            return None
+        histogram, g = min(entries, key=lambda entry: histogram_distance(context.histogram, entry[0]))
+        return g
+
+    def __coarsen(self, g: GeneralisationFunction, context: SequenceContext) -> bool:
+        # generalises the most refined symbol of the session (the most frequent one on a tie) one level up,
+        # with every leaf under it; False if every symbol of the session is already generalised to the root
+        refined = [symbol for symbol in context.histogram
+                   if symbol in g.generalisation_strategies and g.get_generalisation_level(symbol) > 0]
+        if len(refined) == 0:
+            return False
+        leaf = max(refined, key=lambda symbol: (g.get_generalisation_level(symbol), context.histogram[symbol]))
+        level = g.get_generalisation_level(leaf) - 1
+        parent = self.taxonomy_tree.path_symbols_from_root(leaf)[level]
+        for a_j in self.taxonomy_tree.leaf_symbols_under(parent):
+            if g.get_generalisation_level(a_j) > level:
+                g[a_j] = parent
+                g.set_generalisation_level(a_j, level)
+        return True
+
+    def starting_point(self, g: GeneralisationFunction, context: SequenceContext):
+        """
+        Returns (a copy of g coarsened until it satisfies epsilon on the session of 'context', the number of
+        coarsening steps)
+        """
+        g = copy.deepcopy(g)
+        steps = 0
+        while context.inference_gain(g) > self.epsilon and self.__coarsen(g, context):
+            steps += 1
+        return g, steps
+
+    def generalise(self, input_sequence: list, **top_down_options):
+        """
+        Returns (g_final chosen by TopDown for 'input_sequence', warm started from the nearest cached session,
+        a Counter of what was done), and caches g_final. 'top_down_options' are passed on to
+        TopDown.generalise_top_down.
+        """
+        top_down_options = dict(top_down_options)
+        context = top_down_options.pop("context", None)
+        if context is None:
+            context = SequenceContext(input_sequence, max_pattern_length=top_down_options.get("max_pattern_length"))
+        stats = top_down_options.pop("stats", None) or TopDown.TopDownStats()
+        counts = Counter(sessions=1)
+
+        g_start = self.nearest(context)
+        if g_start is not None:
+            g_start, coarsening_steps = self.starting_point(g_start, context)
+            counts.update(warm_started=1, coarsening_steps=coarsening_steps,
+                          iterations_saved=refinements_of(g_start, self.taxonomy_tree))
+        first_iteration = stats.iterations
+        g_final = TopDown.generalise_top_down(self.sens_pats, input_sequence, self.epsilon, self.taxonomy_tree,
+                                              initial_generalisation=g_start, context=context, stats=stats,
+                                              **top_down_options)
+        counts.update(iterations=stats.iterations - first_iteration)
+        self.add(context, g_final)
+        return g_final, counts
@@ -0,0 +1,54 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from Data.Compact import CompactSeqReader, taxonomy_symbols, write_compact_file
+from Data.Dataset import write_seq_file
+from Sanitise import Helper
+from Test import Setup
+
+
+class TestCompact(TestCase):
+    def setUp(self) -> None:
+        self.__tax_tree = Setup.MSNBC().get_tax_tree()
+        rand = random.Random(0)
+        sequences = [[str(rand.randint(1, 17)) for j in range(rand.randint(0, 40))] for i in range(300)]
+        # sanitised-like sessions: most events generalised to a few internal nodes
+        general = ["Root", "All-News", "Social"]
+        self.__sequences = [[symbol if rand.random() < 0.1 else general[int(symbol) % 3 // 2] for symbol in sequence]
+                            for sequence in sequences]
+        self.__dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        self.__dir.cleanup()
+
+    def test_round_trip(self):
+        path = os.path.join(self.__dir.name, "sanitised.rle")
+        write_compact_file(path, ["d1", "d2"], self.__sequences, symbols=taxonomy_symbols(self.__tax_tree),
+                           comment="test")
+        with CompactSeqReader(path) as reader:
+            self.assertEqual(len(reader), len(self.__sequences))
+            self.assertEqual(list(reader), self.__sequences)
+            self.assertEqual(reader.descriptors, ["d1", "d2"])
+            self.assertEqual(reader.comment, "test")
+            self.assertEqual(reader.num_events, sum(len(sequence) for sequence in self.__sequences))
+            for i in random.Random(1).sample(range(len(self.__sequences)), 20) + [-1]:
+                self.assertEqual(reader[i], self.__sequences[i])
+            with self.assertRaises(IndexError):
+                reader[len(self.__sequences)]
+
+    def test_smaller_than_text(self):
+        compact_path = os.path.join(self.__dir.name, "sanitised.rle")
+        text_path = os.path.join(self.__dir.name, "sanitised.seq")
+        write_compact_file(compact_path, [], self.__sequences, symbols=taxonomy_symbols(self.__tax_tree))
+        write_seq_file(text_path, [], self.__sequences)
+        self.assertLess(os.path.getsize(compact_path) * 3, os.path.getsize(text_path))
+
+    def test_taxonomy_symbols(self):
+        symbols = taxonomy_symbols(self.__tax_tree)
+        leaves = list(dict.fromkeys(self.__tax_tree.get_leaf_symbols()))
+        self.assertEqual(symbols[:len(leaves)], leaves)
+        self.assertIn(self.__tax_tree.get_root_symbol(), symbols)
+        g = Helper.GeneralisationFunction(leaves, default_generalisation=self.__tax_tree.get_root_symbol())
+        self.assertTrue(set(g.unique_strategies()) <= set(symbols))
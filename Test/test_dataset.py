@@ -0,0 +1,72 @@
+import itertools
+import json
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from Data.Dataset import DatasetStats, MSNBCDataset, length_bucket, write_seq_file
+from Data.Mining import mine_sequential_patterns
+from Sanitise.Occurrences import OccurrenceIndex
+
+
+class TestDatasetStats(TestCase):
+    def setUp(self) -> None:
+        rand = random.Random(0)
+        self.__sequences = [[str(rand.randint(1, 17)) for j in range(rand.randint(1, 30))] for i in range(500)]
+
+    def test_one_pass_stats(self):
+        stats = DatasetStats.from_sequences(self.__sequences)
+        self.assertEqual(stats.num_sequences, len(self.__sequences))
+        self.assertEqual(stats.num_distinct_sequences(), len(set(tuple(seq) for seq in self.__sequences)))
+        self.assertEqual(sum(stats.symbol_frequencies.values()), sum(len(seq) for seq in self.__sequences))
+        self.assertEqual(sum(stats.bigram_counts.values()), sum(len(seq) - 1 for seq in self.__sequences))
+        self.assertEqual(sum(stats.binned_length_histogram(10).values()), len(self.__sequences))
+
+    def test_merge_chunks(self):
+        serial = DatasetStats.from_sequences(self.__sequences)
+        parallel = DatasetStats.from_sequences(self.__sequences, processes=2, chunk_size=70)
+        self.assertEqual(parallel.to_dict(), serial.to_dict())
+
+    def test_to_from_dict(self):
+        stats = DatasetStats.from_sequences(self.__sequences)
+        cached = DatasetStats.from_dict(json.loads(json.dumps(stats.to_dict())))
+        self.assertEqual(cached.to_dict(), stats.to_dict())
+
+    def test_dataset_stats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            dataset_path = os.path.join(directory, MSNBCDataset.PATH)
+            os.makedirs(os.path.dirname(dataset_path))
+            write_seq_file(dataset_path, ["a", "b"], self.__sequences)
+            dataset = MSNBCDataset(directory)
+        serial = DatasetStats.from_sequences(self.__sequences).to_dict()
+        self.assertEqual(dataset.stats().to_dict(), serial)
+        # computing them again with other settings replaces the cached stats
+        parallel = dataset.compute_stats(processes=2, chunk_size=70)
+        self.assertIs(dataset.stats(), parallel)
+        self.assertEqual(parallel.to_dict(), serial)
+
+    def test_length_bucket(self):
+        self.assertEqual([length_bucket(n) for n in [0, 1, 2, 3, 4, 5, 8, 9]],
+                         ["0", "1", "2", "3-4", "3-4", "5-8", "5-8", "9-16"])
+
+
+class TestMining(TestCase):
+    def setUp(self) -> None:
+        rand = random.Random(0)
+        self.__sequences = [[str(rand.randint(1, 4)) for j in range(rand.randint(1, 8))] for i in range(200)]
+
+    def test_mine_sequential_patterns(self):
+        min_count, max_length = 20, 3
+        indices = [OccurrenceIndex(seq) for seq in self.__sequences]
+        expected = []
+        for length in range(1, max_length + 1):
+            for pattern in itertools.product(["1", "2", "3", "4"], repeat=length):
+                support = sum(index.occurs(pattern) for index in indices)
+                if support >= min_count:
+                    expected.append((list(pattern), support))
+
+        patterns = mine_sequential_patterns(self.__sequences, min_count, max_length=max_length)
+        self.assertEqual(sorted(patterns), sorted(expected))
+        self.assertEqual(mine_sequential_patterns(self.__sequences, min_count, max_length=max_length, processes=2),
+                         patterns)
@@ -0,0 +1,193 @@
+import copy
+import itertools
+import math
+import random
+from collections import Counter
+from math import comb
+from unittest import TestCase, mock
+
+from Privacy import Entropy
+from Privacy.Distributions import Distribution, FrequencyDistribution, ProbabilityDistribution, \
+    JointProbabilityDistribution, count_subsequences, count_subsequences_parallel, decode_subsequence_key, \
+    enum_subsequence_keys, enum_subsequences_gray, run_length_encode
+from Sanitise import Helper
+from Sanitise.Helper import GeneralisationFunction
+from Test import Setup
+
+
+def brute_force_counts(sequence, max_length=None):
+    counts = Counter()
+    for length in range(1, (len(sequence) if max_length is None else max_length) + 1):
+        for positions in itertools.combinations(range(len(sequence)), length):
+            counts[tuple(sequence[i] for i in positions)] += 1
+    return dict(counts)
+
+
+def dict_entropy(counts: dict):
+    # H = sum(p * log 1/p) over the probabilities of the events, as computed before the count based entropy
+    total = sum(counts.values())
+    return sum(count / total * math.log2(total / count) for count in counts.values() if count > 0)
+
+
+def dict_inference_gain(sequence, g):
+    # I(S;G) = H(S) - H(S|G), H(S|G) = sum(P(s, g) * log P(g) / P(s, g)) over the pairs of positions chosen together
+    sanitised = Helper.sanitise_seq(sequence, g)
+    S, G = brute_force_counts(sequence), brute_force_counts(sanitised)
+    joint = Counter()
+    for length in range(1, len(sequence) + 1):
+        for positions in itertools.combinations(range(len(sequence)), length):
+            joint[tuple(sequence[i] for i in positions), tuple(sanitised[i] for i in positions)] += 1
+    joint_total, G_total = sum(joint.values()), sum(G.values())
+    H_S_giv_G = sum(count / joint_total * math.log2(G[event_G] / G_total / (count / joint_total))
+                    for (event_S, event_G), count in joint.items())
+    return dict_entropy(S) - H_S_giv_G
+
+
+def counts_of(distribution):
+    return {event: distribution.counts[index] for event, index in distribution.event_index.items()}
+
+
+class TestFrequencyDistribution(TestCase):
+    def setUp(self) -> None:
+        rand = random.Random(0)
+        self.__sequences = [[rand.choice(["Wine", "Beer", "Milk"]) for j in range(rand.randint(0, 9))]
+                            for i in range(10)]
+
+    def test_gray_code_enumeration(self):
+        for sequence in self.__sequences:
+            self.assertEqual(counts_of(FrequencyDistribution(sequence)), brute_force_counts(sequence))
+            self.assertEqual(counts_of(FrequencyDistribution(sequence, run_length=False)),
+                             brute_force_counts(sequence))
+
+    def test_gray_code_ranges(self):
+        sequence = self.__sequences[-1]
+        stop = 2 ** len(sequence)
+        middle = stop // 3
+        patterns = list(enum_subsequences_gray(sequence, stop=middle)) + \
+            list(enum_subsequences_gray(sequence, start=middle))
+        self.assertEqual(len(patterns), stop - 1)
+        self.assertEqual(dict(Counter(pattern for (pattern,) in patterns)), brute_force_counts(sequence))
+
+    def test_subsequence_keys(self):
+        rand = random.Random(1)
+        for typecode, num_symbols in [("B", 4), ("B", 255), ("H", 300)]:
+            encoded_sequence = [rand.randrange(num_symbols) for i in range(9)]
+            stop = 2 ** len(encoded_sequence)
+            keys = list(enum_subsequence_keys(encoded_sequence, stop=stop // 3, typecode=typecode)) + \
+                list(enum_subsequence_keys(encoded_sequence, start=stop // 3, typecode=typecode))
+            patterns = [tuple(symbol_id + 1 for symbol_id in pattern)
+                        for (pattern,) in enum_subsequences_gray(encoded_sequence)]
+            self.assertEqual([tuple(decode_subsequence_key(key, typecode)) for key in keys], patterns)
+            # one key per distinct pattern
+            self.assertEqual(len(set(keys)), len(set(patterns)))
+
+    def test_append(self):
+        for sequence in self.__sequences:
+            distribution = Distribution()
+            for symbol in sequence:
+                distribution.append(symbol)
+            self.assertEqual(counts_of(distribution), brute_force_counts(sequence))
+
+    def test_bounded(self):
+        for sequence in self.__sequences:
+            for max_length in [1, 2, 3]:
+                distribution = FrequencyDistribution(sequence, max_length=max_length)
+                self.assertEqual(counts_of(distribution), brute_force_counts(sequence, max_length=max_length))
+                self.assertEqual(distribution.total(), count_subsequences(len(sequence), max_length))
+
+    def test_run_length(self):
+        for sequence in self.__sequences + [["Wine"] * 4 + ["Beer"] * 3 + ["Wine"] * 2]:
+            self.assertEqual(counts_of(FrequencyDistribution(sequence, run_length=True)), brute_force_counts(sequence))
+            self.assertEqual(counts_of(FrequencyDistribution.from_runs(run_length_encode(sequence), max_length=2)),
+                             brute_force_counts(sequence, max_length=2))
+        # counts beyond int64 are kept exactly
+        distribution = FrequencyDistribution(["Milk"] * 70 + ["Beer"])
+        self.assertEqual(distribution.total(), 2 ** 71 - 1)
+        self.assertEqual(distribution.get_count(("Milk",) * 35), comb(70, 35))
+
+    def test_parallel(self):
+        for sequence in self.__sequences[:4]:
+            serial = FrequencyDistribution(sequence, run_length=False)
+            parallel = FrequencyDistribution(sequence, processes=2, run_length=False)
+            # same counts, and the events in the same order
+            self.assertEqual(list(counts_of(parallel).items()), list(counts_of(serial).items()))
+        self.assertEqual(count_subsequences_parallel(self.__sequences[-1], 3, num_ranges=7),
+                         brute_force_counts(self.__sequences[-1]))
+
+    def test_parallel_with_runs(self):
+        # a process pool is used when asked for, even if the sequence has runs
+        sequence = ["Wine"] * 4 + ["Beer"] * 3 + ["Wine"] * 2
+        with mock.patch("Privacy.Distributions.count_subsequences_parallel",
+                        wraps=count_subsequences_parallel) as parallel:
+            distribution = FrequencyDistribution(sequence, processes=2)
+            self.assertEqual(parallel.call_count, 1)
+            FrequencyDistribution(sequence, processes=2, run_length=True)
+            FrequencyDistribution(sequence)
+            self.assertEqual(parallel.call_count, 1)
+        self.assertEqual(counts_of(distribution), brute_force_counts(sequence))
+
+
+class TestProbabilityDistribution(TestCase):
+    def setUp(self) -> None:
+        self.__tax_tree = Setup.Groceries().get_tax_tree()
+        rand = random.Random(1)
+        leaves = self.__tax_tree.get_leaf_symbols()
+        self.__sequences = [[rand.choice(leaves[:4]) for j in range(rand.randint(1, 8))] for i in range(10)]
+        self.__rand = rand
+
+    def test_entropy(self):
+        for sequence in self.__sequences:
+            self.assertAlmostEqual(Entropy.shannon_entropy(ProbabilityDistribution(sequence)),
+                                   dict_entropy(brute_force_counts(sequence)))
+
+    def test_inference_gain(self):
+        leaves = self.__tax_tree.get_leaf_symbols()
+        for sequence in self.__sequences:
+            g = GeneralisationFunction(leaves, default_generalisation=self.__tax_tree.get_root_symbol())
+            for leaf in self.__rand.sample(leaves[:4], 2):
+                path = self.__tax_tree.path_symbols_from_root(leaf)
+                g[leaf] = path[self.__rand.randint(0, len(path) - 1)]
+            sanitised = Helper.sanitise_seq(sequence, g)
+            S, G = ProbabilityDistribution(sequence), ProbabilityDistribution(sanitised)
+            joint = JointProbabilityDistribution(sequence, sanitised)
+            self.assertAlmostEqual(Entropy.shannon_entropy(G), dict_entropy(brute_force_counts(sanitised)))
+            self.assertAlmostEqual(Entropy.mutual_information(S, G, joint), dict_inference_gain(sequence, g))
+            self.assertAlmostEqual(Entropy.inference_gain(sequence, [], g), dict_inference_gain(sequence, g))
+
+    def test_from_frequencies(self):
+        frequencies = FrequencyDistribution(["Wine", "Beer"])
+        probabilities = ProbabilityDistribution(frequencies=frequencies)
+        self.assertAlmostEqual(probabilities.get(["Wine"]), 1 / 3)
+        # later changes to the source do not leak into the probabilities, nor into their cached total
+        frequencies.append("Wine")
+        frequencies.set(5, ["Beer"])
+        self.assertAlmostEqual(probabilities.get(["Wine"]), 1 / 3)
+        self.assertAlmostEqual(sum(probabilities.values()), 1)
+        self.assertNotIn(["Wine", "Wine"], probabilities)
+
+
+class TestInferenceGainEvaluator(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.Groceries()
+        self.__rand = random.Random(0)
+
+    def random_refinement(self, g):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        refined = copy.deepcopy(g)
+        for leaf in self.__rand.sample(tax_tree.get_leaf_symbols(), 3):
+            path = tax_tree.path_symbols_from_root(leaf)
+            refined[leaf] = path[self.__rand.randint(0, len(path) - 1)]
+        return refined
+
+    def test_gain_of(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        sequence = [self.__rand.choice(tax_tree.get_leaf_symbols()) for i in range(8)]
+        g = GeneralisationFunction(tax_tree.get_leaf_symbols(), default_generalisation=tax_tree.get_root_symbol())
+        evaluator = Entropy.InferenceGainEvaluator(sequence, g)
+        self.assertAlmostEqual(evaluator.gain(), Entropy.inference_gain(sequence, [], g))
+        for i in range(10):
+            g_temp = self.random_refinement(g)
+            self.assertAlmostEqual(evaluator.gain_of(g_temp), Entropy.inference_gain(sequence, [], g_temp))
+            if i % 3 == 0:
+                g = g_temp
+                evaluator.rebase(g)
@@ -0,0 +1,39 @@
+import random
+from unittest import TestCase
+
+from Privacy import Entropy
+from Sanitise import Helper
+from Sanitise.Global import GlobalGeneralisation
+from Sanitise.Occurrences import OccurrenceIndex
+from Test import Setup
+
+
+class TestGlobalGeneralisation(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.MSNBC()
+        rand = random.Random(0)
+        self.__sequences = [[str(rand.randint(1, 17)) for j in range(rand.randint(0, 7))] for i in range(60)]
+        self.__tax_tree = self.__test_parameters.get_tax_tree().compile()
+
+    def test_apply_and_utility_loss(self):
+        dataset = GlobalGeneralisation(self.__sequences, self.__tax_tree)
+        self.assertEqual(list(dataset.sessions()), self.__sequences)
+        cost_func = self.__tax_tree.get_cost_func()
+        g = Helper.GeneralisationFunction(self.__tax_tree.get_leaf_symbols(), default_generalisation="Root")
+        for leaf in ["1", "13", "4"]:
+            g[leaf] = self.__tax_tree.get_parent_symbol(leaf)
+        self.assertEqual(dataset.generalise(g), [Helper.generalise_seq(seq, g) for seq in self.__sequences])
+        utility_losses = [Helper.utility_loss_by_generalising(seq, g, cost_func) for seq in self.__sequences]
+        for utility_loss, expected in zip(dataset.utility_losses(g), utility_losses):
+            self.assertAlmostEqual(utility_loss, expected)
+        self.assertAlmostEqual(dataset.utility_loss(g), sum(utility_losses))
+
+    def test_search(self):
+        dataset = GlobalGeneralisation(self.__sequences, self.__tax_tree)
+        sens_pats, epsilon = [["1", "2"], ["4", "4"]], 4
+        g = dataset.search(sens_pats, epsilon)
+        root_g = Helper.GeneralisationFunction(self.__tax_tree.get_leaf_symbols(), default_generalisation="Root")
+        self.assertLess(dataset.utility_loss(g), dataset.utility_loss(root_g))
+        for sequence in self.__sequences:
+            if OccurrenceIndex(sequence).occurs_any(sens_pats):
+                self.assertLessEqual(Entropy.inference_gain(sequence, sens_pats, g), epsilon + 1e-9)
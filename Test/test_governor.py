@@ -0,0 +1,72 @@
+import random
+from unittest import TestCase
+
+from Sanitise import TopDown
+from Sanitise.Governor import Decision, ResourceGovernor
+from Test import Setup
+
+
+class TestResourceGovernor(TestCase):
+    def setUp(self) -> None:
+        self.__tax_tree = Setup.MSNBC().get_tax_tree().compile()
+        rand = random.Random(0)
+        self.__sequence = [str(rand.randint(1, 17)) for i in range(16)]
+
+    def test_estimate(self):
+        governor = ResourceGovernor()
+        estimates = [governor.estimate(self.__sequence, self.__tax_tree, k) for k in range(1, len(self.__sequence))]
+        # the cost grows with the bound, up to that of the exact distributions
+        self.assertEqual(estimates, sorted(estimates))
+        exact_seconds, exact_bytes = governor.estimate(self.__sequence, self.__tax_tree)
+        self.assertGreaterEqual((exact_seconds, exact_bytes), estimates[-1])
+        # one pass over the distinct patterns per evaluation, on top of building S
+        repeated = ["1"] * len(self.__sequence)
+        seconds, num_bytes = governor.estimate(repeated, self.__tax_tree)
+        self.assertLess(seconds * 1000, exact_seconds)
+        self.assertLess(num_bytes * 1000, exact_bytes)
+
+    def test_exact(self):
+        governor = ResourceGovernor()
+        with self.assertLogs("Sanitise.Governor", level="INFO") as logs:
+            decision = governor.decide(self.__sequence, self.__tax_tree)
+        self.assertEqual(decision.mode, Decision.EXACT)
+        self.assertIsNone(decision.max_pattern_length)
+        self.assertIn(Decision.EXACT, logs.output[0])
+
+    def test_approximate(self):
+        max_seconds = 0.5
+        governor = ResourceGovernor(max_seconds=max_seconds)
+        with self.assertLogs("Sanitise.Governor", level="INFO") as logs:
+            decision = governor.decide(self.__sequence, self.__tax_tree)
+        self.assertEqual(decision.mode, Decision.APPROXIMATE)
+        # the longest bound predicted to fit the budget
+        fits = [k for k in range(2, len(self.__sequence))
+                if governor.estimate(self.__sequence, self.__tax_tree, k)[0] <= max_seconds]
+        self.assertEqual(decision.max_pattern_length, max(fits))
+        self.assertLessEqual(decision.predicted_seconds, max_seconds)
+        self.assertIn(f"max pattern length {max(fits)}", logs.output[0])
+
+        sens_pats = [self.__sequence[2:4]]
+        with self.assertLogs("Sanitise.Governor", level="INFO"):
+            sanitised = governor.sanitise(sens_pats, self.__sequence, 4, self.__tax_tree)
+        self.assertEqual(sanitised, TopDown.sanitise_seq_top_down(sens_pats, self.__sequence, 4, self.__tax_tree,
+                                                                  max_pattern_length=max(fits)))
+
+    def test_most_general(self):
+        governor = ResourceGovernor(max_bytes=1000)
+        with self.assertLogs("Sanitise.Governor", level="INFO") as logs:
+            decision = governor.decide(self.__sequence, self.__tax_tree)
+        self.assertEqual(decision.mode, Decision.MOST_GENERAL)
+        self.assertIn(Decision.MOST_GENERAL, logs.output[0])
+
+        # no sensitive pattern occurs: the sequence is returned as it is
+        absent = min(set(str(i) for i in range(1, 18)) - set(self.__sequence))
+        sens_pats = [[self.__sequence[0], absent]]
+        self.assertFalse(TopDown.do_any_sens_pats_occur(self.__sequence, sens_pats))
+        with self.assertLogs("Sanitise.Governor", level="INFO"):
+            self.assertEqual(governor.sanitise(sens_pats, self.__sequence, 4, self.__tax_tree), self.__sequence)
+        # otherwise every symbol is generalised to the root
+        sens_pats = [self.__sequence[2:4]]
+        with self.assertLogs("Sanitise.Governor", level="INFO"):
+            self.assertEqual(governor.sanitise(sens_pats, self.__sequence, 4, self.__tax_tree),
+                             [self.__tax_tree.get_root_symbol()] * len(self.__sequence))
@@ -0,0 +1,54 @@
+import random
+from unittest import TestCase
+
+from Data.Index import SessionIndex
+from Sanitise import TopDown
+from Sanitise.Batch import BatchSanitiser
+from Sanitise.Occurrences import OccurrenceIndex
+from Test import Setup
+
+
+class TestSessionIndex(TestCase):
+    def setUp(self) -> None:
+        rand = random.Random(0)
+        self.__sequences = [[str(rand.randint(1, 17)) for j in range(rand.randint(0, 8))] for i in range(200)]
+        self.__patterns = [[str(rand.randint(1, 17)) for j in range(rand.randint(1, 3))] for i in range(30)]
+
+    def test_occurs(self):
+        index = SessionIndex(self.__sequences)
+        for session, sequence in enumerate(self.__sequences):
+            occurrence_index = OccurrenceIndex(sequence)
+            for pattern in self.__patterns + [["18"]]:
+                self.assertEqual(index.occurs(session, pattern), occurrence_index.occurs(pattern))
+
+    def test_next_position(self):
+        index = SessionIndex(self.__sequences)
+        for session, sequence in enumerate(self.__sequences[:50]):
+            occurrence_index = OccurrenceIndex(sequence)
+            self.assertEqual(index.session_length(session), len(sequence))
+            for symbol in ["1", "5", "17", "18"]:
+                for position in range(len(sequence) + 1):
+                    self.assertEqual(index.next_position(session, symbol, position),
+                                     occurrence_index.next_position(symbol, position))
+
+    def test_candidate_sessions(self):
+        index = SessionIndex(self.__sequences)
+        candidates = set(index.candidate_sessions(self.__patterns))
+        for session, sequence in enumerate(self.__sequences):
+            if OccurrenceIndex(sequence).occurs_any(self.__patterns):
+                self.assertIn(session, candidates)
+
+
+class TestTriage(TestCase):
+    def test_pass_through_matches_top_down(self):
+        tax_tree = Setup.MSNBC().get_tax_tree()
+        rand = random.Random(1)
+        sequences = [[str(rand.randint(1, 6)) for j in range(rand.randint(1, 7))] for i in range(40)]
+        sens_pats = [["1", "2"], ["3", "3"]]
+        sanitiser = BatchSanitiser(sens_pats, 3, tax_tree)
+
+        sanitised = list(sanitiser.sanitise(sequences))
+        self.assertEqual(sanitised, [TopDown.sanitise_seq_top_down(sens_pats, sequence, 3, sanitiser.taxonomy)
+                                     for sequence in sequences])
+        self.assertEqual(set(sanitiser.triage_counts.keys()),
+                         {BatchSanitiser.NO_MATCH, BatchSanitiser.EPSILON, BatchSanitiser.SANITISE})
@@ -0,0 +1,60 @@
+import random
+import threading
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from Sanitise.Batch import BatchSanitiser
+from Sanitise.Metrics import Metrics, MetricsServer
+from Test import Setup
+
+
+class TestMetrics(TestCase):
+    def test_render(self):
+        metrics = Metrics()
+        metrics.inc("runs_total", 2, "Runs", outcome="ok")
+        metrics.set("ratio", 0.5)
+        metrics.observe("seconds", 0.02, buckets=(0.01, 0.1), length="3-4")
+        self.assertEqual(metrics.render().splitlines(), [
+            "# TYPE ratio gauge",
+            "ratio 0.5",
+            "# HELP runs_total Runs",
+            "# TYPE runs_total counter",
+            "runs_total{outcome=\"ok\"} 2",
+            "# TYPE seconds histogram",
+            "seconds_bucket{length=\"3-4\",le=\"0.01\"} 0",
+            "seconds_bucket{length=\"3-4\",le=\"0.1\"} 1",
+            "seconds_bucket{length=\"3-4\",le=\"+Inf\"} 1",
+            "seconds_sum{length=\"3-4\"} 0.02",
+            "seconds_count{length=\"3-4\"} 1",
+        ])
+        with self.assertRaises(ValueError):
+            metrics.set("runs_total", 1)
+
+    def test_batch_endpoint(self):
+        tax_tree = Setup.MSNBC().get_tax_tree()
+        rand = random.Random(1)
+        sequences = [[str(rand.randint(1, 6)) for j in range(rand.randint(1, 7))] for i in range(20)]
+        metrics = Metrics()
+        sanitiser = BatchSanitiser([["1", "2"], ["3", "3"]], 3, tax_tree, warm_start=True, metrics=metrics)
+        with MetricsServer(metrics) as server:
+            list(sanitiser.sanitise(sequences))
+            with urllib.request.urlopen(server.url) as response:
+                body = response.read().decode("utf-8")
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(server.url.replace("/metrics", "/other"))
+        self.assertEqual(metrics.total("sanitiser_sessions_total"), len(sequences))
+        self.assertEqual(metrics.get("sanitiser_events_total"), sum(len(sequence) for sequence in sequences))
+        self.assertIn(f"sanitiser_sessions_total{{outcome=\"sanitise\"}} "
+                      f"{sanitiser.triage_counts[BatchSanitiser.SANITISE]}", body)
+        for name in ["sanitiser_session_seconds_bucket", "sanitiser_inference_gain_calls_count",
+                     "sanitiser_worker_utilisation", "sanitiser_max_resident_memory_bytes",
+                     "sanitiser_throughput_sessions_per_second", "sanitiser_warm_start_hit_ratio"]:
+            self.assertIn(name, body)
+
+    def test_stop_without_start(self):
+        server = MetricsServer(Metrics())
+        stopper = threading.Thread(target=server.stop, daemon=True)
+        stopper.start()
+        stopper.join(5)
+        self.assertFalse(stopper.is_alive())
@@ -0,0 +1,47 @@
+import random
+from unittest import TestCase
+
+from Sanitise.Occurrences import OccurrenceIndex
+
+
+def leftmost_occurrence(sequence, pattern):
+    positions, j = [], 0
+    for symbol in pattern:
+        while j < len(sequence) and sequence[j] != symbol:
+            j += 1
+        if j == len(sequence):
+            return None
+        positions.append(j)
+        j += 1
+    return positions
+
+
+class TestOccurrenceIndex(TestCase):
+    def setUp(self) -> None:
+        self.__random = random.Random(0)
+        self.__alphabet = ["Wine", "Beer", "Cookies", "Chips", "Milk", "Cheese"]
+
+    def random_seq(self, length):
+        return [self.__random.choice(self.__alphabet) for i in range(length)]
+
+    def test_find(self):
+        for i in range(50):
+            sequence = self.random_seq(self.__random.randint(0, 15))
+            index = OccurrenceIndex(sequence)
+            for j in range(20):
+                pattern = self.random_seq(self.__random.randint(0, 4))
+                self.assertEqual(index.find(pattern), leftmost_occurrence(sequence, pattern))
+                self.assertEqual(index.occurs(pattern), leftmost_occurrence(sequence, pattern) is not None)
+
+    def test_find_all(self):
+        sequence = self.random_seq(30)
+        patterns = [self.random_seq(self.__random.randint(1, 6)) for i in range(500)]
+        expected = {i: leftmost_occurrence(sequence, pattern) for i, pattern in enumerate(patterns)}
+        expected = {i: positions for i, positions in expected.items() if positions is not None}
+        self.assertEqual(OccurrenceIndex(sequence).find_all(patterns), expected)
+
+    def test_unknown_symbol(self):
+        index = OccurrenceIndex(["Wine", "Beer"])
+        self.assertFalse(index.occurs(["Wine", "Milk"]))
+        self.assertFalse(index.occurs_any([["Milk"], ["Beer", "Wine"]]))
+        self.assertTrue(index.occurs_any([["Milk"], ["Wine", "Beer"]]))
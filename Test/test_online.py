@@ -0,0 +1,73 @@
+import random
+from unittest import TestCase
+
+from Privacy import Entropy
+from Privacy.Distributions import Distribution
+from Sanitise import TopDown
+from Sanitise.Online import OnlineTopDownSanitiser
+from Test import Setup
+
+
+class TestOnlineTopDownSanitiser(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.Groceries()
+        rand = random.Random(0)
+        self.__sequence = [rand.choice(sorted(self.__test_parameters.get_alphabet_leaves())) for i in range(9)]
+
+    def is_all_root(self, g):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        return all(g[a] == tax_tree.get_root_symbol() for a in tax_tree.get_leaf_symbols())
+
+    def test_append(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        sens_pat = self.__sequence[2:4]
+        for epsilon in [2.5, 4.5]:
+            sanitiser = OnlineTopDownSanitiser([sens_pat], epsilon, tax_tree)
+            frequencies = Distribution()
+            for i, event in enumerate(self.__sequence):
+                sanitised_sequence = sanitiser.append(event)
+                frequencies.append(event)
+                from_scratch = TopDown.sanitise_seq_top_down([sens_pat], self.__sequence[:i + 1], epsilon, tax_tree)
+                self.assertEqual(len(sanitised_sequence), i + 1)
+                self.assertEqual(len(from_scratch), i + 1)
+                g = sanitiser.get_generalisation_function()
+                if i < 3:
+                    # the sensitive pattern cannot have occurred yet
+                    self.assertIsNone(g)
+                    self.assertEqual(sanitised_sequence, self.__sequence[:i + 1])
+                    self.assertEqual(from_scratch, self.__sequence[:i + 1])
+                    continue
+                if i == 3:
+                    # the pattern has just occurred: TopDown ran from the all-root g on the same prefix
+                    self.assertEqual(sanitised_sequence, from_scratch)
+                # the output satisfies epsilon, unless even the all-root g does not (TopDown keeps it regardless)
+                if not self.is_all_root(g):
+                    self.assertLessEqual(Entropy.generalised_shannon_entropy(frequencies, g), epsilon)
+                else:
+                    self.assertEqual(set(from_scratch), {tax_tree.get_root_symbol()})
+
+    def test_fall_back(self):
+        # the prefix's refinement stops satisfying epsilon once the next event is appended
+        tax_tree = self.__test_parameters.get_tax_tree()
+        epsilon = 4
+        sanitiser = OnlineTopDownSanitiser([self.__sequence[2:4]], epsilon, tax_tree)
+        sanitiser.append(*self.__sequence[:4])
+        chain = sanitiser.get_refinements()
+        self.assertGreater(len(chain), 1)
+        sanitiser.append(self.__sequence[4])
+
+        frequencies = Distribution()
+        for event in self.__sequence[:5]:
+            frequencies.append(event)
+        gains = [Entropy.generalised_shannon_entropy(frequencies, g) for g in chain]
+        self.assertGreater(gains[-1], epsilon)
+        # the deepest refinement of the chain still within epsilon is kept, along with the ones before it
+        deepest = max([0] + [i for i, gain in enumerate(gains) if gain <= epsilon])
+        self.assertTrue(0 < deepest < len(chain) - 1)
+        new_chain = sanitiser.get_refinements()
+        self.assertEqual([g.generalisation_strategies for g in new_chain[:deepest + 1]],
+                         [g.generalisation_strategies for g in chain[:deepest + 1]])
+        g = sanitiser.get_generalisation_function()
+        self.assertLessEqual(Entropy.generalised_shannon_entropy(frequencies, g), epsilon)
+        self.assertEqual(sanitiser.get_sanitised_sequence(),
+                         [g[event] for event in self.__sequence[:5]])
@@ -0,0 +1,65 @@
+import random
+from unittest import TestCase
+
+from Data.Index import SessionIndex
+from Sanitise.Helper import GeneralisationFunction, sanitise_pats
+from Sanitise.Occurrences import OccurrenceIndex
+from Sanitise.Patterns import SensitivePatternSet
+from Test import Setup
+
+
+class TestSensitivePatternSet(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.Groceries()
+        leaves = self.__test_parameters.get_alphabet_leaves()
+        rand = random.Random(0)
+        self.__sens_pats = [[rand.choice(leaves) for j in range(rand.randint(1, 3))] for i in range(200)]
+        self.__g = GeneralisationFunction(leaves, default_generalisation="ALL")
+        for leaf in ["Wine", "Beer"]:
+            self.__g[leaf] = "Alcohol"
+
+    def test_dedup_and_index(self):
+        pattern_set = SensitivePatternSet(self.__sens_pats)
+        unique_sens_pats = []
+        for sens_pat in self.__sens_pats:
+            if sens_pat not in unique_sens_pats:
+                unique_sens_pats.append(sens_pat)
+        self.assertEqual(pattern_set.get_patterns(), unique_sens_pats)
+        for pattern_id in pattern_set.patterns_with(["Milk"]):
+            self.assertIn("Milk", pattern_set[pattern_id])
+        self.assertEqual(len(pattern_set.patterns_with(["Milk"])),
+                         len([p for p in pattern_set if "Milk" in p]))
+
+    def test_generalise(self):
+        pattern_set = SensitivePatternSet(self.__sens_pats)
+        self.assertEqual(pattern_set.generalise(self.__g), sanitise_pats(self.__sens_pats, self.__g))
+
+    def test_refine_and_revert(self):
+        pattern_set = SensitivePatternSet(self.__sens_pats)
+        generalised = pattern_set.generalised_by(self.__g)
+        before = sorted(generalised)
+        undo = generalised.refine({"Milk": "Dairy", "Cheese": "Dairy"})
+        g_refined = GeneralisationFunction(self.__test_parameters.get_alphabet_leaves(), default_generalisation="ALL")
+        for leaf, symbol in [("Wine", "Alcohol"), ("Beer", "Alcohol"), ("Milk", "Dairy"), ("Cheese", "Dairy")]:
+            g_refined[leaf] = symbol
+        self.assertEqual(sorted(generalised), sorted(sanitise_pats(self.__sens_pats, g_refined)))
+        generalised.revert(undo)
+        self.assertEqual(sorted(generalised), before)
+
+    def test_occurring(self):
+        pattern_set = SensitivePatternSet(self.__sens_pats)
+        leaves = self.__test_parameters.get_alphabet_leaves()
+        rand = random.Random(1)
+        sequences = [[rand.choice(leaves) for j in range(rand.randint(0, 6))] for i in range(100)]
+        index = SessionIndex(sequences)
+        for session, sequence in enumerate(sequences):
+            occurrence_index = OccurrenceIndex(sequence)
+            expected = {pattern_id for pattern_id, pattern in enumerate(pattern_set)
+                        if occurrence_index.occurs(pattern)}
+            self.assertEqual(pattern_set.occurring(occurrence_index.next_position, len(sequence)), expected)
+            self.assertEqual(pattern_set.occurs_in(occurrence_index.next_position, len(sequence)), len(expected) > 0)
+            self.assertEqual(occurrence_index.occurs_any(self.__sens_pats), len(expected) > 0)
+            # against the postings of the session in a SessionIndex
+            def next_position(symbol, position):
+                return index.next_position(session, symbol, position)
+            self.assertEqual(pattern_set.occurring(next_position, index.session_length(session)), expected)
@@ -0,0 +1,75 @@
+import math
+import random
+from unittest import TestCase
+
+from Sanitise import TopDown
+from Sanitise.Governor import ResourceGovernor
+from Sanitise.Planner import ExecutionPlanner, Plan
+from Test import Setup
+
+
+class TestExecutionPlanner(TestCase):
+    def setUp(self) -> None:
+        self.__tax_tree = Setup.MSNBC().get_tax_tree().compile()
+        rand = random.Random(0)
+        self.__sequence = [str(rand.randint(1, 17)) for i in range(30)]
+
+    def test_plan(self):
+        sens_pats = [self.__sequence[:2]]
+        planner = ExecutionPlanner(max_seconds=1)
+        self.assertEqual(planner.plan(self.__sequence[:6], self.__tax_tree, sens_pats).strategy, Plan.EXACT)
+        plan = planner.plan(self.__sequence, self.__tax_tree, sens_pats)
+        self.assertEqual((plan.strategy, plan.over_budget), (Plan.EXACT, True))
+
+        # the cheapest allowed plan, even when a more accurate one fits the budget
+        planner = ExecutionPlanner(max_seconds=1, min_pattern_length=2, min_window_length=6)
+        for sequence in [self.__sequence, self.__sequence[:6]]:
+            plan = planner.plan(sequence, self.__tax_tree, sens_pats)
+            self.assertEqual((plan.strategy, plan.max_pattern_length, plan.over_budget), (Plan.BOUNDED, 2, False))
+        self.assertEqual(len(planner.history), 2)
+        plan = ExecutionPlanner(max_seconds=1, min_pattern_length=29).plan(self.__sequence, self.__tax_tree,
+                                                                          sens_pats)
+        self.assertEqual((plan.strategy, plan.max_pattern_length, plan.over_budget), (Plan.BOUNDED, 29, True))
+
+        planner = ExecutionPlanner(max_seconds=1, min_window_length=6)
+        plan = planner.plan(self.__sequence, self.__tax_tree, sens_pats)
+        self.assertEqual(plan.strategy, Plan.SEGMENTED)
+        sanitised = planner.sanitise(sens_pats, self.__sequence, 2, self.__tax_tree)
+        self.assertEqual(len(sanitised), len(self.__sequence))
+        self.assertIsNotNone(planner.history[-1].actual_seconds)
+
+    def test_cheapest_window(self):
+        sens_pats = [self.__sequence[:2]]
+        leaves, depth = ResourceGovernor.taxonomy_shape(self.__tax_tree)
+        for min_window_length in [2, 4]:
+            planner = ExecutionPlanner(min_window_length=min_window_length)
+            for length in range(min_window_length + 1, 16):
+                sequence = self.__sequence[:length]
+                alphabet_size = len(set(sequence))
+                costs = [ResourceGovernor.predict_cost(length, alphabet_size, leaves, depth, num_sens_pats=1)]
+                for window_length in range(min_window_length, length):
+                    seconds, num_bytes = ResourceGovernor.predict_cost(window_length,
+                                                                       min(alphabet_size, window_length),
+                                                                       leaves, depth, num_sens_pats=1)
+                    costs.append((seconds * math.ceil(length / window_length), num_bytes))
+                plan = planner.plan(sequence, self.__tax_tree, sens_pats)
+                self.assertEqual((plan.predicted_seconds, plan.predicted_bytes), min(costs))
+
+    def test_shared_cost_model(self):
+        sens_pats = [self.__sequence[:2], self.__sequence[3:6]]
+        governor = ResourceGovernor(seconds_per_subsequence=1e-6, bytes_per_pattern=100)
+        planner = ExecutionPlanner(min_pattern_length=3, seconds_per_subsequence=1e-6, bytes_per_pattern=100)
+        for sequence in [self.__sequence[:12], ["1"] * 6 + self.__sequence[:6]]:
+            exact = ExecutionPlanner(seconds_per_subsequence=1e-6, bytes_per_pattern=100).plan(
+                sequence, self.__tax_tree, sens_pats)
+            self.assertEqual((exact.predicted_seconds, exact.predicted_bytes),
+                             governor.estimate(sequence, self.__tax_tree, num_sens_pats=len(sens_pats)))
+            bounded = planner.plan(sequence, self.__tax_tree, sens_pats)
+            self.assertEqual((bounded.predicted_seconds, bounded.predicted_bytes),
+                             governor.estimate(sequence, self.__tax_tree, 3, len(sens_pats)))
+
+    def test_sanitise_exact(self):
+        sequence, sens_pats = self.__sequence[:8], [self.__sequence[:2]]
+        planner = ExecutionPlanner()
+        self.assertEqual(planner.sanitise(sens_pats, sequence, 2, self.__tax_tree),
+                         TopDown.sanitise_seq_top_down(sens_pats, sequence, 2, self.__tax_tree))
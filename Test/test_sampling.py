@@ -0,0 +1,53 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from Data.Dataset import write_seq_file
+from Data.Sampling import StratifiedSampler, contains_pattern, sample_seq_file
+
+
+class TestStratifiedSampler(TestCase):
+    def setUp(self) -> None:
+        rand = random.Random(0)
+        self.__sequences = [[str(rand.randint(1, 9)) for j in range(rand.choice([1, 2, 3, 5, 12, 30]))]
+                            for i in range(2000)]
+        self.__sens_pats = [["1", "2"]]
+
+    def test_proportional(self):
+        sampler = StratifiedSampler(200, self.__sens_pats, seed=3).add_all(self.__sequences)
+        sample = sampler.sample()
+        self.assertEqual(len(sample), 200)
+        self.assertEqual(sample.indices, sorted(sample.indices))
+        self.assertEqual(sample.sequences, [self.__sequences[i] for i in sample.indices])
+        total = len(self.__sequences)
+        for stratum, count in sample.population.items():
+            self.assertLessEqual(abs(sample.allocation[stratum] - 200 * count / total), 1)
+        self.assertEqual(sample.allocation, sampler.allocation())
+        strata = [sampler.stratum(sequence) for sequence in sample.sequences]
+        self.assertEqual(sum(sample.allocation.values()), len(strata))
+        for stratum in sample.allocation:
+            self.assertEqual(strata.count(stratum), sample.allocation[stratum])
+        self.assertEqual({present for length, present in sample.population}, {True, False})
+
+    def test_reproducible(self):
+        first = StratifiedSampler(50, self.__sens_pats, seed=1).add_all(self.__sequences).sample()
+        second = StratifiedSampler(50, self.__sens_pats, seed=1).add_all(self.__sequences).sample()
+        other = StratifiedSampler(50, self.__sens_pats, seed=2).add_all(self.__sequences).sample()
+        self.assertEqual(first.indices, second.indices)
+        self.assertNotEqual(first.indices, other.indices)
+        everything = StratifiedSampler(5000, self.__sens_pats).add_all(self.__sequences).sample()
+        self.assertEqual(everything.sequences, self.__sequences)
+
+    def test_seq_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "data.seq")
+            write_seq_file(path, ["a", "b"], self.__sequences)
+            descriptors, sample = sample_seq_file(path, 100, self.__sens_pats, seed=3)
+        self.assertEqual(descriptors, ["a", "b"])
+        expected = StratifiedSampler(100, self.__sens_pats, seed=3).add_all(self.__sequences).sample()
+        self.assertEqual(sample.indices, expected.indices)
+
+    def test_contains_pattern(self):
+        self.assertTrue(contains_pattern(["1", "3", "2"], ["1", "2"]))
+        self.assertFalse(contains_pattern(["2", "1"], ["1", "2"]))
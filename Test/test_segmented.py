@@ -0,0 +1,45 @@
+import random
+from concurrent.futures import ProcessPoolExecutor
+from unittest import TestCase
+
+from Sanitise import TopDown
+from Sanitise.Segmented import SegmentedSanitiser, window_bounds
+from Test import Setup
+
+
+class TestSegmented(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.Groceries()
+        rand = random.Random(0)
+        alphabet = list(self.__test_parameters.get_alphabet_leaves())
+        self.__sequence = [rand.choice(alphabet) for i in range(40)]
+        self.__sens_pats = [self.__sequence[:2], self.__sequence[20:22]]
+
+    def test_window_bounds(self):
+        for length, window_length, overlap in [(40, 8, 0), (40, 8, 3), (41, 8, 7), (5, 8, 2), (0, 4, 1)]:
+            windows = window_bounds(length, window_length, overlap)
+            emitted = [i for window in windows for i in range(window.emit_start, window.emit_stop)]
+            self.assertEqual(emitted, list(range(length)))
+            for window in windows:
+                self.assertLessEqual(window.stop - window.start, window_length)
+                self.assertTrue(window.start <= window.emit_start <= window.emit_stop <= window.stop)
+        with self.assertRaises(ValueError):
+            window_bounds(10, 4, 4)
+
+    def test_sanitise(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        whole = SegmentedSanitiser(self.__sens_pats, 1, tax_tree, window_length=7).sanitise(self.__sequence[:7])
+        self.assertEqual(whole, TopDown.sanitise_seq_top_down(self.__sens_pats, self.__sequence[:7], 1, tax_tree))
+
+        serial = SegmentedSanitiser(self.__sens_pats, 1, tax_tree, window_length=7, overlap=2)
+        expected = []
+        for window in serial.windows(self.__sequence):
+            sanitised_window = TopDown.sanitise_seq_top_down(self.__sens_pats,
+                                                             self.__sequence[window.start:window.stop], 1, tax_tree)
+            expected += sanitised_window[window.emit_start - window.start:window.emit_stop - window.start]
+        self.assertEqual(serial.sanitise(self.__sequence), expected)
+
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            parallel = SegmentedSanitiser(self.__sens_pats, 1, tax_tree, window_length=7, overlap=2,
+                                          executor=executor, max_in_flight=2)
+            self.assertEqual(parallel.sanitise(self.__sequence), expected)
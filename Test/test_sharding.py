@@ -0,0 +1,63 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+
+from Data.Dataset import MSNBCDataset, write_seq_file
+from Data.Sharding import ShardError, merge_shards, run_shard, shard_range
+from Sanitise.Batch import BatchSanitiser
+from Test import Setup
+
+
+class TestSharding(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.MSNBC()
+        rand = random.Random(0)
+        self.__sequences = [[str(rand.randint(1, 17)) for j in range(rand.randint(1, 8))] for i in range(23)]
+        self.__dir = tempfile.TemporaryDirectory()
+        dataset_path = os.path.join(self.__dir.name, MSNBCDataset.PATH)
+        os.makedirs(os.path.dirname(dataset_path))
+        write_seq_file(dataset_path, [f"page{i}" for i in range(1, 17 + 1)], self.__sequences)
+        self.__dataset = MSNBCDataset(self.__dir.name)
+        self.__sanitiser = BatchSanitiser([["1", "2"], ["3", "4", "5"]], 0.5, self.__test_parameters.get_tax_tree())
+
+    def tearDown(self) -> None:
+        self.__dir.cleanup()
+
+    def test_shard_ranges(self):
+        for num_sequences, num_shards in [(23, 4), (3, 5), (10, 1)]:
+            ranges = [shard_range(num_sequences, i, num_shards) for i in range(num_shards)]
+            self.assertEqual([i for start, stop in ranges for i in range(start, stop)], list(range(num_sequences)))
+
+    def test_merge_in_order(self):
+        output_dir = os.path.join(self.__dir.name, "run")
+        for shard_index in [2, 0, 1]:
+            run_shard(self.__dataset, self.__sanitiser, shard_index, 3, output_dir)
+        output_path = os.path.join(self.__dir.name, "sanitised.seq")
+        manifest = merge_shards(self.__dataset, output_dir, 3, output_path)
+
+        self.assertEqual(manifest["num_sequences"], len(self.__sequences))
+        with open(output_path) as output_file:
+            lines = [line.split() for line in output_file if len(line.strip()) > 0]
+        self.assertEqual(lines[1:], list(self.__sanitiser.sanitise(self.__sequences)))
+
+    def test_incomplete_run(self):
+        output_dir = os.path.join(self.__dir.name, "run")
+        run_shard(self.__dataset, self.__sanitiser, 0, 2, output_dir)
+        with self.assertRaises(ShardError):
+            merge_shards(self.__dataset, output_dir, 2, os.path.join(self.__dir.name, "sanitised.seq"))
+
+        run_shard(self.__dataset, self.__sanitiser, 1, 2, output_dir)
+        with open(os.path.join(output_dir, "shard-0001-of-0002.seq"), "a") as shard_file:
+            shard_file.write("1 2 \n")
+        with self.assertRaises(ShardError):
+            merge_shards(self.__dataset, output_dir, 2, os.path.join(self.__dir.name, "sanitised.seq"))
+
+    def test_other_input(self):
+        output_dir = os.path.join(self.__dir.name, "run")
+        for shard_index in range(2):
+            run_shard(self.__dataset, self.__sanitiser, shard_index, 2, output_dir)
+        # the same number of sessions, one of them changed since the shards ran
+        self.__dataset.sequences[-1] = self.__dataset.sequences[-1] + ["1"]
+        with self.assertRaises(ShardError):
+            merge_shards(self.__dataset, output_dir, 2, os.path.join(self.__dir.name, "sanitised.seq"))
@@ -1,14 +1,28 @@
 import random
+from concurrent.futures import ProcessPoolExecutor
 from unittest import TestCase
 
 from Data.Dataset import MSNBCDataset
 from Privacy import Entropy
 from Privacy.Distributions import ProbabilityDistribution
-from Sanitise import TopDown
+from Sanitise import Helper, TopDown
+from Sanitise.Context import SequenceContext
 from Sanitise.Helper import Alphabet, make_seq_list_unique
 from Test import Setup
 
 
+class CountingContext(SequenceContext):
+    # a SequenceContext that counts the uses of its S
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.frequencies_used = 0
+
+    @property
+    def frequencies(self):
+        self.frequencies_used += 1
+        return super().frequencies
+
+
 class TestMain(TestCase):
     def setUp(self) -> None:
         self.__test_parameters = Setup.Groceries()
@@ -134,6 +148,144 @@ class TestMSNBC(TestCase):
         pass  # TODO
 
 
+class TestTopDownModes(TestCase):
+    def setUp(self) -> None:
+        self.__test_parameters = Setup.Groceries()
+        self.__sequences = [gen_rand_seq(self.__test_parameters.get_alphabet_leaves(), seq_len_range=(5, 7))
+                            for i in range(3)]
+
+    def test_sanitise_seq_top_down_parallel_and_incremental(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for input_seq in self.__sequences:
+                sens_pats = [input_seq[:2]]
+                for epsilon in [0, 1, 2, 4]:
+                    serial = TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree)
+                    parallel = TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree,
+                                                             executor=executor)
+                    self.assertEqual(parallel, serial)
+                    incremental = TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree,
+                                                                incremental_gain=True)
+                    self.assertEqual(incremental, serial)
+
+    def test_parallel_with_context(self):
+        tax_tree = Setup.MSNBC().get_tax_tree().compile()
+        rand = random.Random(3)
+        with ProcessPoolExecutor(max_workers=2) as executor:
+            for i in range(6):
+                input_seq = [str(rand.randint(1, 17)) for j in range(rand.randint(6, 10))]
+                sens_pats = [input_seq[1:3]]
+                for context in [SequenceContext(input_seq), SequenceContext(input_seq, max_pattern_length=3)]:
+                    for epsilon, workers in [(2, None), (4, 2), (6, 3)]:
+                        self.assertEqual(
+                            TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree,
+                                                          context=context, executor=executor, workers=workers),
+                            TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree, context=context))
+            with self.assertRaises(ValueError):
+                TopDown.sanitise_seq_top_down(sens_pats, input_seq, 4, tax_tree, executor=executor,
+                                              incremental_gain=True)
+
+    def test_anytime(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        root = tax_tree.get_root_symbol()
+        for input_seq in self.__sequences:
+            sens_pats = [input_seq[:2]]
+            epsilon = 2
+            full_stats = TopDown.TopDownStats()
+            TopDown.generalise_top_down(sens_pats, input_seq, epsilon, tax_tree, stats=full_stats)
+            self.assertFalse(full_stats.stopped_early)
+
+            stats = TopDown.TopDownStats()
+            g = TopDown.generalise_top_down(sens_pats, input_seq, epsilon, tax_tree, max_iterations=1, stats=stats)
+            self.assertEqual(stats.iterations, 1)
+            self.assertEqual(stats.stopped_early, full_stats.iterations > 1)
+            if stats.refinements_accepted > 0:  # the all-root start is kept even if it is above epsilon
+                self.assertLessEqual(Entropy.inference_gain(input_seq, sens_pats, g), epsilon + 1e-9)
+
+            stats = TopDown.TopDownStats()
+            g = TopDown.generalise_top_down(sens_pats, input_seq, epsilon, tax_tree, max_seconds=0, stats=stats)
+            self.assertTrue(stats.stopped_early)
+            self.assertEqual(stats.inference_gain_calls, 0)
+            self.assertEqual(Helper.generalise_seq(input_seq, g), [root] * len(input_seq))
+
+    def test_no_time_to_build_s(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        root = tax_tree.get_root_symbol()
+        for input_seq in self.__sequences:
+            sens_pats = [input_seq[:2]]
+            for incremental_gain in [False, True]:
+                context = CountingContext(input_seq)
+                stats = TopDown.TopDownStats()
+                g = TopDown.generalise_top_down(sens_pats, input_seq, 2, tax_tree, context=context,
+                                                incremental_gain=incremental_gain, max_seconds=0, stats=stats)
+                self.assertTrue(stats.stopped_early)
+                self.assertEqual(stats.iterations, 0)
+                self.assertEqual(context.frequencies_used, 0)
+                self.assertEqual(Helper.generalise_seq(input_seq, g), [root] * len(input_seq))
+
+                context = CountingContext(input_seq)
+                stats = TopDown.TopDownStats()
+                sanitised = TopDown.sanitise_seq_top_down(sens_pats, input_seq, 2, tax_tree, context=context,
+                                                          incremental_gain=incremental_gain, max_seconds=0,
+                                                          stats=stats)
+                self.assertTrue(stats.stopped_early)
+                self.assertEqual(context.frequencies_used, 0)
+                self.assertEqual(sanitised, [root] * len(input_seq))
+
+    def test_shared_sequence_context(self):
+        tax_tree = self.__test_parameters.get_tax_tree()
+        for input_seq in self.__sequences:
+            sens_pats = [input_seq[:2]]
+            context = SequenceContext(input_seq)
+            for epsilon in [0, 1, 2, 4]:
+                self.assertEqual(TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree,
+                                                               context=context),
+                                 TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree))
+
+    def test_binary_search(self):
+        tax_tree = Setup.MSNBC().get_tax_tree().compile()
+        rand = random.Random(0)
+        level_stats, binary_stats = TopDown.TopDownStats(), TopDown.TopDownStats()
+        for i in range(5):
+            input_seq = [str(rand.randint(1, 17)) for j in range(rand.randint(5, 9))]
+            sens_pats = [input_seq[1:3]]
+            context = SequenceContext(input_seq)
+            for epsilon in [0, 4, 6, Entropy.max_inference_gain(input_seq)]:
+                TopDown.generalise_top_down(sens_pats, input_seq, epsilon, tax_tree, context=context,
+                                            stats=level_stats)
+                g = TopDown.generalise_top_down(sens_pats, input_seq, epsilon, tax_tree, context=context,
+                                                stats=binary_stats, search="binary")
+                if g.unique_strategies() != {tax_tree.get_root_symbol()}:
+                    self.assertLessEqual(context.inference_gain(g), epsilon + 1e-9)
+            # every refinement satisfies epsilon: each subtree is refined down to its leaves at once
+            self.assertEqual(TopDown.sanitise_seq_top_down(sens_pats, input_seq, epsilon, tax_tree,
+                                                           search="binary"), input_seq)
+        self.assertLess(binary_stats.inference_gain_calls, level_stats.inference_gain_calls)
+        with self.assertRaises(ValueError):
+            TopDown.sanitise_seq_top_down(sens_pats, input_seq, 1, tax_tree, search="linear")
+
+    def test_binary_search_non_monotone_cost(self):
+        # refining Wine or Beer down to itself costs more than generalising it to the root
+        test_parameters = Setup.Groceries()
+        cost_func = test_parameters.get_cost_func()
+        for leaf in ["Wine", "Beer"]:
+            cost_func[(leaf, "Alcohol")] = 0
+            cost_func[(leaf, leaf)] = 5
+        tax_tree = test_parameters.get_tax_tree()
+        self.assertIs(tax_tree.get_cost_func(), cost_func)
+        input_seq = ["Milk"] * 4 + ["Beer"] * 3 + ["Wine"] * 2
+        epsilon = Entropy.max_inference_gain(input_seq)
+        context = SequenceContext(input_seq)
+        # Milk is looked at first; the Alcohol refinement, shallower than the costly leaves, still does better
+        level = TopDown.generalise_top_down([], input_seq, epsilon, tax_tree, context=context, max_iterations=1)
+        binary = TopDown.generalise_top_down([], input_seq, epsilon, tax_tree, context=context, max_iterations=1,
+                                             search="binary")
+        self.assertEqual(binary["Wine"], "Alcohol")
+        self.assertEqual(binary.generalisation_strategies, level.generalisation_strategies)
+        # Milk refined to itself instead would leave a loss of 5
+        self.assertEqual(context.utility_loss(binary, cost_func), 4)
+
+
 def gen_rand_seq(alpha_leaves: Alphabet, seq_len_range=(10, 20)):
     len_seq = random.randint(seq_len_range[0], seq_len_range[1])
     return [random.choice(alpha_leaves) for i in range(len_seq)]
@@ -0,0 +1,79 @@
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+
+from Sanitise.Trees import CompiledTaxonomy
+from Test import Setup
+
+GROCERIES_TAXONOMY = """% Groceries taxonomy
+[parents]
+ALL
+Alcohol ALL
+Snack ALL
+Dairy ALL
+Wine Alcohol
+Beer Alcohol
+Cookies Snack
+Chips Snack
+Milk Dairy
+Cheese Dairy
+[costs]
+Wine Alcohol 0.2
+Beer Alcohol 0.5
+Cookies Snack 0.8
+Chips Snack 0.3
+Milk Dairy 0.5
+Cheese Dairy 0.5
+Wine ALL 1
+Beer ALL 1
+Cookies ALL 1
+Chips ALL 1
+Milk ALL 1
+Cheese ALL 1
+"""
+
+
+class TestCompiledTaxonomy(TestCase):
+    def setUp(self) -> None:
+        self.__tax_tree = Setup.Groceries().get_tax_tree()
+        self.__tmp_dir = tempfile.TemporaryDirectory()
+
+    def assert_same_taxonomy(self, compiled):
+        tax_tree = self.__tax_tree
+        self.assertEqual(compiled.get_root_symbol(), tax_tree.get_root_symbol())
+        self.assertEqual(sorted(compiled.get_leaf_symbols()), sorted(tax_tree.get_leaf_symbols()))
+        cost_func, compiled_cost_func = tax_tree.get_cost_func(), compiled.get_cost_func()
+        for leaf in tax_tree.get_leaf_symbols():
+            self.assertEqual(compiled.path_symbols_from_root(leaf), tax_tree.path_symbols_from_root(leaf))
+            for symbol in compiled.path_symbols_from_root(leaf):
+                self.assertEqual(compiled_cost_func[(leaf, symbol)], cost_func[(leaf, symbol)])
+        for symbol in compiled.get_symbols():
+            self.assertEqual(sorted(compiled.leaf_symbols_under(symbol)),
+                             sorted(tax_tree.leaf_symbols_under(symbol)))
+
+    def test_from_tree(self):
+        self.assert_same_taxonomy(self.__tax_tree.compile())
+
+    def test_from_file(self):
+        path = os.path.join(self.__tmp_dir.name, "groceries.tax")
+        with open(path, "w") as taxonomy_file:
+            taxonomy_file.write(GROCERIES_TAXONOMY)
+        self.assert_same_taxonomy(CompiledTaxonomy.from_file(path))
+
+    def test_save_load_pickle(self):
+        compiled = self.__tax_tree.compile()
+        path = os.path.join(self.__tmp_dir.name, "groceries.taxc")
+        compiled.save(path)
+        for memory_map in (True, False):
+            loaded = CompiledTaxonomy.load(path, memory_map=memory_map)
+            self.assert_same_taxonomy(loaded)
+            self.assert_same_taxonomy(pickle.loads(pickle.dumps(loaded)))
+
+    def test_immutable(self):
+        compiled = self.__tax_tree.compile()
+        with self.assertRaises(AttributeError):
+            compiled._symbols = ()
+
+    def tearDown(self) -> None:
+        self.__tmp_dir.cleanup()
@@ -0,0 +1,58 @@
+import random
+from unittest import TestCase
+
+from Sanitise.Batch import BatchSanitiser
+from Sanitise.Context import SequenceContext
+from Sanitise.Helper import GeneralisationFunction
+from Sanitise.WarmStart import WarmStartCache, refinements_of
+from Test import Setup
+
+
+class TestWarmStart(TestCase):
+    def setUp(self) -> None:
+        self.__tax_tree = Setup.MSNBC().get_tax_tree().compile()
+        rand = random.Random(2)
+        base = [str(rand.randint(1, 8)) for i in range(9)]
+        # sessions that differ from the first by one event; at this epsilon TopDown refines every one of them,
+        # and all but one reach TopDown in a batch
+        self.__sequences = [base] + [base[:i] + [str(rand.randint(1, 8))] + base[i + 1:] for i in range(6)]
+        self.__sens_pats = [base[1:3]]
+        self.__epsilon = 7
+
+    def test_generalise(self):
+        cache = WarmStartCache(self.__sens_pats, self.__epsilon, self.__tax_tree)
+        seen = set()
+        for sequence in self.__sequences:
+            context = SequenceContext(sequence)
+            g_final, counts = cache.generalise(sequence, context=context)
+            # warm started from a session in which the same sensitive patterns occur
+            matched = cache.matched_patterns(context)
+            self.assertEqual(counts["warm_started"], int(matched in seen))
+            seen.add(matched)
+            self.assertGreater(refinements_of(g_final, self.__tax_tree), 0)
+            self.assertLessEqual(context.inference_gain(g_final), self.__epsilon)
+        self.assertEqual(len(cache), len(self.__sequences))
+
+    def test_coarsen(self):
+        # the identity g of a session never satisfies an epsilon below its own inference gain
+        sequence = self.__sequences[0]
+        cache = WarmStartCache(self.__sens_pats, self.__epsilon, self.__tax_tree)
+        leaves = self.__tax_tree.get_leaf_symbols()
+        identity = GeneralisationFunction(leaves)
+        for leaf in leaves:
+            identity[leaf] = leaf
+            identity.set_generalisation_level(leaf, len(self.__tax_tree.path_symbols_from_root(leaf)) - 1)
+        context = SequenceContext(sequence)
+        self.assertGreater(context.inference_gain(identity), self.__epsilon)
+        g_start, steps = cache.starting_point(identity, context)
+        self.assertGreater(steps, 0)
+        self.assertLessEqual(context.inference_gain(g_start), self.__epsilon)
+
+    def test_batch(self):
+        sanitiser = BatchSanitiser(self.__sens_pats, self.__epsilon, self.__tax_tree, warm_start=True)
+        sanitised = list(sanitiser.sanitise(self.__sequences))
+        self.assertEqual([len(sequence) for sequence in sanitised], [len(sequence) for sequence in self.__sequences])
+        counts = sanitiser.warm_start_counts
+        self.assertEqual(counts["sessions"], sanitiser.triage_counts[BatchSanitiser.SANITISE])
+        self.assertGreater(counts["sessions"], 1)
+        self.assertGreater(counts["warm_started"], 0)